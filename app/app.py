@@ -1,14 +1,21 @@
 import streamlit as st
-from utils.visualization import DataVisualizer 
+from utils.visualization import DataVisualizer, visible_range_slider
 import logging
 import os
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
 from utils.content import Roadmap, ProjectDescription, APIHandler
 from utils.EDA import EDA
-from utils.forecasting_models import ForecastingModels
+from utils.forecasting_models import MODEL_DEFAULTS, ForecastingModels
+from utils.model_registry import ModelRegistry
+from utils.training import DEFAULT_JOBS, train
+from utils.candle_store import open_store
+from utils.catalog import DataCatalog
+from utils.result_cache import ResultCache
+from utils.decomposition import DecompositionService
+from utils.rollups import RollupPyramid
+from utils.config import INTERVALS, PAIR
+from utils.backends import backend, import_costs
 import time
 
 # page config
@@ -21,18 +28,38 @@ st.title("Integrating Pi42 API for Crypto Forecasting - BTCINR")
 page = st.sidebar.radio("Navigate", ["Objective", "API", "Data Overview", "Exploratory Analysis", "Forecasting", "Backtesting"])
 
 # Load data
-@st.cache_data
+@st.cache_resource
+def get_catalog():
+    # One lazily-filled catalog per worker, shared by every session
+    return DataCatalog(open_store())
+
+
 def load_data():
-    intervals = ['5m', '15m', '30m', '1h', '6h', '12h']
-    dataframes = {}
+    return get_catalog()
+
+
+@st.cache_resource
+def get_result_cache():
+    # Derived results (indicators, decompositions...) shared by every session of the worker
+    return ResultCache(max_bytes=256 * 1024 ** 2)
+
+
+@st.cache_resource
+def get_decomposer():
+    # Background decomposition workers; results land in the shared result cache
+    return DecompositionService(cache=get_result_cache())
+
 
-    for interval in intervals:
-        df = pd.read_csv(f"BTCINR_{interval}_data.csv")  # D:\Github\Pi42\data
-        df['startTime'] = pd.to_datetime(df['startTime'], unit='ms')
-        df['endTime'] = pd.to_datetime(df['endTime'], unit='ms')
-        df.set_index('startTime', inplace=True)
-        dataframes[interval] = df
-    return dataframes
+@st.cache_resource
+def get_registry():
+    # Fitted models written by the training job; loaded artifacts stay in memory per worker
+    return ModelRegistry()
+
+
+@st.cache_resource
+def get_rollups():
+    # Persisted hour/day/week rollups, also kept current by the sync job
+    return RollupPyramid()
 
 # Objective
 if page == "Objective":
@@ -56,7 +83,7 @@ if page == "Data Overview":
     data_dict = load_data()
     
     # instance of DataVisualizer
-    visualizer = DataVisualizer(data_dict)
+    visualizer = DataVisualizer(data_dict, cache=get_result_cache(), rollups=get_rollups())
 
     # Display the selected data
     visualizer.display_selected_data()
@@ -67,15 +94,16 @@ if page == "Data Overview":
 # Exploratory Analysis Page
 elif page == "Exploratory Analysis":
     st.header("Exploratory Data Analysis (EDA)")
-    # Load your data first
+    # Get the selected interval from the user, then load only that interval
+    selected_interval = st.selectbox("Select Interval", INTERVALS)
     data_dict = load_data()
-    # Get the selected interval from the user
-    intervals = list(data_dict.keys())
-    selected_interval = st.selectbox("Select Interval", intervals)
 
     # Check if the selected interval is valid
     if selected_interval in data_dict:
-        eda = EDA(data_dict, selected_interval)  
+        # Plotly charts below are downsampled server-side to the chosen range
+        visible_range = visible_range_slider(data_dict[selected_interval], key='eda_range')
+        eda = EDA(data_dict, selected_interval, cache=get_result_cache(), visible_range=visible_range,
+                  decomposer=get_decomposer())
 
         # Basic statistics
         st.subheader("Basic Statistics")
@@ -86,7 +114,7 @@ elif page == "Exploratory Analysis":
         eda_options = st.multiselect(
             "Select the type of analysis to perform:",
             ["Price Change Analysis", "Plot Open Prices", "Volume Over Time",
-             "Moving Average Analysis", "RSI Analysis", "Seasonal Decomposition"]
+             "Moving Average Analysis", "RSI Analysis", "Seasonal Decomposition", "Cross-Pair Correlation"]
         )
 
         # Run the selected EDA functions based on user input
@@ -112,51 +140,77 @@ elif page == "Exploratory Analysis":
 
         if "Seasonal Decomposition" in eda_options:
             st.subheader("Seasonal Decomposition")
-            eda.seasonal_decomposition()
+            col1, col2 = st.columns(2)
+            method = col1.selectbox("Method", ["classic", "stl"])
+            period = col2.number_input("Period (candles)", min_value=2, value=30)
+            eda.seasonal_decomposition(period=int(period), method=method)
+
+        if "Cross-Pair Correlation" in eda_options:
+            st.subheader("Cross-Pair Correlation")
+            store = load_data().store
+            others = [pair for pair in store.pairs() if pair != eda.pair]
+            if others:
+                col1, col2, col3 = st.columns(3)
+                pairs = col1.multiselect("Compare with", others, default=others[:10])
+                window = col2.number_input("Window (bars)", min_value=10, value=288)
+                days = col3.number_input("History (days)", min_value=1, value=30)
+                eda.cross_pair_correlation(store, pairs, window=int(window), days=int(days))
+            else:
+                st.info("Only one pair is stored; sync more with `python -m app.utils.data_retrieval --pairs ...`.")
     else:
         st.warning("Please select a valid interval.")
 
 # Forecasting Page
 elif page == "Forecasting":
    # Provide a dropdown for model selection, which includes time frames
-    models = [
-        "ARIMA (5-Minute Forecast)",
-        "Random Forest (15-Minute Forecast)",
-        "Gradient Boosting (30-Minute Forecast)",
-        "LSTM (1-Hour Forecast)",
-        "Prophet (6-Hour Forecast)",
-        "XGBoost (12-Hour Forecast)"
-    ]
-
-    selected_model = st.selectbox("Select Forecasting Model", models)
-
+    models = {
+        "ARIMA (5-Minute Forecast)": ("arima", "5m"),
+        "Random Forest (15-Minute Forecast)": ("random_forest", "15m"),
+        "Gradient Boosting (30-Minute Forecast)": ("gradient_boosting", "30m"),
+        "LSTM (1-Hour Forecast)": ("lstm", "1h"),
+        "Prophet (6-Hour Forecast)": ("prophet", "6h"),
+        "XGBoost (12-Hour Forecast)": ("xgboost", "12h")
+    }
+
+    selected_model = st.selectbox("Select Forecasting Model", list(models))
+
+    model, interval = models[selected_model]
     data_dict = load_data()
 
-    df = data_dict[selected_model.split(' ')[-2]]  
+    df = data_dict[interval]
+
+    forecaster = ForecastingModels(df, interval, cache=get_result_cache())
 
-    forecaster = ForecastingModels(df)
+    # Models are trained by `python -m app.utils.training`; the page only serves the latest artifact
+    registry = get_registry()
+    params = {**MODEL_DEFAULTS[model], **(registry.best_params(PAIR, interval, model) or {})}
+    meta = registry.meta(PAIR, interval, model, params)
+    if meta is None:
+        st.info("No trained model yet. Run `python -m app.utils.training` or train it here.")
+    else:
+        stale = registry.is_stale(meta, df)
+        st.caption(f"Model {meta['version']} trained {meta['created_at']} on data up to {meta['data']['end']} "
+                   f"({'newer candles available' if stale else 'current'}); holdout MAE {meta['metrics']['mae']:.2f}, "
+                   f"MAPE {meta['metrics']['mape']:.3f}%")
+    retrain = st.checkbox("Train now if there is no model or newer candles arrived", value=meta is None)
 
     # Button to run the forecast
     if st.button("Run Forecast"):
         with st.spinner("Running the model, please wait..."):
-            if selected_model == "ARIMA (5-Minute Forecast)":
-                predictions = forecaster.arima_forecast()
-            elif selected_model == "Random Forest (15-Minute Forecast)":
-                predictions = forecaster.random_forest_forecast()
-            elif selected_model == "Gradient Boosting (30-Minute Forecast)":
-                predictions = forecaster.gradient_boosting_forecast()
-            elif selected_model == "LSTM (1-Hour Forecast)":
-                predictions = forecaster.lstm_forecast()
-            elif selected_model == "Prophet (6-Hour Forecast)":
-                predictions = forecaster.prophet_forecast()
-            elif selected_model == "XGBoost (12-Hour Forecast)":
-                predictions = forecaster.xgboost_forecast()
+            if retrain:
+                meta, _ = train(registry, df, PAIR, interval, model, cache=get_result_cache())
+            artifact, meta = registry.load(PAIR, interval, model, params)
+            if artifact is None:
+                st.warning("No trained model to serve; enable training above.")
+                st.stop()
+            predictions = forecaster.forecast(model, artifact, params, meta)
 
             # Display the predictions as a table
             st.subheader("Current Predictions")
             st.write(predictions)
 
             # Plot the predictions
+            plt = backend('pyplot')
             plt.figure(figsize=(10, 5))
             plt.plot(predictions.index, predictions['close'], label='Predicted Prices', color='blue')
             plt.title(f'{selected_model} Predictions')
@@ -167,4 +221,30 @@ elif page == "Forecasting":
 # Backtesting Page
 elif page == "Backtesting":
     st.header("Backtesting")
-    # Backtesting details...
+    # Walk-forward: every fold trains on the bars before its test window and predicts each test bar one step ahead
+    backtest_model = st.selectbox("Model", list(MODEL_DEFAULTS))
+    backtest_interval = st.selectbox("Interval", INTERVALS, index=INTERVALS.index(DEFAULT_JOBS[backtest_model]))
+    folds = st.slider("Folds", min_value=2, max_value=10, value=5)
+    reuse = st.checkbox("Carry each fold's fit forward instead of refitting (faster, measures the online update)")
+
+    if st.button("Run Backtest"):
+        with st.spinner("Running the walk-forward backtest, please wait..."):
+            forecaster = ForecastingModels(load_data()[backtest_interval], backtest_interval)
+            fold_table, predictions = forecaster.backtest(backtest_model, folds=folds, reuse=reuse)
+        st.subheader("Per-Fold Error and Latency")
+        st.dataframe(fold_table)
+        st.caption(f"Mean MAE {fold_table['mae'].mean():.2f} (std {fold_table['mae'].std():.2f}), "
+                   f"mean MAPE {fold_table['mape'].mean():.3f}%, total fit {fold_table['fit_seconds'].sum():.1f}s, "
+                   f"{fold_table['latency_ms'].mean():.3f} ms per predicted bar")
+        st.line_chart(predictions[['actual', 'predicted']])
+
+# Resident size of the intervals this worker has loaded so far
+memory = load_data().memory_usage()
+st.sidebar.caption(f"Loaded intervals: {', '.join(load_data().loaded()) or 'none'} "
+                   f"({memory['total'] / 1024 ** 2:.1f} MB)")
+cache_stats = get_result_cache().stats()
+st.sidebar.caption(f"Result cache: {cache_stats['entries']} entries, {cache_stats['bytes'] / 1024 ** 2:.1f} MB, "
+                   f"{cache_stats['hit_rate']:.0%} hits")
+# Model libraries are imported on first use; show which ones this worker has paid for
+backends_loaded = ", ".join(f"{name} ({seconds:.1f}s)" for name, seconds in import_costs().items())
+st.sidebar.caption(f"Model backends loaded: {backends_loaded or 'none'}")
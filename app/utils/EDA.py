@@ -1,21 +1,64 @@
 
+import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-from statsmodels.tsa.seasonal import seasonal_decompose
 from plotly.subplots import make_subplots
 
+from .backends import backend
+from .config import INTERVAL_MS, PAIR
+from .cross_asset import cross_asset_stats
+from .decomposition import default_decomposer
+from .downsampling import MAX_POINTS, LevelPyramid, downsample
+from .indicators import IndicatorEngine
+from .result_cache import data_version, default_cache
+
 
 class EDA:
-    def __init__(self, data_dict, selected_interval):
+    def __init__(self, data_dict, selected_interval, pair=PAIR, cache=None, visible_range=None,
+                 max_points=MAX_POINTS, decomposer=None):
         self.data_dict = data_dict
         self.selected_interval = selected_interval
+        # Shared base frame; derived series live in the result cache, never as columns added here
         self.df = self.data_dict[self.selected_interval]
+        self.pair = pair
+        self.cache = cache or default_cache
+        # Plotly traces are reduced to ``max_points`` inside ``visible_range`` (a (start, end) pair)
+        self.start, self.end = (None, None) if visible_range is None else visible_range
+        self.max_points = max_points
+        self.decomposer = decomposer or default_decomposer
+
+    def derived(self, computation, params, compute):
+        """Look up (or compute and cache) a result derived from the selected interval."""
+        return self.cache.get_or_compute(self.pair, self.selected_interval, computation, params,
+                                         data_version(self.df), compute)
+
+    def trace(self, column, values=None, method='lttb'):
+        """
+        Downsampled ``x``/``y`` of one series for the visible range, as keyword arguments for a trace.
+
+        Frame columns go through a cached ``LevelPyramid``; ``values`` aligned with the frame
+        (indicators, decomposition parts) are reduced directly.
+        """
+        x = self.df.index.to_numpy()
+        if values is None:
+            y = self.df[column].to_numpy()
+            pyramid = self.derived('pyramid', {'column': column, 'method': method},
+                                   lambda: LevelPyramid(x, y, min_points=self.max_points, method=method))
+            x, y = downsample(x, y, self.max_points, method, self.start, self.end, pyramid)
+        else:
+            x, y = downsample(x, values, self.max_points, method, self.start, self.end)
+        return {'x': x, 'y': y}
+
+    @classmethod
+    def from_store(cls, store, pair, selected_interval, columns=None, start=None, end=None):
+        """Build the analysis from one interval of a CandleStore, reading only the requested columns and range."""
+        df = store.read(pair, selected_interval, columns=columns, start=start, end=end)
+        return cls({selected_interval: df}, selected_interval, pair)
 
     def price_trend(self):
         st.subheader("Price Trend")
+        plt = backend('pyplot')
         plt.figure(figsize=(12, 6))
         plt.plot(self.df['close'], label='Close Price', color='blue')
         plt.title(f'{self.selected_interval} Close Price Trend')
@@ -27,13 +70,43 @@ class EDA:
     def correlation_heatmap(self):
         st.subheader("Correlation Heatmap")
         correlation = self.df.corr()
+        plt, sns = backend('pyplot'), backend('seaborn')
         plt.figure(figsize=(10, 8))
         sns.heatmap(correlation, annot=True, fmt=".2f", cmap='coolwarm')
         plt.title("Correlation Heatmap")
         st.pyplot(plt)
 
+    def cross_pair_correlation(self, store, pairs, window=288, days=30):
+        """
+        Rolling log-return correlation of several pairs on the selected interval, and their beta to this pair.
+
+        Computed chunk-wise straight from the store (see ``cross_asset_stats``) and cached until the next bar.
+        """
+        pairs = [self.pair] + [pair for pair in pairs if pair != self.pair]
+        step = INTERVAL_MS[self.selected_interval]
+        end = int(pd.Timestamp.now(tz='UTC').value // 1_000_000) // step * step
+        start = end - days * 24 * 60 * 60_000
+        stats = self.cache.get_or_compute(','.join(pairs), self.selected_interval, 'cross_asset',
+                                          {'window': window, 'days': days}, (end,),
+                                          lambda: cross_asset_stats(store, pairs, self.selected_interval, window,
+                                                                    start, end, benchmark=self.pair))
+
+        fig = px.imshow(stats['corr'], x=pairs, y=pairs, zmin=-1, zmax=1, color_continuous_scale='RdBu_r',
+                        text_auto='.2f', title=f"Return Correlation, last {window} bars ({self.selected_interval})")
+        st.plotly_chart(fig)
+
+        x = stats['times'].astype('datetime64[ms]')
+        fig = go.Figure()
+        for column, pair in enumerate(pairs[1:], start=1):
+            trace_x, trace_y = downsample(x, stats['beta'][:, column], self.max_points, 'lttb', self.start, self.end)
+            fig.add_trace(go.Scatter(x=trace_x, y=trace_y, mode='lines', name=pair))
+        fig.update_layout(title=f"Rolling Beta to {self.pair} ({window} bars)", xaxis_title="Time",
+                          yaxis_title="Beta", template="plotly_white")
+        st.plotly_chart(fig)
+
     def price_distribution(self):
         st.subheader("Price Distribution")
+        plt, sns = backend('pyplot'), backend('seaborn')
         plt.figure(figsize=(10, 6))
         sns.histplot(self.df['close'], bins=30, kde=True, color='orange')
         plt.title("Distribution of Close Prices")
@@ -41,12 +114,13 @@ class EDA:
         st.pyplot(plt)
 
     def price_change_analysis(self):
-        self.df['price_change'] = self.df['close'] - self.df['open']
-        mean_change = self.df['price_change'].mean()
-        std_change = self.df['price_change'].std()
+        price_change = self.derived('price_change', None,
+                                    lambda: (self.df['close'] - self.df['open']).rename('price_change'))
+        mean_change = price_change.mean()
+        std_change = price_change.std()
 
         fig = px.histogram(
-            self.df,
+            price_change.to_frame(),
             x='price_change',
             nbins=30,
             marginal="rug",
@@ -68,8 +142,7 @@ class EDA:
     def plot_open_prices(self):
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=self.df.index,
-            y=self.df['open'],
+            **self.trace('open'),
             mode='lines',
             name='Open Price'
         ))
@@ -84,18 +157,17 @@ class EDA:
         st.plotly_chart(fig)
 
     def volume_over_time(self):
-        data_sorted = self.df.sort_values('endTime', ascending=True)
+        # Min/max buckets keep the volume spikes that a shape-preserving reduction could drop
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=data_sorted['endTime'],
-            y=data_sorted['volume'],
+            **self.trace('volume', method='minmax'),
             mode='lines',
             name='Volume',
             line=dict(color='rgba(31, 119, 180, 1.0)'),
         ))
         fig.update_layout(
             title=f"Volume Over Time - {self.selected_interval} Interval",
-            xaxis_title="End Time",
+            xaxis_title="Time",
             yaxis_title="Volume",
             showlegend=False,
             margin=dict(l=50, r=30, t=50, b=50),
@@ -103,15 +175,18 @@ class EDA:
         )
         st.plotly_chart(fig)
 
+    def indicators(self, names):
+        """Batch-compute indicator columns for the selected interval (see ``IndicatorEngine``), cached."""
+        return self.derived('indicators', names, lambda: IndicatorEngine(names).compute(self.df))
+
     def moving_average_analysis(self):
-        self.df['SMA_7'] = self.df['close'].rolling(window=7).mean()
-        self.df['SMA_30'] = self.df['close'].rolling(window=30).mean()
+        block = self.indicators(['sma_7', 'sma_30'])
 
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=self.df.index, y=self.df['close'], mode='lines', name='Close Price'))
-        fig.add_trace(go.Scatter(x=self.df.index, y=self.df['SMA_7'], mode='lines', name='7-Day SMA',
+        fig.add_trace(go.Scatter(**self.trace('close'), mode='lines', name='Close Price'))
+        fig.add_trace(go.Scatter(**self.trace('sma_7', block['sma_7']), mode='lines', name='7-Day SMA',
                                  line=dict(color='orange')))
-        fig.add_trace(go.Scatter(x=self.df.index, y=self.df['SMA_30'], mode='lines', name='30-Day SMA',
+        fig.add_trace(go.Scatter(**self.trace('sma_30', block['sma_30']), mode='lines', name='30-Day SMA',
                                  line=dict(color='green')))
         fig.update_layout(
             title=f"SMA Analysis - {self.selected_interval} Interval",
@@ -124,27 +199,30 @@ class EDA:
         st.plotly_chart(fig)
 
     def rsi_analysis(self):
-        delta = self.df['close'].diff(1)
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        avg_gain = gain.rolling(window=14).mean()
-        avg_loss = loss.rolling(window=14).mean()
-        rs = avg_gain / avg_loss
-        self.df['RSI'] = 100 - (100 / (1 + rs))
+        # Wilder-smoothed RSI(14)
+        block = self.indicators(['rsi_14'])
 
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=self.df.index, y=self.df['RSI'], mode='lines', name='RSI'))
+        fig.add_trace(go.Scatter(**self.trace('rsi_14', block['rsi_14']), mode='lines', name='RSI'))
         fig.update_layout(title='Relative Strength Index (RSI)', xaxis_title='Date', yaxis_title='RSI')
         st.plotly_chart(fig)
 
-    def seasonal_decomposition(self):
-        result = seasonal_decompose(self.df['close'], model='additive', period=30)
+    def seasonal_decomposition(self, period=30, method='classic'):
+        # Runs in the decomposition worker pool; a cached (possibly older) result is shown right away
+        result, refresh = self.decomposer.request(self.pair, self.selected_interval, self.df, period, method)
+        if result is None:
+            with st.spinner("Decomposing close prices..."):
+                result = refresh.result()
+        elif refresh is not None:
+            st.caption("Showing the previous decomposition; it is being refreshed with the newest candles.")
+        x = result.index.to_numpy()
         fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.02)
-        fig.add_trace(go.Scatter(x=self.df.index, y=result.observed, name='Observed'), row=1, col=1)
-        fig.add_trace(go.Scatter(x=self.df.index, y=result.trend, name='Trend'), row=2, col=1)
-        fig.add_trace(go.Scatter(x=self.df.index, y=result.seasonal, name='Seasonal'), row=3, col=1)
-        fig.add_trace(go.Scatter(x=self.df.index, y=result.resid, name='Residual'), row=4, col=1)
-        fig.update_layout(height=800, title='Seasonal Decomposition of Close Price')
+        for row, (component, name) in enumerate([('observed', 'Observed'), ('trend', 'Trend'),
+                                                  ('seasonal', 'Seasonal'), ('resid', 'Residual')], start=1):
+            trace_x, trace_y = downsample(x, result[component].to_numpy(), self.max_points,
+                                          'minmax' if component == 'resid' else 'lttb', self.start, self.end)
+            fig.add_trace(go.Scatter(x=trace_x, y=trace_y, name=name), row=row, col=1)
+        fig.update_layout(height=800, title=f'Seasonal Decomposition of Close Price ({method}, period {period})')
         st.plotly_chart(fig)
 
     def run(self):
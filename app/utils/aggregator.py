@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+
+from .candle_store import to_epoch_ms
+from .config import INTERVAL_MS
+from .ingestion import Candle, Tick
+
+HIGHER_INTERVALS = ('15m', '30m', '1h', '6h', '12h')
+
+
+def start_times_ms(df):
+    """Epoch-ms ``startTime`` of a raw frame (column) or a store frame (datetime index)."""
+    if 'startTime' in df.columns:
+        values = df['startTime']
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values.values.astype('datetime64[ms]').astype('int64')
+        return values.to_numpy(dtype='int64')
+    return df.index.values.astype('datetime64[ms]').astype('int64')
+
+
+def resample_ohlcv(df, interval):
+    """
+    Roll sorted base candles up to ``interval`` with one vectorized pass per column.
+
+    Buckets are aligned to the epoch (so 6h/12h bars start at 00:00 UTC, like the exchange's own).
+    The last bucket may be incomplete; it is returned as the forming bar.
+
+    Args:
+    - df (DataFrame): Base candles, either raw (epoch-ms ``startTime`` column) or as read from the store.
+    - interval (str): Target interval, a multiple of the base interval.
+
+    Returns:
+    - DataFrame: Raw kline columns (epoch-ms times) ready to be written into a candle store.
+    """
+    step = INTERVAL_MS[interval]
+    start_times = start_times_ms(df)
+    if len(start_times) == 0:
+        return pd.DataFrame(columns=['startTime', 'open', 'high', 'low', 'close', 'endTime', 'volume'])
+    buckets = start_times // step
+    first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    last = np.r_[first[1:], len(buckets)] - 1
+    bucket_start = buckets[first] * step
+    return pd.DataFrame({
+        'startTime': bucket_start,
+        'open': df['open'].to_numpy()[first],
+        'high': np.maximum.reduceat(df['high'].to_numpy(), first),
+        'low': np.minimum.reduceat(df['low'].to_numpy(), first),
+        'close': df['close'].to_numpy()[last],
+        'endTime': bucket_start + step - 1,
+        'volume': np.add.reduceat(df['volume'].to_numpy(), first),
+    })
+
+
+def rebuild_intervals(df, intervals=HIGHER_INTERVALS):
+    """Derive every higher interval from the base series: ``{interval: DataFrame}``."""
+    return {interval: resample_ohlcv(df, interval) for interval in intervals}
+
+
+class _Bar:
+    """Higher-timeframe bar: closed base candles folded in, plus the base candle still forming."""
+
+    __slots__ = ('start', 'open', 'high', 'low', 'close', 'volume', 'forming', 'emitted', 'last')
+
+    def __init__(self, start):
+        self.start = start
+        self.open = None
+        self.high = -np.inf
+        self.low = np.inf
+        self.close = None
+        self.volume = 0.0
+        self.forming = None
+        self.emitted = False
+        self.last = -1
+
+    def fold(self, candle):
+        if candle.startTime <= self.last:
+            return  # Already folded in, e.g. a repeated "closed" message
+        self.last = candle.startTime
+        if self.open is None:
+            self.open = candle.open
+        self.high = max(self.high, candle.high)
+        self.low = min(self.low, candle.low)
+        self.close = candle.close
+        self.volume += candle.volume
+
+    def snapshot(self, pair, interval, step, closed):
+        high, low, volume = self.high, self.low, self.volume
+        open_, close = self.open, self.close
+        forming = self.forming
+        if forming is not None:
+            open_ = forming.open if open_ is None else open_
+            high, low = max(high, forming.high), min(low, forming.low)
+            close, volume = forming.close, volume + forming.volume
+        return Candle(pair, interval, self.start, self.start + step - 1, open_, high, low, close, volume,
+                      closed, forming.eventTime if forming is not None else self.start + step - 1)
+
+
+class CandleAggregator:
+    """
+    Keep every higher timeframe current from a stream of base candles (or trades).
+
+    Each update touches one bar per timeframe, so the work per message is constant. Repeated updates
+    of a forming base candle replace each other rather than being added twice. When a base candle
+    closes the bucket of a higher timeframe (or a later bucket starts), that bar is emitted once
+    through ``on_bar_close``.
+    """
+
+    def __init__(self, pair, base_interval='5m', intervals=HIGHER_INTERVALS, on_bar_close=None):
+        """
+        Args:
+        - pair (str): Pair the aggregator follows; records of other pairs are ignored.
+        - base_interval (str): Interval of the incoming candles (and of candles built from trades).
+        - intervals (iterable of str): Higher timeframes to maintain.
+        - on_bar_close (callable): Receives a closed ``Candle`` for every finished higher bar.
+        """
+        self.pair = pair
+        self.base_interval = base_interval
+        self.base_step = INTERVAL_MS[base_interval]
+        self.steps = {interval: INTERVAL_MS[interval] for interval in intervals}
+        self.on_bar_close = on_bar_close
+        self.bars = {}
+        self.base = None
+
+    def seed(self, store):
+        """
+        Start every open bar from the base candles already in ``store``, so the first bar emitted after
+        connecting covers its whole bucket rather than only the candles streamed since startup.
+
+        The newest stored candle may still be forming, so it is kept as the forming candle and the stream
+        can keep updating it.
+        """
+        last = store.last_start_time(self.pair, self.base_interval)
+        if last is None:
+            return
+        start = min(last // step * step for step in self.steps.values())
+        base = store.read(self.pair, self.base_interval, columns=['open', 'high', 'low', 'close', 'volume'],
+                          start=start)
+        candles = [Candle(self.pair, self.base_interval, int(t), int(t) + self.base_step - 1, o, h, l, c, v, True,
+                          int(t) + self.base_step - 1)
+                   for t, o, h, l, c, v in zip(start_times_ms(base), base['open'], base['high'], base['low'],
+                                               base['close'], base['volume'])]
+        forming = candles[-1]._replace(closed=False)
+        for interval, step in self.steps.items():
+            bar = self.bars[interval] = _Bar(last // step * step)
+            for candle in candles[:-1]:
+                if candle.startTime >= bar.start:
+                    bar.fold(candle)
+            bar.forming = forming
+        self.base = forming
+
+    def update(self, record):
+        """Listener entry point: dispatch a ``Candle`` or ``Tick`` record."""
+        if record.pair != self.pair:
+            return
+        if isinstance(record, Tick):
+            self.update_trade(record)
+        elif record.interval == self.base_interval:
+            self.update_candle(record)
+
+    def update_trade(self, tick):
+        start = tick.tradeTime // self.base_step * self.base_step
+        base = self.base
+        if base is not None and start < base.startTime:
+            return  # Late trade for a base candle that already closed
+        if base is None or start > base.startTime:
+            if base is not None:
+                self.update_candle(base._replace(closed=True))
+            base = Candle(self.pair, self.base_interval, start, start + self.base_step - 1,
+                          tick.price, tick.price, tick.price, tick.price, 0.0, False, tick.eventTime)
+        base = base._replace(high=max(base.high, tick.price), low=min(base.low, tick.price), close=tick.price,
+                             volume=base.volume + tick.quantity, eventTime=tick.eventTime)
+        self.base = base
+        self.update_candle(base)
+
+    def update_candle(self, candle):
+        for interval, step in self.steps.items():
+            start = candle.startTime // step * step
+            bar = self.bars.get(interval)
+            if bar is not None and start < bar.start:
+                continue  # Late update for a bar that already closed
+            if bar is None or start > bar.start:
+                if bar is not None:
+                    if bar.forming is not None:
+                        bar.fold(bar.forming)
+                        bar.forming = None
+                    self._emit(interval, bar)
+                bar = self.bars[interval] = _Bar(start)
+            if bar.emitted:
+                continue
+            if bar.forming is not None and bar.forming.startTime != candle.startTime:
+                bar.fold(bar.forming)  # A new base candle began, so the previous one is final
+                bar.forming = None
+            if candle.closed:
+                bar.fold(candle)
+                bar.forming = None
+                if candle.endTime >= start + step - 1:
+                    self._emit(interval, bar)
+            else:
+                bar.forming = candle
+
+    def _emit(self, interval, bar):
+        if bar.emitted or bar.open is None:
+            return
+        bar.emitted = True
+        if self.on_bar_close is not None:
+            self.on_bar_close(bar.snapshot(self.pair, interval, self.steps[interval], closed=True))
+
+    def current(self, interval):
+        """The forming bar of ``interval`` as a ``Candle``, or ``None`` before the first update."""
+        bar = self.bars.get(interval)
+        if bar is None:
+            return None
+        return bar.snapshot(self.pair, interval, self.steps[interval], closed=bar.emitted)
+
+
+def derive_into_store(store, pair, base_interval='5m', intervals=HIGHER_INTERVALS, start=None):
+    """Rebuild higher intervals from the stored base series and write them back; no network calls."""
+    if start is not None:
+        # Start at a bucket boundary of the coarsest interval so the first bar of every interval is whole
+        coarsest = max(INTERVAL_MS[interval] for interval in intervals)
+        start = to_epoch_ms(start) // coarsest * coarsest
+    base = store.read(pair, base_interval, columns=['open', 'high', 'low', 'close', 'volume'], start=start)
+    if base is None or base.empty:
+        return {}
+    frames = rebuild_intervals(base, intervals)
+    for interval, df in frames.items():
+        store.write(pair, interval, df)
+    return {interval: len(df) for interval, df in frames.items()}
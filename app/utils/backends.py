@@ -0,0 +1,181 @@
+import argparse
+import ast
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from .config import APP_DIR, PROJECT_ROOT
+
+# Backend name -> (modules to try in order, attribute to take from the first that imports; None for
+# the module itself). Nothing is imported until a model first asks for its backend.
+BACKENDS = {
+    'random_forest': (('sklearn.ensemble',), 'RandomForestRegressor'),
+    'gradient_boosting': (('sklearn.ensemble',), 'GradientBoostingRegressor'),
+    'xgboost': (('xgboost',), 'XGBRegressor'),
+    'arima': (('statsmodels.tsa.arima.model',), 'ARIMA'),
+    'prophet': (('fbprophet', 'prophet'), 'Prophet'),
+    'keras': (('keras',), None),
+    'stl': (('statsmodels.tsa.seasonal',), 'STL'),
+    'seasonal_decompose': (('statsmodels.tsa.seasonal',), 'seasonal_decompose'),
+    'pyplot': (('matplotlib.pyplot',), None),
+    'seaborn': (('seaborn',), None),
+    'train_test_split': (('sklearn.model_selection',), 'train_test_split'),
+}
+
+# Script a Streamlit worker runs; its top-level imports are what every session pays for before the first page
+APP_SCRIPT = os.path.join(APP_DIR, 'app.py')
+# Imported before every measurement, so the costs are those on top of what every page loads anyway
+BASELINE_MODULES = ('numpy', 'pandas')
+
+_loaded = {}
+_import_seconds = {}
+_lock = threading.Lock()
+
+
+def register_backend(name, modules, attribute=None):
+    """
+    Add (or replace) a backend; it is imported on first ``backend(name)``.
+
+    Args:
+    - modules (str or tuple of str): Module, or modules to try in order (e.g. a package and its old name).
+    - attribute (str): Object to take from the module, or ``None`` for the module itself.
+    """
+    with _lock:
+        BACKENDS[name] = ((modules,) if isinstance(modules, str) else tuple(modules), attribute)
+        _loaded.pop(name, None)
+
+
+def backend(name):
+    """The backend's class or module, imported (and timed) the first time it is asked for."""
+    value = _loaded.get(name)
+    if value is not None:
+        return value
+    modules, attribute = BACKENDS[name]
+    with _lock:
+        if name in _loaded:
+            return _loaded[name]
+        started = time.perf_counter()
+        errors = []
+        for module_name in modules:
+            try:
+                module = importlib.import_module(module_name)
+                break
+            except ImportError as error:
+                errors.append(f"{module_name}: {error}")
+        else:
+            raise ImportError(f"Backend {name!r} is not installed ({'; '.join(errors)})")
+        value = _loaded[name] = module if attribute is None else getattr(module, attribute)
+        _import_seconds[name] = time.perf_counter() - started
+    return value
+
+
+def loaded():
+    """Names of the backends imported by this process so far."""
+    return list(_loaded)
+
+
+def import_costs():
+    """Seconds each backend imported by this process took to import (0 if another one had loaded it)."""
+    return dict(_import_seconds)
+
+
+_MEASURE = """
+import importlib, json, resource, sys, time
+for name in {baseline!r}:
+    importlib.import_module(name)
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+error = None
+try:
+    for name in {modules!r}:
+        importlib.import_module(name)
+except ImportError as exc:
+    error = str(exc)
+seconds = time.perf_counter() - started
+json.dump({{'seconds': seconds, 'rss_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024,
+           'error': error}}, sys.stdout)
+"""
+
+
+def startup_modules(script=APP_SCRIPT):
+    """
+    Modules the app script imports at its top level, in order. The script runs from ``app/``, so its
+    ``utils.X`` imports are returned as ``app.utils.X``; imports inside functions and branches are not included.
+    """
+    with open(script) as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            name = f"app.{name}" if name.split('.')[0] == 'utils' else name
+            if name not in modules:
+                modules.append(name)
+    return modules
+
+
+def measure_import(modules, baseline=BASELINE_MODULES):
+    """
+    Import ``modules`` in a fresh interpreter (after ``baseline``) and measure the wall time and peak
+    resident memory it adds; a fresh process is the only way to see a cold import.
+
+    Returns:
+    - dict: ``seconds``, ``rss_mb`` and ``error`` (the ImportError message, or ``None``).
+    """
+    code = _MEASURE.format(baseline=tuple(baseline), modules=tuple(modules))
+    output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output)
+
+
+def benchmark(names=None, repeat=3):
+    """
+    Cold import costs: the app script's import chain (``startup_modules``) together, then every backend on its own.
+
+    Returns:
+    - dict: ``{'startup' or backend name: median seconds, rss_mb, error}`` (backends also name the ``module``).
+    """
+    def median(modules):
+        runs = sorted((measure_import(modules) for _ in range(repeat)), key=lambda run: run['seconds'])
+        return runs[len(runs) // 2]
+
+    results = {'startup': median(startup_modules())}
+    for name in names or BACKENDS:
+        # The first candidate module that is installed, as ``backend`` would pick it
+        for module in BACKENDS[name][0]:
+            results[name] = dict(median([module]), module=module)
+            if results[name]['error'] is None:
+                break
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app startup and per-backend import costs.")
+    parser.add_argument('--backends', default=None, help="Comma-separated backends (default: all).")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per measurement (median kept).")
+    parser.add_argument('--output', default=None, help="Also write the results as JSON to this path.")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.backends.split(',')] if args.backends else None
+    results = benchmark(names, args.repeat)
+    for name, result in results.items():
+        status = f" (not installed: {result['error']})" if result['error'] else ""
+        print(f"{name:>18}: {result['seconds'] * 1000:8.1f} ms, {result['rss_mb']:7.1f} MB{status}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'measured_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
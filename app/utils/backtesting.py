@@ -1 +1,237 @@
-# Backtesting strategy implementation
\ No newline at end of file
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from .backends import backend
+from .features import FeatureBuilder, sliding_windows
+from .online import UPDATE_DEFAULTS, extend_arima, finetune_network, warm_start_trees
+
+# Inputs of the folds a pool worker runs, set up once by ``_init_fold_worker``
+_fold_state = {}
+
+
+def walk_forward_folds(n, folds=5, min_train=0.5, gap=0):
+    """
+    Expanding-window folds over ``n`` time-ordered rows.
+
+    The test windows tile the rows after the first training window back to back; each fold trains on
+    every row up to ``gap`` rows before its test window, so no fold ever sees its own future.
+
+    Args:
+    - folds (int): Number of test windows.
+    - min_train (int or float): Rows of the first training window, or their share of ``n``.
+    - gap (int): Rows left out between a training window and its test window.
+
+    Returns:
+    - list of tuple: ``(train_end, test_start, test_end)`` row bounds, ``train_end + gap == test_start``.
+    """
+    first = int(n * min_train) if isinstance(min_train, float) else int(min_train)
+    size = (n - first - gap) // folds
+    if first < 1 or size < 1:
+        raise ValueError(f"{n} rows cannot hold {folds} test windows after {first} training rows")
+    bounds = []
+    for k in range(folds):
+        test_start = first + gap + k * size
+        test_end = n if k == folds - 1 else test_start + size
+        bounds.append((test_start - gap, test_start, test_end))
+    return bounds
+
+
+def prepare_inputs(df, model, params):
+    """Arrays every fold of ``model`` reads: the feature matrix of the tree models, the closes otherwise."""
+    from .forecasting_models import TREE_MODELS
+
+    if model in TREE_MODELS:
+        data = FeatureBuilder(lags=params['lags']).build(df)
+        return {'X': data.X, 'y': data.y, 'index': data.index}
+    return {'values': df['close'].to_numpy(dtype=np.float64), 'index': df.index}
+
+
+def fit_rows(model, params, inputs, end, previous=None, previous_end=0, n_jobs=None):
+    """
+    Artifact (as ``ForecastingModels.fit`` builds it) trained on rows ``[0, end)``.
+
+    With ``previous`` (an artifact trained on ``[0, previous_end)``) the fit is carried forward over
+    the rows in between instead: tree ensembles warm-start, ARIMA extends its state with the same
+    parameters and the LSTM fine-tunes with its original scaling. Prophet always refits.
+    """
+    from .forecasting_models import TREE_MODELS, build_lstm, make_estimator, train_network
+
+    if model in TREE_MODELS:
+        X, y = inputs['X'], inputs['y']
+        if previous is None:
+            return {'model': make_estimator(model, params, n_jobs).fit(X[:end], y[:end])}
+        return {'model': warm_start_trees(previous['model'], X[previous_end:end], y[previous_end:end],
+                                          UPDATE_DEFAULTS['trees_per_update'], UPDATE_DEFAULTS['max_trees'], n_jobs)}
+
+    values = inputs['values']
+    if model == 'arima':
+        if previous is None:
+            return {'model': backend('arima')(values[:end], order=tuple(params['order'])).fit()}
+        return {'model': extend_arima(previous['model'], values[previous_end:end])}
+    if model == 'lstm':
+        window = params['window']
+        if previous is None:
+            from sklearn.preprocessing import MinMaxScaler
+            # Scaled with the training rows only; the test rows must not set the range
+            scaler = MinMaxScaler().fit(values[:end].reshape(-1, 1))
+            x, y = sliding_windows(scaler.transform(values[:end].reshape(-1, 1))[:, 0], window)
+            network = build_lstm(params)
+            train_network(network, x, y, params)
+            return {'model': network, 'scaler': scaler}
+        scaler = previous['scaler']
+        history = values[max(previous_end - window, 0):end]
+        x, y = sliding_windows(scaler.transform(history.reshape(-1, 1))[:, 0], window)
+        return dict(previous, model=finetune_network(previous['model'], x, y, UPDATE_DEFAULTS['epochs'],
+                                                     params['batch_size']))
+    if model == 'prophet':
+        return {'model': backend('prophet')().fit(pd.DataFrame({'ds': inputs['index'][:end], 'y': values[:end]}))}
+    raise ValueError(f"Unknown model {model!r}")
+
+
+def predict_rows(model, params, inputs, artifact, train_end, start, end):
+    """
+    One-step-ahead predictions of rows ``[start, end)`` from an artifact trained on ``[0, train_end)``.
+
+    Each prediction only uses actual values before its row, like a live forecast refreshed every bar.
+
+    Returns:
+    - tuple: ``(actual, predicted)`` float64 arrays.
+    """
+    from .forecasting_models import TREE_MODELS
+
+    estimator = artifact['model']
+    if model in TREE_MODELS:
+        return inputs['y'][start:end].astype(np.float64), estimator.predict(inputs['X'][start:end])
+    values = inputs['values']
+    actual = values[start:end]
+    if model == 'arima':
+        # Filter through the gap and test rows with the fitted params; fitted values are one step ahead
+        predicted = extend_arima(estimator, values[train_end:end]).fittedvalues[start - train_end:]
+    elif model == 'lstm':
+        window, scaler = params['window'], artifact['scaler']
+        if start < window:
+            raise ValueError(f"The first test row needs {window} earlier rows")
+        # One window of the ``window`` previous closes per test row
+        x, _ = sliding_windows(scaler.transform(values[start - window:end].reshape(-1, 1))[:, 0], window)
+        predicted = scaler.inverse_transform(estimator.predict(x, verbose=0))
+    else:
+        predicted = estimator.predict(pd.DataFrame({'ds': inputs['index'][start:end]}))['yhat'].to_numpy()
+    return actual, np.asarray(predicted, dtype=np.float64).ravel()
+
+
+def _run_fold(model, params, fold, bounds, previous=None, previous_end=0, n_jobs=None, inputs=None):
+    """Fit and score one fold; returns its record, its predictions and the fitted artifact."""
+    from .forecasting_models import forecast_metrics
+
+    inputs = _fold_state['inputs'] if inputs is None else inputs
+    train_end, start, end = bounds
+    started = time.perf_counter()
+    artifact = fit_rows(model, params, inputs, train_end, previous, previous_end, n_jobs)
+    fitted = time.perf_counter()
+    actual, predicted = predict_rows(model, params, inputs, artifact, train_end, start, end)
+    predict_seconds = time.perf_counter() - fitted
+    index = inputs['index']
+    record = {
+        'fold': fold,
+        'train_rows': train_end,
+        'test_start': index[start],
+        'test_end': index[end - 1],
+        **forecast_metrics(actual, predicted),
+        'fit_seconds': fitted - started,
+        'predict_seconds': predict_seconds,
+        'latency_ms': predict_seconds / (end - start) * 1000,
+    }
+    predictions = pd.DataFrame({'actual': actual, 'predicted': predicted, 'fold': fold}, index=index[start:end])
+    return record, predictions, artifact
+
+
+def _init_fold_worker(threads, inputs):
+    from .batch import limit_threads
+
+    _fold_state.update(limits=limit_threads(threads), inputs=inputs)
+
+
+def _pool_fold(model, params, fold, bounds, n_jobs):
+    record, predictions, _ = _run_fold(model, params, fold, bounds, n_jobs=n_jobs)
+    return record, predictions
+
+
+def walk_forward(df, model, params=None, folds=5, min_train=0.5, gap=0, reuse=False, workers=None, threads=1):
+    """
+    Walk-forward (expanding-window) backtest of one forecaster.
+
+    Every fold fits on the bars before its test window and predicts each test bar one step ahead, so
+    the scores are what the model would have delivered live. Independent folds run in a process pool;
+    each worker receives the inputs once and caps its native threads at ``threads``. With ``reuse``
+    each fold instead carries the previous fold's fit forward over the new training bars (see
+    ``fit_rows``), which runs the folds in order but costs only the new bars per fold.
+
+    Args:
+    - df (DataFrame): Candles indexed by start time.
+    - params (dict): Overrides of ``MODEL_DEFAULTS[model]``.
+    - folds, min_train, gap: Fold layout (see ``walk_forward_folds``).
+    - workers (int): Processes for the folds (default: one per fold, within the cores); 1 runs in-process.
+
+    Returns:
+    - tuple: ``(folds, predictions)`` - one row per fold (error, fit and prediction time, per-bar
+      latency) and the actual and predicted values of every test bar.
+    """
+    from .forecasting_models import MODEL_DEFAULTS
+
+    params = {**MODEL_DEFAULTS[model], **(params or {})}
+    inputs = prepare_inputs(df, model, params)
+    bounds = walk_forward_folds(len(inputs['index']), folds, min_train, gap)
+    workers = workers or min(len(bounds), max(1, (os.cpu_count() or 1) // threads))
+
+    results = []
+    if reuse or workers == 1:
+        previous, previous_end = None, 0
+        for fold, fold_bounds in enumerate(bounds):
+            record, predictions, artifact = _run_fold(model, params, fold, fold_bounds, previous, previous_end,
+                                                      threads, inputs)
+            results.append((record, predictions))
+            if reuse:
+                previous, previous_end = artifact, fold_bounds[0]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                                 initializer=_init_fold_worker, initargs=(threads, inputs)) as executor:
+            futures = [executor.submit(_pool_fold, model, params, fold, fold_bounds, threads)
+                       for fold, fold_bounds in enumerate(bounds)]
+            results = [future.result() for future in futures]
+
+    records = pd.DataFrame([record for record, _ in results]).set_index('fold')
+    return records, pd.concat([predictions for _, predictions in results])
+
+
+def compare(df, models, params=None, **options):
+    """
+    Walk-forward every model on the same folds and summarize.
+
+    Args:
+    - models (list of str): Models to compare.
+    - params (dict): ``{model: param overrides}``.
+    - options: Passed to ``walk_forward``.
+
+    Returns:
+    - DataFrame: Per model, the mean and spread of the fold errors, total fit time, mean per-bar
+      prediction latency and wall-clock time of the backtest.
+    """
+    rows = {}
+    for model in models:
+        started = time.perf_counter()
+        folds, _ = walk_forward(df, model, (params or {}).get(model), **options)
+        rows[model] = {
+            'mae': folds['mae'].mean(),
+            'mae_std': folds['mae'].std(),
+            'rmse': folds['rmse'].mean(),
+            'mape': folds['mape'].mean(),
+            'fit_seconds': folds['fit_seconds'].sum(),
+            'latency_ms': folds['latency_ms'].mean(),
+            'wall_seconds': time.perf_counter() - started,
+        }
+    return pd.DataFrame.from_dict(rows, orient='index').sort_values('mae')
@@ -0,0 +1,231 @@
+import argparse
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .candle_store import open_store
+from .catalog import DataCatalog
+from .config import INTERVALS, PAIRS, RESULTS_DIR
+from .model_registry import ModelRegistry
+from .training import DEFAULT_JOBS, plan_jobs, split_list, train
+
+# Thread-pool sizes of the native libraries (OpenMP, OpenBLAS, MKL, Accelerate, numexpr, TensorFlow)
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS',
+                    'NUMEXPR_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS')
+INPUT_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Per-process state of a batch worker, set up once by ``_init_worker``
+_worker = {}
+
+
+def thread_env(threads):
+    return {name: str(threads) for name in THREAD_VARIABLES}
+
+
+def new_run_id():
+    """Sortable run identifier: UTC time of the run plus a short random suffix."""
+    return f"{pd.Timestamp.now(tz='UTC'):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ResultsStore:
+    """
+    Forecasts and metrics of batch runs, on Parquet.
+
+    Each job writes its forecast to ``forecasts/pair=<pair>/interval=<interval>/model=<model>/<run>.parquet``
+    and each run writes one table of job records (status, model version, holdout and online metrics,
+    timings) to ``runs/<run>.parquet``. Run ids sort chronologically, so the newest file is the latest.
+    """
+
+    def __init__(self, root=RESULTS_DIR):
+        """
+        Args:
+        - root (str): Directory holding the results.
+        """
+        self.root = root
+
+    def forecast_path(self, pair, interval, model):
+        return os.path.join(self.root, 'forecasts', f"pair={pair}", f"interval={interval}", f"model={model}")
+
+    def write_forecast(self, run_id, pair, interval, model, forecast, version=None):
+        """Store one job's forecast (a frame indexed by bar start time) under the run id."""
+        df = forecast.rename_axis('startTime').reset_index().assign(run_id=run_id, version=version)
+        return _write_parquet(df, os.path.join(self.forecast_path(pair, interval, model), f"{run_id}.parquet"))
+
+    def latest_forecast(self, pair, interval, model):
+        """Most recent stored forecast, indexed by start time, or ``None``."""
+        path = self.forecast_path(pair, interval, model)
+        runs = sorted(name for name in os.listdir(path) if name.endswith('.parquet')) if os.path.isdir(path) else []
+        if not runs:
+            return None
+        return pq.read_table(os.path.join(path, runs[-1])).to_pandas().set_index('startTime')
+
+    def write_run(self, run_id, records):
+        return _write_parquet(pd.DataFrame(records).assign(run_id=run_id),
+                              os.path.join(self.root, 'runs', f"{run_id}.parquet"))
+
+    def runs(self):
+        """Job records of every stored run, oldest first."""
+        path = os.path.join(self.root, 'runs')
+        names = sorted(name for name in os.listdir(path) if name.endswith('.parquet')) if os.path.isdir(path) else []
+        if not names:
+            return pd.DataFrame()
+        return pd.concat([pq.read_table(os.path.join(path, name)).to_pandas() for name in names], ignore_index=True)
+
+
+def limit_threads(threads):
+    """
+    Cap this process's native thread pools at ``threads``; call first thing in a pool worker.
+
+    Libraries loaded later (TensorFlow, XGBoost's OpenMP) read the environment variables; the BLAS
+    and OpenMP pools numpy and scikit-learn already loaded are resized in place. Keep the returned
+    limiter alive for as long as the cap should hold.
+    """
+    os.environ.update(thread_env(threads))
+    from threadpoolctl import threadpool_limits
+    return threadpool_limits(limits=threads)
+
+
+def _init_worker(threads, store_class, store_root, model_root, results_root):
+    _worker.update(limits=limit_threads(threads), threads=threads, store=store_class(store_root), registry=ModelRegistry(model_root),
+                   results=ResultsStore(results_root))
+
+
+def _run_job(run_id, pair, interval, model, mode, force, min_new_bars, keep):
+    """Bring one model up to date and store its forecast; runs in a worker, returns the job record."""
+    started = time.perf_counter()
+    record = {'pair': pair, 'interval': interval, 'model': model}
+    try:
+        from .forecasting_models import ForecastingModels
+
+        # Read in the worker: only job keys cross the process boundary, and with the mmap backend
+        # every worker maps the same page-cached column files instead of receiving a copy
+        df = _worker['store'].read(pair, interval, columns=INPUT_COLUMNS)
+        registry, threads = _worker['registry'], _worker['threads']
+        meta, trained = train(registry, df, pair, interval, model, force=force, min_new_bars=min_new_bars,
+                              mode=mode, n_jobs=threads)
+        artifact, _ = registry.load(pair, interval, model, meta['params'], meta['version'])
+        forecast = ForecastingModels(df, interval, pair, n_jobs=threads).forecast(model, artifact, meta['params'], meta)
+        _worker['results'].write_forecast(run_id, pair, interval, model, forecast, meta['version'])
+        if keep:
+            registry.prune(pair, interval, model, meta['params'], keep=keep)
+        status = ("updated" if meta.get('parent') else "trained") if trained else "up to date"
+        record.update(status=status, version=meta['version'], data_end=meta['data']['end'],
+                      fit_seconds=meta.get('update_seconds', meta.get('fit_seconds')),
+                      **{f"holdout_{name}": value for name, value in meta['metrics'].items()},
+                      **{f"online_{name}": value for name, value in (meta.get('online_metrics') or {}).items()})
+    except Exception as error:
+        record.update(status='error', error=f"{type(error).__name__}: {error}")
+    record['seconds'] = time.perf_counter() - started
+    return record
+
+
+def run_batch(jobs, workers=None, threads=1, mode='auto', force=False, min_new_bars=1, keep=3, store=None,
+              registry=None, results=None, run_id=None, progress=print):
+    """
+    Train and forecast every ``(pair, interval, model)`` job across a process pool.
+
+    Each worker caps its native thread pools at ``threads`` and passes the same ``n_jobs`` to the
+    models, so ``workers * threads`` stays within the cores instead of every process spawning a
+    thread per core. Jobs are ordered by their last recorded fit time, longest (or never fit) first,
+    so slow models do not start last and hold up the run.
+
+    Args:
+    - jobs (list of tuple): ``(pair, interval, model)`` combinations (see ``plan_jobs``).
+    - workers (int): Worker processes (default: the cores divided by ``threads``).
+    - mode, force, min_new_bars: Passed to ``train``.
+    - keep (int): Registry versions kept per model after the run (0 keeps all).
+    - store: Candle store the workers read (default: ``open_store()``); they reopen it by class and root.
+
+    Returns:
+    - DataFrame: One record per job, also written to the results store as the run table.
+    """
+    registry = registry or ModelRegistry()
+    results = results or ResultsStore()
+    run_id = run_id or new_run_id()
+    workers = workers or max(1, (os.cpu_count() or 1) // threads)
+    store = store or open_store()
+
+    records, runnable, catalogs = [], [], {}
+    for pair, interval, model in jobs:
+        # Seed empty series here, once, rather than racing to do it from several workers
+        catalog = catalogs.setdefault(pair, DataCatalog(store, pair))
+        if catalog.available(interval):
+            runnable.append((pair, interval, model))
+        else:
+            records.append({'pair': pair, 'interval': interval, 'model': model, 'status': 'no data', 'seconds': 0.0})
+
+    fit_seconds = {}
+    for meta in registry.entries():
+        key = (meta['pair'], meta['interval'], meta['model'])
+        fit_seconds[key] = max(fit_seconds.get(key, 0.0), meta.get('fit_seconds') or 0.0)
+    runnable.sort(key=lambda job: fit_seconds.get(job, float('inf')), reverse=True)
+
+    if runnable:
+        context = get_context('spawn')  # No forked copies of the parent's thread pools or TensorFlow state
+        with ProcessPoolExecutor(max_workers=min(workers, len(runnable)), mp_context=context,
+                                 initializer=_init_worker,
+                                 initargs=(threads, type(store), store.root, registry.root, results.root)) as executor:
+            futures = {executor.submit(_run_job, run_id, pair, interval, model, mode, force, min_new_bars, keep):
+                       (pair, interval, model) for pair, interval, model in runnable}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as error:
+                    # The worker died (e.g. BrokenProcessPool after a crash or an OOM kill): record the job
+                    # as failed and keep going, so the run table is still written
+                    pair, interval, model = futures[future]
+                    record = {'pair': pair, 'interval': interval, 'model': model, 'status': 'error',
+                              'error': f"{type(error).__name__}: {error}", 'seconds': 0.0}
+                records.append(record)
+                if progress:
+                    progress(f"{record['pair']} {record['interval']} {record['model']}: {record['status']} "
+                             f"in {record['seconds']:.1f}s{' - ' + record['error'] if 'error' in record else ''}")
+
+    table = pd.DataFrame(records)
+    results.write_run(run_id, records)
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and forecast models x intervals x pairs in parallel.")
+    parser.add_argument('--pairs', default=','.join(PAIRS), help="Comma-separated pairs (default: PI42_PAIRS).")
+    parser.add_argument('--models', default=','.join(DEFAULT_JOBS), help="Comma-separated models.")
+    parser.add_argument('--intervals', default=None,
+                        help="Run every model on these intervals instead of each model's default one.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: cores / threads).")
+    parser.add_argument('--threads', type=int, default=1, help="Native threads per worker.")
+    parser.add_argument('--mode', choices=('auto', 'refit', 'update'), default='auto', help="See training.train.")
+    parser.add_argument('--force', action='store_true', help="Retrain even if the latest version is current.")
+    parser.add_argument('--min-new-bars', type=int, default=1, help="New candles that make a model stale.")
+    parser.add_argument('--keep', type=int, default=3, help="Versions kept per model and params.")
+    parser.add_argument('--nightly', action='store_true',
+                        help="Full refresh: refit every model on every interval of every pair, one worker per core.")
+    args = parser.parse_args(argv)
+
+    intervals = INTERVALS if args.nightly else split_list(args.intervals)
+    jobs = plan_jobs(split_list(args.pairs), split_list(args.models), intervals)
+    if args.nightly:
+        args.mode, args.force, args.threads, args.workers = 'refit', True, 1, os.cpu_count()
+
+    started = time.perf_counter()
+    table = run_batch(jobs, args.workers, args.threads, args.mode, args.force, args.min_new_bars, args.keep)
+    counts = table['status'].value_counts().to_dict() if len(table) else {}
+    print(f"{len(jobs)} jobs in {time.perf_counter() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
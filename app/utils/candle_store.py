@@ -0,0 +1,175 @@
+import numbers
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .config import CANDLE_BACKEND, STORE_DIR
+
+# Partition key shared by every series: one directory per UTC day
+DATE_PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+# Every partition is written with these types, so integer-priced CSV imports and float live candles mix
+CANDLE_SCHEMA = pa.schema([
+    ('startTime', pa.int64()),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('endTime', pa.int64()),
+    ('volume', pa.float64()),
+])
+
+
+def to_epoch_ms(value):
+    """Accept epoch milliseconds, datetimes, Timestamps or date strings and return epoch milliseconds."""
+    if value is None or isinstance(value, numbers.Real):
+        return value
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+def candle_table(df):
+    """Convert candles to an Arrow table, casting the known candle columns to ``CANDLE_SCHEMA``."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, name in enumerate(table.column_names):
+        if name in CANDLE_SCHEMA.names:
+            field = CANDLE_SCHEMA.field(name)
+            table = table.set_column(i, field, table.column(i).cast(field.type))
+    return table
+
+
+def candles_to_frame(df):
+    """Index candles by ``startTime`` as datetimes, the shape every page of the app works with."""
+    df = df.copy()
+    df['startTime'] = pd.to_datetime(df['startTime'], unit='ms')
+    if 'endTime' in df:
+        df['endTime'] = pd.to_datetime(df['endTime'], unit='ms')
+    return df.set_index('startTime')
+
+
+class CandleStore:
+    """
+    Columnar candle store on Parquet, partitioned as ``pair=<pair>/interval=<interval>/date=<YYYY-MM-DD>``.
+
+    Reads only touch the day partitions overlapping the requested range and only decode the requested
+    columns; row filters on ``startTime`` are pushed down to the Parquet row-group statistics.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        """
+        Args:
+        - root (str): Directory holding the partitioned dataset.
+        """
+        self.root = root
+
+    def series_path(self, pair, interval):
+        return os.path.join(self.root, f"pair={pair}", f"interval={interval}")
+
+    def has(self, pair, interval):
+        path = self.series_path(pair, interval)
+        return os.path.isdir(path) and any(name.startswith('date=') for name in os.listdir(path))
+
+    def pairs(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(self.root) if name.startswith('pair='))
+
+    def intervals(self, pair):
+        path = os.path.join(self.root, f"pair={pair}")
+        if not os.path.isdir(path):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(path) if name.startswith('interval='))
+
+    def write(self, pair, interval, df):
+        """
+        Upsert candles into their day partitions, keeping the latest copy of each ``startTime``.
+
+        Args:
+        - df (DataFrame): Candles with an epoch-millisecond ``startTime`` column (as fetched from the API).
+
+        Returns:
+        - int: Number of day partitions rewritten.
+        """
+        if df is None or df.empty:
+            return 0
+        df = df.reset_index() if 'startTime' not in df.columns else df
+        if not pd.api.types.is_integer_dtype(df['startTime']):
+            df = df.copy()
+            for column in ['startTime', 'endTime']:
+                if column in df and not pd.api.types.is_integer_dtype(df[column]):
+                    df[column] = pd.to_datetime(df[column]).astype('int64') // 1_000_000
+        days = pd.to_datetime(df['startTime'], unit='ms').dt.strftime('%Y-%m-%d')
+
+        for day, part in df.groupby(days.values, sort=True):
+            directory = os.path.join(self.series_path(pair, interval), f"date={day}")
+            path = os.path.join(directory, 'part-0.parquet')
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path):
+                part = pd.concat([pq.read_table(path).to_pandas(), part], ignore_index=True)
+            part = part.drop_duplicates('startTime', keep='last').sort_values('startTime')
+            tmp_path = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+            pq.write_table(candle_table(part), tmp_path)
+            os.replace(tmp_path, path)
+        return days.nunique()
+
+    def import_csv(self, pair, interval, path):
+        """Load a raw ``<pair>_<interval>_data.csv`` file into the store."""
+        return self.write(pair, interval, pd.read_csv(path))
+
+    def read_table(self, pair, interval, columns=None, start=None, end=None):
+        """
+        Read a time range of one series as an Arrow table.
+
+        Args:
+        - columns (list of str): Columns to decode; ``startTime`` is always included.
+        - start, end: Inclusive ``startTime`` bounds (epoch ms, datetime or date string); ``None`` is open.
+        """
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        if columns is not None:
+            columns = ['startTime'] + [column for column in columns if column != 'startTime']
+        if not self.has(pair, interval):
+            return None
+
+        dataset = ds.dataset(self.series_path(pair, interval), format='parquet', partitioning=DATE_PARTITIONING,
+                             schema=CANDLE_SCHEMA.append(pa.field('date', pa.string())))
+        condition = None
+        if start is not None:
+            day = pd.Timestamp(start, unit='ms').strftime('%Y-%m-%d')
+            condition = (ds.field('date') >= day) & (ds.field('startTime') >= start)
+        if end is not None:
+            day = pd.Timestamp(end, unit='ms').strftime('%Y-%m-%d')
+            upper = (ds.field('date') <= day) & (ds.field('startTime') <= end)
+            condition = upper if condition is None else condition & upper
+        if columns is None:
+            columns = [name for name in dataset.schema.names if name != 'date']
+        return dataset.to_table(columns=columns, filter=condition).sort_by('startTime')
+
+    def read(self, pair, interval, columns=None, start=None, end=None):
+        """Read a time range of one series as a DataFrame indexed by ``startTime`` datetimes."""
+        table = self.read_table(pair, interval, columns, start, end)
+        if table is None:
+            return None
+        return candles_to_frame(table.to_pandas())
+
+    def last_start_time(self, pair, interval):
+        """``startTime`` of the newest stored candle, read from the last day partition only."""
+        if not self.has(pair, interval):
+            return None
+        path = self.series_path(pair, interval)
+        last_day = max(name for name in os.listdir(path) if name.startswith('date='))
+        table = pq.read_table(os.path.join(path, last_day, 'part-0.parquet'), columns=['startTime'])
+        return int(pc.max(table['startTime']).as_py())
+
+
+def open_store(backend=CANDLE_BACKEND):
+    """
+    Open the configured candle backend; both expose ``has``, ``pairs``, ``intervals``, ``write``, ``read``,
+    ``last_start_time`` and ``import_csv``.
+    """
+    if backend == 'mmap':
+        from .mmap_store import MmapCandleStore
+        return MmapCandleStore()
+    return CandleStore()
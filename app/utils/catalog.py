@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .candle_store import to_epoch_ms
+from .config import APP_DIR, INTERVALS, PAIR
+from .time_index import TimeIndex
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def compact_frame(df):
+    """
+    Downcast a candle frame to the smallest dtypes that hold it exactly.
+
+    Integer-valued prices become ``int32`` when they fit (BTCINR trades around 5-6 million INR) and
+    ``int64`` otherwise; fractional prices keep their dtype, since ``float32`` cannot represent them
+    to the rupee. Volume becomes ``float32``. ``endTime`` is dropped: it is always ``startTime`` plus the interval, so the
+    ``startTime`` index (an int64 datetime) is the only timestamp kept.
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column == 'endTime':
+            continue
+        if column in PRICE_COLUMNS and pd.api.types.is_numeric_dtype(values):
+            as_int = values.to_numpy()
+            if values.dtype.kind == 'f' and not np.array_equal(as_int, np.round(as_int)):
+                columns[column] = values
+                continue
+            info = np.iinfo(np.int32)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                columns[column] = values.astype('int32')
+            else:
+                columns[column] = values.astype('int64')
+        elif column == 'volume':
+            columns[column] = values.astype('float32')
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+class DataCatalog(Mapping):
+    """
+    Read-only ``{interval: DataFrame}`` mapping that loads an interval on first access.
+
+    Frames are compacted with ``compact_frame`` and held once per process, so every Streamlit session
+    served by the worker shares them. Pages that show a single interval only ever load that one.
+    A cached interval is re-read once the store holds candles after its last row, so a long-running
+    app picks up every sync.
+    """
+
+    def __init__(self, store, pair=PAIR, intervals=INTERVALS, seed_dir=APP_DIR, check_interval=5.0):
+        """
+        Args:
+        - store: Candle store (either backend) the intervals are read from.
+        - pair (str): Pair whose intervals the catalog exposes.
+        - intervals (list of str): Keys of the mapping, in display order.
+        - seed_dir (str): Directory with ``<pair>_<interval>_data.csv`` exports used to seed an empty store.
+        - check_interval (float): Seconds between checks of the store for newer candles, per interval.
+        """
+        self.store = store
+        self.pair = pair
+        self.intervals = list(intervals)
+        self.seed_dir = seed_dir
+        self._frames = {}
+        self._indexes = {}
+        self._checked = {}
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+
+    def __getitem__(self, interval):
+        if interval not in self.intervals:
+            raise KeyError(interval)
+        frame = self._frames.get(interval)
+        if frame is not None and self._stale(interval, frame):
+            self.invalidate(interval)
+            frame = None
+        if frame is None:
+            with self._lock:
+                frame = self._frames.get(interval)
+                if frame is None:
+                    frame = self._frames[interval] = self._load(interval)
+                    self._checked[interval] = time.monotonic()
+        return frame
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def _stale(self, interval, frame):
+        """Whether the store gained candles after ``frame``; asks the store at most every ``check_interval``."""
+        now = time.monotonic()
+        if now - self._checked.get(interval, now) < self.check_interval:
+            return False
+        self._checked[interval] = now
+        last = self.store.last_start_time(self.pair, interval)
+        return last is not None and last > to_epoch_ms(frame.index[-1])
+
+    def available(self, interval):
+        """Whether the store holds ``interval``, seeding it from the CSV export first if it is empty."""
+        if not self.store.has(self.pair, interval):
+            seed = os.path.join(self.seed_dir, f"{self.pair}_{interval}_data.csv")
+            if os.path.exists(seed):
+                self.store.import_csv(self.pair, interval, seed)
+        return self.store.has(self.pair, interval)
+
+    def _load(self, interval):
+        self.available(interval)
+        df = self.store.read(self.pair, interval)
+        if df is None:
+            raise KeyError(interval)
+        return compact_frame(df)
+
+    def index(self, interval):
+        """``TimeIndex`` of a loaded interval, built once alongside its frame."""
+        frame = self[interval]  # Reloading a stale frame drops its index too
+        index = self._indexes.get(interval)
+        if index is None:
+            index = self._indexes[interval] = TimeIndex.from_frame(frame, interval)
+        return index
+
+    def window(self, interval, start=None, end=None):
+        """Rows of a cached interval inside ``[start, end]``, located by binary search."""
+        frame = self[interval]
+        return self.index(interval).window(frame, start, end)
+
+    def read(self, interval, columns=None, start=None, end=None):
+        """Uncached read of a column subset or time range straight from the store."""
+        df = self.store.read(self.pair, interval, columns=columns, start=start, end=end)
+        return None if df is None else compact_frame(df)
+
+    def loaded(self):
+        return [interval for interval in self.intervals if interval in self._frames]
+
+    def invalidate(self, interval=None):
+        """Drop cached frames so the next access re-reads the store (e.g. after a sync)."""
+        with self._lock:
+            if interval is None:
+                self._frames.clear()
+                self._indexes.clear()
+            else:
+                self._frames.pop(interval, None)
+                self._indexes.pop(interval, None)
+
+    def memory_usage(self):
+        """Resident bytes of every loaded interval, plus a ``'total'`` entry."""
+        usage = {interval: int(df.memory_usage(index=True, deep=True).sum()) for interval, df in self._frames.items()}
+        usage['total'] = sum(usage.values())
+        return usage
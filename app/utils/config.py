@@ -1 +1,41 @@
-# Configuration file for API keys and env variables
\ No newline at end of file
+# Configuration file for API keys and env variables
+import os
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+APP_DIR = os.path.join(PROJECT_ROOT, 'app')
+
+# Exchange endpoints; point them at `python -m app.utils.standin` to run without network
+REST_URL = os.environ.get('PI42_REST_URL', 'https://api.pi42.com')
+KLINE_URL = f"{REST_URL}/v1/market/klines"
+WS_URL = os.environ.get('PI42_WS_URL', 'wss://api.pi42.com/v1/market/ws')
+
+# Local data locations, overridable so several checkouts/workers can share one store
+DATA_DIR = os.environ.get('PI42_DATA_DIR', os.path.join(PROJECT_ROOT, '.data'))
+STORE_DIR = os.environ.get('PI42_STORE_DIR', os.path.join(DATA_DIR, 'store'))
+ROLLUP_DIR = os.environ.get('PI42_ROLLUP_DIR', os.path.join(DATA_DIR, 'rollups'))
+MODEL_DIR = os.environ.get('PI42_MODEL_DIR', os.path.join(DATA_DIR, 'models'))
+RESULTS_DIR = os.environ.get('PI42_RESULTS_DIR', os.path.join(DATA_DIR, 'results'))
+
+# 'parquet' for the partitioned CandleStore, 'mmap' for the shared memory-mapped column files
+CANDLE_BACKEND = os.environ.get('PI42_CANDLE_BACKEND', 'parquet')
+
+PAIR = 'BTCINR'
+# Pairs synced, streamed and compared across; PAIR stays the default of the single-pair pages
+PAIRS = [pair.strip() for pair in os.environ.get('PI42_PAIRS', PAIR).split(',') if pair.strip()]
+INTERVALS = ['5m', '15m', '30m', '1h', '6h', '12h']
+
+# Candle length of every interval the kline endpoint serves, in milliseconds
+INTERVAL_MS = {
+    "1m": 60_000,
+    "3m": 3 * 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1h": 60 * 60_000,
+    "2h": 2 * 60 * 60_000,
+    "4h": 4 * 60 * 60_000,
+    "6h": 6 * 60 * 60_000,
+    "8h": 8 * 60 * 60_000,
+    "12h": 12 * 60 * 60_000,
+    "1d": 24 * 60 * 60_000,
+}
@@ -0,0 +1,220 @@
+import time
+
+import numpy as np
+
+from .aggregator import start_times_ms
+from .candle_store import to_epoch_ms
+from .config import INTERVAL_MS
+
+# Peak working memory of one chunk of windowed sums; sets how many rows are processed at once
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def align_closes(frames, pairs, interval, start=None, end=None):
+    """
+    Place the close prices of several pairs on one shared grid of ``interval`` bars.
+
+    Args:
+    - frames (dict): ``{pair: candle frame}`` (raw or store frames); pairs may be missing or empty.
+    - pairs (list of str): Column order of the result.
+    - start, end: Grid bounds (epoch ms or anything ``to_epoch_ms`` accepts); default to the union span.
+
+    Returns:
+    - tuple: ``(times, closes)`` - epoch-ms grid (T,) and float64 closes (T, N), NaN where a pair has no bar.
+    """
+    step = INTERVAL_MS[interval]
+    series = {}
+    for pair in pairs:
+        df = frames.get(pair)
+        if df is not None and len(df):
+            series[pair] = (start_times_ms(df), df['close'].to_numpy(dtype=np.float64))
+    start, end = to_epoch_ms(start), to_epoch_ms(end)
+    if start is None:
+        start = min((times[0] for times, _ in series.values()), default=0)
+    if end is None:
+        end = max((times[-1] for times, _ in series.values()), default=start - step)
+    start = -(-start // step) * step
+    times = np.arange(start, end + 1, step, dtype=np.int64)
+    closes = np.full((len(times), len(pairs)), np.nan)
+    for column, pair in enumerate(pairs):
+        if pair not in series:
+            continue
+        pair_times, values = series[pair]
+        positions = (pair_times - start) // step
+        inside = (positions >= 0) & (positions < len(times)) & (pair_times % step == 0)
+        closes[positions[inside], column] = values[inside]
+    return times, closes
+
+
+def iter_aligned(store, pairs, interval, start, end=None, chunk_rows=20_000):
+    """
+    Stream aligned closes out of a candle store in time chunks of ``chunk_rows`` bars.
+
+    Only the range of each chunk is read for each pair, so memory is bounded by the chunk size and
+    not by the history kept.
+
+    Yields:
+    - tuple: ``(times, closes)`` as returned by ``align_closes``.
+    """
+    step = INTERVAL_MS[interval]
+    start = to_epoch_ms(start) // step * step
+    end = to_epoch_ms(end) if end is not None else int(time.time() * 1000)
+    while start <= end:
+        chunk_end = min(start + chunk_rows * step - 1, end)
+        frames = {pair: store.read(pair, interval, columns=['close'], start=start, end=chunk_end)
+                  for pair in pairs if store.has(pair, interval)}
+        yield align_closes(frames, pairs, interval, start, chunk_end)
+        start = chunk_end + 1
+
+
+def _window_sums(tensor, window):
+    """Sums over every ``window`` consecutive rows: ``(L, ...) -> (L - window + 1, ...)``, via a running sum."""
+    running = np.cumsum(tensor, axis=0, out=tensor)
+    sums = running[window - 1:].copy()
+    sums[1:] -= running[:-window]
+    return sums
+
+
+class RollingCrossStats:
+    """
+    Rolling pairwise covariance, correlation and beta of N pairs' log returns, fed chunk by chunk.
+
+    Every window statistic comes from windowed sums of ``x_i * x_j``, ``x_i``, ``x_i ** 2`` and the
+    joint-presence counts, each computed for a whole chunk with one ``einsum`` and one running sum. So
+    a chunk costs O(rows * N^2) vectorized work and no per-row Python. Statistics are pairwise-complete:
+    a pair listed later, or a gap in one series, only drops the rows missing from that pair of columns.
+    The last ``window - 1`` returns and the last closes are carried between chunks, so results are
+    identical however the series is chunked, and live bars can be appended the same way.
+    """
+
+    def __init__(self, pairs, window, benchmark=None, min_periods=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+        - pairs (list of str): Column order of the closes passed to ``update``.
+        - window (int): Rolling window, in bars.
+        - benchmark (str): Pair the betas are measured against; ``None`` skips betas.
+        - min_periods (int): Joint observations needed before a statistic is reported (default: ``window // 2``).
+        - max_bytes (int): Working-memory budget; larger inputs are split into sub-chunks.
+        """
+        self.pairs = list(pairs)
+        self.window = window
+        self.benchmark = None if benchmark is None else self.pairs.index(benchmark)
+        self.min_periods = min_periods or max(2, window // 2)
+        n = len(self.pairs)
+        # Four (rows, N, N) float64 tensors, plus the running-sum copy, per row
+        self.chunk_rows = max(window, max_bytes // (6 * 8 * n * n))
+        self.last_close = np.full(n, np.nan)
+        self.carry = np.empty((0, n))
+
+    def returns(self, closes):
+        """Log returns of the closes, continuing from the last close of the previous chunk."""
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) == 0:
+            return closes
+        previous = np.vstack([self.last_close, closes[:-1]])
+        self.last_close = closes[-1].copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.log(closes / previous)
+
+    def update(self, closes, matrices=True):
+        """
+        Fold in the next rows of aligned closes.
+
+        Args:
+        - closes (array): ``(T, N)`` closes in ``pairs`` order, NaN where a pair has no bar.
+        - matrices (bool): Return the per-row ``(T, N, N)`` covariance/correlation matrices; when
+          ``False`` only the last row's matrices are returned (the betas are always per row).
+
+        Returns:
+        - dict: ``cov`` and ``corr`` (float32), ``beta`` ((T, N) float32, or ``None`` without benchmark).
+        """
+        returns = self.returns(closes)
+        parts = [self._update_rows(returns[i:i + self.chunk_rows], matrices)
+                 for i in range(0, max(len(returns), 1), self.chunk_rows)]
+        if matrices:
+            cov = np.concatenate([part['cov'] for part in parts])
+            corr = np.concatenate([part['corr'] for part in parts])
+        else:
+            cov, corr = parts[-1]['cov'], parts[-1]['corr']
+        beta = None if self.benchmark is None else np.concatenate([part['beta'] for part in parts])
+        return {'cov': cov, 'corr': corr, 'beta': beta}
+
+    def _update_rows(self, returns, matrices):
+        rows = np.vstack([self.carry, returns])
+        self.carry = rows[max(len(rows) - (self.window - 1), 0):]
+        n_pairs = len(self.pairs)
+        if len(returns) == 0:
+            empty = np.full((0, n_pairs, n_pairs), np.nan, dtype=np.float32)
+            return {'cov': empty, 'corr': empty, 'beta': np.empty((0, n_pairs), dtype=np.float32)}
+        # Pad so the first window of this chunk is complete (with missing rows) even at the very start
+        pad = self.window - 1 - (len(rows) - len(returns))
+        if pad > 0:
+            rows = np.vstack([np.full((pad, n_pairs), np.nan), rows])
+        present = ~np.isnan(rows)
+        x = np.where(present, rows, 0.0)
+        mask = present.astype(np.float64)
+        products = [(mask, mask), (x, mask), (x * x, mask), (x, x)]  # count, sum x_i, sum x_i^2, sum x_i x_j
+
+        if matrices:
+            sums = [_window_sums(np.einsum('ti,tj->tij', a, b), self.window) for a, b in products]
+        else:
+            # Only the newest window: O(window * N^2) instead of O(rows * N^2)
+            sums = [np.einsum('ti,tj->ij', a[-self.window:], b[-self.window:])[None] for a, b in products]
+        cov, var = self._moments(*sums)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.sqrt(var * np.swapaxes(var, -1, -2)), -1, 1)
+
+        beta = None
+        if self.benchmark is not None:
+            # Per-row betas only need the benchmark's column of each sum: O(rows * N)
+            b = self.benchmark
+            x_b, mask_b = x[:, b:b + 1], mask[:, b:b + 1]
+            count = _window_sums(mask * mask_b, self.window)
+            sum_x = _window_sums(x * mask_b, self.window)
+            sum_x_b = _window_sums(x_b * mask, self.window)
+            sum_xx_b = _window_sums(x_b * x_b * mask, self.window)
+            sum_xy = _window_sums(x * x_b, self.window)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                valid = count >= self.min_periods
+                cov_b = (sum_xy - sum_x * sum_x_b / count) / (count - 1)
+                var_b = (sum_xx_b - sum_x_b ** 2 / count) / (count - 1)
+                beta = np.where(valid, cov_b / var_b, np.nan).astype(np.float32)
+        return {'cov': cov.astype(np.float32), 'corr': corr.astype(np.float32), 'beta': beta}
+
+    def _moments(self, count, sum_x, sum_xx, sum_xy):
+        """Pairwise covariance and the variance of ``i`` over the rows where ``j`` is present, from window sums."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            valid = count >= self.min_periods
+            cov = (sum_xy - sum_x * np.swapaxes(sum_x, -1, -2) / count) / (count - 1)
+            var = (sum_xx - sum_x ** 2 / count) / (count - 1)
+        return np.where(valid, cov, np.nan), np.where(valid, var, np.nan)
+
+
+def cross_asset_stats(store, pairs, interval, window, start, end=None, benchmark=None, chunk_rows=20_000):
+    """
+    Rolling betas over a whole stored history, plus the latest covariance and correlation matrices.
+
+    Reads the store in time chunks (see ``iter_aligned``) and keeps only the (T, N) betas, so memory
+    stays bounded for dozens of pairs over years of 5m bars.
+
+    Returns:
+    - dict: ``pairs``, ``times`` (epoch ms), ``beta`` ((T, N) float32 or ``None``), ``cov`` and ``corr`` (N, N).
+    """
+    stats = RollingCrossStats(pairs, window, benchmark)
+    times, betas, last = [], [], None
+    for chunk_times, closes in iter_aligned(store, pairs, interval, start, end, chunk_rows):
+        if len(chunk_times) == 0:
+            continue
+        result = stats.update(closes, matrices=False)
+        times.append(chunk_times)
+        if result['beta'] is not None:
+            betas.append(result['beta'])
+        last = result
+    n = len(pairs)
+    return {
+        'pairs': list(pairs),
+        'times': np.concatenate(times) if times else np.empty(0, dtype=np.int64),
+        'beta': np.concatenate(betas) if betas else None,
+        'cov': last['cov'][-1] if last is not None else np.full((n, n), np.nan, dtype=np.float32),
+        'corr': last['corr'][-1] if last is not None else np.full((n, n), np.nan, dtype=np.float32),
+    }
@@ -1,17 +1,49 @@
+import argparse
+import json
 import requests
 import pandas as pd
 import os
+import random
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import websocket
+from requests.adapters import HTTPAdapter
 
-def get_kline_data(pair, interval, start_time):
+from .aggregator import CandleAggregator, derive_into_store
+from .candle_store import open_store
+from .config import INTERVAL_MS, KLINE_URL, PAIRS, WS_URL
+from .ingestion import StoreSink, StreamIngestor
+from .rollups import RollupPyramid
+
+RAW_DATA_DIR = '.data/raw'
+WATERMARK_FILE = 'watermarks.json'
+
+KLINE_COLUMNS = ['startTime', 'open', 'high', 'low', 'close', 'endTime', 'volume']
+
+
+def create_session(pool_size=10):
+    """
+    Create a requests session whose connection pool is shared by all worker threads.
+
+    Args:
+    - pool_size (int): Maximum number of keep-alive connections held per host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+
+def get_kline_data(pair, interval, start_time, end_time=None, limit=10000, session=None, url=KLINE_URL):
     try:
-        params = {'pair': pair, 'interval': interval, 'limit': 10000, 'startTime': start_time}
+        params = {'pair': pair, 'interval': interval, 'limit': limit, 'startTime': start_time}
+        if end_time is not None:
+            params['endTime'] = end_time
         headers = {'Content-Type': 'application/json'}
-        kline_url = "https://api.pi42.com/v1/market/klines"
-        response = requests.post(kline_url, json=params, headers=headers)
+        response = (session or requests).post(url, json=params, headers=headers)
         response.raise_for_status()
         response_data = response.json()
         print(f'Kline data for {interval} fetched successfully.')
@@ -26,17 +58,228 @@ def get_kline_data(pair, interval, start_time):
         print(f"An unexpected error occurred: {str(e)}")
         return None  # Return None on unexpected error
 
-def on_message(ws, message):
-    print(f"Received: {message}")
 
-def connect_websocket():
-    websocket_url = "wss://api.pi42.com/v1/market/ws"
-    ws = websocket.WebSocketApp(websocket_url, on_message=on_message)
-    ws.run_forever()
+class RateLimiter:
+    """Thread-safe token bucket shared by every request a backfill sends."""
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+        - rate (float): Requests allowed per second. ``None`` disables limiting.
+        - burst (int): Requests that may be sent back to back before throttling kicks in.
+        """
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate or 1))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Hold back all callers for ``seconds``, e.g. after the server answered 429."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        return
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class KlineBackfiller:
+    """
+    Fetch deep kline history by walking ``startTime`` cursors page by page.
+
+    The requested range of every (pair, interval) is cut into page-sized windows and all windows
+    are fetched concurrently over one pooled session, so a cold backfill costs roughly
+    ``pages / max_workers`` round trips instead of one blocking request per interval.
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, url=KLINE_URL, page_limit=1000, max_workers=6, max_retries=5,
+                 backoff=0.5, max_backoff=30.0, requests_per_second=None, timeout=10, session=None):
+        """
+        Args:
+        - url (str): Kline endpoint.
+        - page_limit (int): Candles requested per page.
+        - max_workers (int): Upper bound on requests in flight.
+        - max_retries (int): Retries per page for connection errors, 429 and 5xx responses.
+        - backoff (float): Base delay of the exponential backoff, in seconds.
+        - max_backoff (float): Cap on a single backoff delay, in seconds.
+        - requests_per_second (float): Client-side rate limit, ``None`` to rely on 429 handling only.
+        - timeout (float): Per-request timeout, in seconds.
+        - session (requests.Session): Session to reuse; a pooled one is created when omitted.
+        """
+        self.url = url
+        self.page_limit = page_limit
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = session or create_session(pool_size=max_workers)
+        self.limiter = RateLimiter(requests_per_second)
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'candles': 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+    def _delay(self, attempt, response=None):
+        if response is not None and response.headers.get('Retry-After'):
+            try:
+                return float(response.headers['Retry-After'])
+            except ValueError:
+                pass
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def fetch_page(self, pair, interval, start_time, end_time=None):
+        """Fetch one page of candles starting at ``start_time``, retrying transient failures."""
+        params = {'pair': pair, 'interval': interval, 'limit': self.page_limit, 'startTime': int(start_time)}
+        if end_time is not None:
+            params['endTime'] = int(end_time)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            self._count('requests')
+            response = None
+            try:
+                response = self.session.post(self.url, json=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+
+            delay = self._delay(attempt, response)
+            if response is not None and response.status_code == 429:
+                self._count('rate_limited')
+                self.limiter.pause(delay)
+            self._count('retries')
+            time.sleep(delay)
+
+    def _fetch_window(self, pair, interval, start_time, end_time):
+        """Walk the cursor through ``[start_time, end_time]`` until the window is exhausted."""
+        step = INTERVAL_MS[interval]
+        rows = []
+        cursor = start_time
+        while cursor <= end_time:
+            page = self.fetch_page(pair, interval, cursor, end_time)
+            if not page:
+                break
+            rows.extend(page)
+            next_cursor = int(page[-1]['startTime']) + step
+            if len(page) < self.page_limit or next_cursor <= cursor:
+                break
+            cursor = next_cursor
+        return rows
+
+    def _windows(self, interval, start_time, end_time):
+        span = self.page_limit * INTERVAL_MS[interval]
+        windows = []
+        cursor = int(start_time)
+        while cursor <= end_time:
+            windows.append((cursor, min(cursor + span - 1, end_time)))
+            cursor += span
+        return windows
+
+    def backfill_many(self, pairs, intervals, start_time, end_time=None):
+        """
+        Backfill every (pair, interval) combination concurrently.
+
+        Args:
+        - pairs (list of str): Trading pairs, e.g. ``['BTCINR']``.
+        - intervals (iterable of str): Kline intervals, e.g. ``['5m', '1h']``.
+        - start_time (int or dict): Inclusive start of the range, epoch milliseconds, or a
+          ``{(pair, interval): start}`` mapping when every series resumes from its own watermark.
+        - end_time (int): Inclusive end of the range, epoch milliseconds. Defaults to now.
+
+        Returns:
+        - dict: ``{(pair, interval): DataFrame}`` sorted and de-duplicated on ``startTime``.
+        """
+        if end_time is None:
+            end_time = int(time.time() * 1000)
+        results = {(pair, interval): [] for pair in pairs for interval in intervals}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for pair, interval in results:
+                start = start_time[(pair, interval)] if isinstance(start_time, dict) else start_time
+                for window_start, window_end in self._windows(interval, start, end_time):
+                    future = executor.submit(self._fetch_window, pair, interval, window_start, window_end)
+                    futures[future] = (pair, interval)
+            for future in as_completed(futures):
+                results[futures[future]].extend(future.result())
+
+        frames = {}
+        for key, rows in results.items():
+            frames[key] = klines_to_frame(rows)
+            self._count('candles', len(frames[key]))
+        return frames
+
+    def backfill(self, pair, interval, start_time, end_time=None):
+        """Backfill a single (pair, interval) and return it as a DataFrame."""
+        return self.backfill_many([pair], [interval], start_time, end_time)[(pair, interval)]
+
+
+def klines_to_frame(rows):
+    """Convert raw kline rows into a DataFrame ordered and de-duplicated on ``startTime``."""
+    df = pd.DataFrame(rows, columns=KLINE_COLUMNS if not rows else None)
+    if df.empty:
+        return df
+    for column in ['startTime', 'endTime']:
+        df[column] = df[column].astype('int64')
+    for column in ['open', 'high', 'low', 'close', 'volume']:
+        df[column] = pd.to_numeric(df[column])
+    df = df.drop_duplicates('startTime', keep='last').sort_values('startTime')
+    if set(KLINE_COLUMNS) <= set(df.columns):
+        df = df[KLINE_COLUMNS + [column for column in df.columns if column not in KLINE_COLUMNS]]
+    return df.reset_index(drop=True)
+
+def connect_websocket(pair="BTCINR", intervals=("5m", "15m", "30m", "1h", "6h", "12h"), store=None, derive=False,
+                      websocket_url=WS_URL, rollups=None):
+    """
+    Stream live klines of one pair (or a list of pairs, over one connection) into the candle store
+    until the process exits, reconnecting as needed.
+
+    With ``derive`` only the first (base) interval is subscribed; the others are aggregated locally
+    and each closed bar is queued into the same store; the aggregators are seeded from the stored base
+    candles first, so the bars open at connect time are not emitted partial. ``rollups`` (a ``RollupPyramid``) is kept
+    up to date with every flushed batch.
+    """
+    pairs = [pair] if isinstance(pair, str) else list(pair)
+    subscribed = list(intervals[:1]) if derive else list(intervals)
+    streams = [f"{name.lower()}@kline_{interval}" for name in pairs for interval in subscribed]
+    store = store or open_store()
+    ingestor = StreamIngestor(websocket_url, StoreSink(store, rollups), streams=streams)
+    if derive:
+        for name in pairs:
+            aggregator = CandleAggregator(name, intervals[0], intervals[1:], on_bar_close=ingestor.put)
+            aggregator.seed(store)
+            ingestor.add_listener(aggregator.update)
+    ingestor.run()
 
 def save_to_csv(df, filename):
     """Save DataFrame to CSV in the 'raw' directory."""
-    folder_path = '.data/raw'
+    folder_path = RAW_DATA_DIR
     if not os.path.exists(folder_path):
         os.makedirs(folder_path)  # Create the folder if it doesn't exist
 
@@ -47,8 +290,176 @@ def save_to_csv(df, filename):
     else:
         print(f"No data to save for {full_path}.")
 
-def main():
-    pair = "BTCINR"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def load_watermarks(folder_path=RAW_DATA_DIR):
+    """
+    Load the per-(pair, interval) high-water marks of the raw candle files.
+
+    Each mark holds the ``startTime`` of the newest stored candle and the byte ``offset`` at which
+    that candle's row starts, so a sync can overwrite it in place once the candle has closed.
+    """
+    path = os.path.join(folder_path, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks, folder_path=RAW_DATA_DIR):
+    os.makedirs(folder_path, exist_ok=True)
+    _write_atomic(os.path.join(folder_path, WATERMARK_FILE), json.dumps(watermarks, indent=2, sort_keys=True))
+
+
+def watermark_key(pair, interval):
+    return f"{pair}_{interval}"
+
+
+def compact_csv(filename, folder_path=RAW_DATA_DIR):
+    """
+    Rewrite a raw candle file sorted and de-duplicated on ``startTime``.
+
+    Files written by the old append-only ``save_to_csv`` contain every re-downloaded window; this
+    keeps the latest copy of each candle and returns the watermark describing the compacted file.
+    """
+    full_path = os.path.join(folder_path, filename)
+    if not os.path.exists(full_path):
+        return None
+    df = pd.read_csv(full_path)
+    df = df.drop_duplicates('startTime', keep='last').sort_values('startTime')
+    if df.empty:
+        return None
+    head = df.iloc[:-1].to_csv(index=False)
+    tail = df.iloc[-1:].to_csv(index=False, header=False)
+    _write_atomic(full_path, head + tail)
+    print(f"Compacted {full_path} to {len(df)} candles.")
+    return {'startTime': int(df['startTime'].iloc[-1]), 'offset': len(head.encode())}
+
+
+def upsert_csv(df, filename, watermark=None, folder_path=RAW_DATA_DIR):
+    """
+    Write a delta of candles into a raw file, replacing the rows it overlaps.
+
+    Deltas are fetched from the previous watermark onwards, so the only stored row they can overlap
+    is the last one (the candle that was still forming at the previous sync). The file is truncated
+    at the watermark offset and the delta appended, so the cost is proportional to the delta rather
+    than to the file size.
+
+    Args:
+    - df (DataFrame): New candles, sorted on ``startTime``.
+    - filename (str): File name inside ``folder_path``.
+    - watermark (dict): Mark returned by the previous upsert or compaction, ``None`` for a new file.
+
+    Returns:
+    - dict: The new watermark.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    full_path = os.path.join(folder_path, filename)
+    if df is None or df.empty:
+        return watermark
+    if watermark is not None and not os.path.exists(full_path):
+        watermark = None
+    if watermark is not None:
+        df = df[df['startTime'] >= watermark['startTime']]
+        if df.empty:
+            return watermark
+
+    with open(full_path, 'r+b' if watermark is not None else 'wb') as f:
+        if watermark is not None:
+            offset = watermark['offset']
+            f.seek(offset)
+            f.truncate()
+            head = df.iloc[:-1].to_csv(index=False, header=False)
+        else:
+            offset = 0
+            head = df.iloc[:-1].to_csv(index=False)
+        tail = df.iloc[-1:].to_csv(index=False, header=False)
+        f.write(head.encode())
+        f.write(tail.encode())
+    return {'startTime': int(df['startTime'].iloc[-1]), 'offset': offset + len(head.encode())}
+
+
+def incremental_sync(pairs, intervals, backfiller=None, folder_path=RAW_DATA_DIR, lookback_days=60, end_time=None,
+                     store=None, rollups=None):
+    """
+    Bring every raw (pair, interval) file up to date, fetching only candles newer than its watermark.
+
+    Series without a watermark are compacted first (de-duplicating anything the append-only writer
+    left behind) or, if no file exists yet, backfilled from ``lookback_days`` ago. When a
+    candle store is given (either backend), every delta is also written into it, and folded into
+    ``rollups`` (a ``RollupPyramid`` over that store) when given.
+
+    Returns:
+    - dict: ``{(pair, interval): number of candles written}``.
+    """
+    backfiller = backfiller or KlineBackfiller()
+    watermarks = load_watermarks(folder_path)
+    default_start = int((datetime.now() - timedelta(days=lookback_days)).timestamp() * 1000)
+
+    starts = {}
+    for pair in pairs:
+        for interval in intervals:
+            key = watermark_key(pair, interval)
+            if key not in watermarks:
+                mark = compact_csv(f"{pair}_{interval}_data.csv", folder_path)
+                if mark is not None:
+                    watermarks[key] = mark
+            starts[(pair, interval)] = watermarks[key]['startTime'] if key in watermarks else default_start
+
+    frames = backfiller.backfill_many(pairs, intervals, starts, end_time)
+    written = {}
+    for (pair, interval), df in frames.items():
+        key = watermark_key(pair, interval)
+        mark = upsert_csv(df, f"{pair}_{interval}_data.csv", watermarks.get(key), folder_path)
+        if mark is not None:
+            watermarks[key] = mark
+        if store is not None:
+            store.write(pair, interval, df)
+            if rollups is not None:
+                rollups.update(pair, interval, df)
+        written[(pair, interval)] = len(df)
+    save_watermarks(watermarks, folder_path)
+    return written
+
+
+def derive_sync(store, pairs, base_interval, intervals, starts, rollups=None):
+    """
+    Rebuild the higher intervals of every pair from its stored base candles, starting at the bucket
+    holding ``starts[pair]``, so a sync only rewrites the partitions its delta touched.
+
+    Args:
+    - starts (dict): ``{pair: base watermark}`` as read before the sync (``None`` rebuilds the whole series).
+    - rollups (RollupPyramid): Also folds the rebuilt intervals into the rollups.
+
+    Returns:
+    - dict: ``{pair: {interval: number of bars written}}``.
+    """
+    derived = {}
+    for pair in pairs:
+        derived[pair] = derive_into_store(store, pair, base_interval, intervals, start=starts.get(pair))
+        if rollups is not None:
+            for interval in derived[pair]:
+                rollups.update(pair, interval)
+    return derived
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync Pi42 kline data into the raw candle files.")
+    parser.add_argument('--compact', action='store_true', help="De-duplicate the raw files before syncing.")
+    parser.add_argument('--once', action='store_true', help="Sync and exit without opening the WebSocket.")
+    parser.add_argument('--derive', action='store_true',
+                        help="Fetch only the 5m base interval and aggregate the higher intervals locally.")
+    parser.add_argument('--pairs', default=','.join(PAIRS),
+                        help="Comma-separated pairs to sync and stream (default: PI42_PAIRS or BTCINR).")
+    args = parser.parse_args(argv)
+
+    pairs = [pair.strip().upper() for pair in args.pairs.split(',') if pair.strip()]
     intervals = {
           "5m": 7,    # 5 minutes interval for the last 7 days
           "15m": 30,  # 15 minutes interval for the last 30 days
@@ -58,24 +469,42 @@ def main():
           "12h": 60   # 12 hours interval for the last 60 days
       }
 
-    # Set the start time for fetching data (last X days)
-    start_time_ms = int((datetime.now() - timedelta(days=60)).timestamp() * 1000)  # Change as needed
+    if args.compact:
+        watermarks = load_watermarks()
+        for pair in pairs:
+            for interval in intervals:
+                mark = compact_csv(f"{pair}_{interval}_data.csv")
+                if mark is not None:
+                    watermarks[watermark_key(pair, interval)] = mark
+        save_watermarks(watermarks)
 
-    # Dynamically fetch data for all intervals and store in DataFrames
-    for interval, days in intervals.items():
-          print(f"Fetching {interval} data...")
-          kline_data = get_kline_data(pair, interval, start_time_ms)
+    # Fetch only the candles newer than each interval's watermark (last 60 days on the first run)
+    fetched = list(intervals)[:1] if args.derive else list(intervals)
+    print(f"Syncing {', '.join(fetched)} data for {', '.join(pairs)}...")
+    store = open_store()
+    rollups = RollupPyramid(store=store)
+    backfiller = KlineBackfiller()
+    # The base watermarks before the sync: only buckets from there on can change
+    starts = {pair: store.last_start_time(pair, fetched[0]) for pair in pairs} if args.derive else {}
+    written = incremental_sync(pairs, fetched, backfiller, lookback_days=60, store=store, rollups=rollups)
+    if args.derive:
+        derived = derive_sync(store, pairs, fetched[0], list(intervals)[1:], starts, rollups)
+        for pair, counts in derived.items():
+            print(f"{pair} derived from {fetched[0]}: {counts}")
+    for (pair, interval), count in written.items():
+        if count:
+            print(f"{pair} {interval}: {count} candles written.")
+        else:
+            print(f"No data fetched for {pair} interval {interval}.")
+    print(f"Sync finished: {backfiller.stats}")
 
-          if kline_data is not None:
-              df = pd.DataFrame(kline_data)
-              save_to_csv(df, f"{pair}_{interval}_data.csv")  # Save to CSV
-          else:
-              print(f"No data fetched for interval {interval}.")
+    if args.once:
+        return
 
     # Start WebSocket connection in a separate thread
     print("Connecting to WebSocket...")
-    ws_thread = threading.Thread(target=connect_websocket)
+    ws_thread = threading.Thread(target=connect_websocket, args=(pairs, list(intervals), store, args.derive, WS_URL, rollups))
     ws_thread.start()
 
 if __name__ == "__main__":
-      main()
\ No newline at end of file
+      main()
@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .backends import backend
+from .result_cache import ResultCache, data_version, default_cache
+
+DECOMPOSITION_METHODS = ('classic', 'stl')
+COMPONENTS = ['observed', 'trend', 'seasonal', 'resid']
+
+
+def decompose(close, period=30, method='classic'):
+    """
+    Additive seasonal decomposition of a close series.
+
+    Args:
+    - close (Series): Prices indexed by time.
+    - period (int): Candles per seasonal cycle.
+    - method (str): ``'classic'`` (moving averages, ``seasonal_decompose``) or ``'stl'`` (robust LOESS).
+
+    Returns:
+    - DataFrame: ``observed``, ``trend``, ``seasonal`` and ``resid`` columns on the series' index.
+    """
+    close = close.astype('float64')
+    if method == 'stl':
+        result = backend('stl')(close, period=period, robust=True).fit()
+    elif method == 'classic':
+        result = backend('seasonal_decompose')(close, model='additive', period=period)
+    else:
+        raise ValueError(f"Unknown decomposition method {method!r}; expected one of {DECOMPOSITION_METHODS}")
+    return pd.DataFrame({component: getattr(result, component) for component in COMPONENTS}, index=close.index)
+
+
+def update_decomposition(previous, close, period=30, method='classic', window=None):
+    """
+    Extend a previous decomposition to a series that has since grown, re-fitting only a trailing window.
+
+    The last ``window`` candles are decomposed again and spliced in after their first ``period``
+    rows (which carry the window's start-up edge effects); everything earlier is kept from
+    ``previous``. Falls back to a full decomposition when the series was not simply appended to,
+    or when more candles arrived than the window can absorb.
+    """
+    window = window or 20 * period
+    n, cut = len(close), len(close) - window + period
+    appended = (previous is not None and len(previous) >= max(cut, 1) and len(previous) <= n
+                and previous.index[0] == close.index[0]
+                and previous.index[len(previous) - 1] == close.index[len(previous) - 1])
+    if not appended or n <= 2 * window:
+        return decompose(close, period, method)
+    tail = decompose(close.iloc[-window:], period, method)
+    return pd.concat([previous.iloc[:cut], tail.iloc[period:]])
+
+
+class DecompositionService:
+    """
+    Seasonal decompositions computed off the Streamlit script thread.
+
+    Results are cached per ``(pair, interval, method, period, data version)`` in a ``ResultCache``.
+    When the data moves on, ``request`` still hands back the newest result it has for that series
+    straight away, alongside the future of the refresh, which only re-fits a trailing window.
+    """
+
+    def __init__(self, cache=None, max_workers=2, window_periods=20):
+        """
+        Args:
+        - cache (ResultCache): Where finished decompositions are kept; defaults to the shared cache.
+        - max_workers (int): Decompositions running at once.
+        - window_periods (int): Trailing window re-fitted on refresh, in seasonal periods.
+        """
+        self.cache = cache or default_cache
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='decomposition')
+        self.window_periods = window_periods
+        self.latest = {}  # (pair, interval, method, period) -> (version, result), kept for stale reads
+        self.pending = {}  # cache key -> Future
+        self.lock = threading.Lock()
+
+    def request(self, pair, interval, df, period=30, method='classic'):
+        """
+        Newest available decomposition of ``df['close']`` and the refresh in flight, if any.
+
+        Returns:
+        - tuple: ``(result, future)``. ``result`` is the decomposition for this data version, or the
+          last one computed for the series (``None`` if there is none yet); ``future`` is ``None`` when
+          ``result`` is current, otherwise it resolves to the up-to-date decomposition.
+        """
+        version = data_version(df)
+        params = {'method': method, 'period': period}
+        key = ResultCache.key(pair, interval, 'decomposition', params, version)
+        result = self.cache.get(key)
+        if result is not None:
+            return result, None
+
+        series = (pair, interval, method, period)
+        with self.lock:
+            previous = self.latest.get(series)
+            if previous is not None and previous[0] == version:
+                return previous[1], None  # Evicted from the cache but still the newest
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = self.executor.submit(
+                    self._refresh, key, series, version, df['close'],
+                    None if previous is None else previous[1], period, method)
+        return (None if previous is None else previous[1]), future
+
+    def _refresh(self, key, series, version, close, previous, period, method):
+        try:
+            result = update_decomposition(previous, close, period, method, window=self.window_periods * period)
+            self.cache.put(key, result)
+            with self.lock:
+                self.latest[series] = (version, result)
+            return result
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+# Process-wide service used by the EDA page unless it is handed its own
+default_decomposer = DecompositionService()
@@ -0,0 +1,179 @@
+import numpy as np
+
+# Points per trace sent to the browser; enough for a full-width chart on a large screen
+MAX_POINTS = 2000
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: indices of ``n_out`` points that preserve the visual shape of a line.
+
+    The first and last points are always kept; each bucket in between keeps the point forming the
+    largest triangle with the previously kept point and the mean of the next bucket. Bucket means
+    are computed up front; only the dependency on the previous pick is sequential.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sums_x, sums_y = np.add.reduceat(x[:n - 1], starts), np.add.reduceat(y[:n - 1], starts)
+    counts = np.maximum(ends - starts, 1)
+    mean_x = np.r_[sums_x / counts, x[-1]]
+    mean_y = np.r_[sums_y / counts, y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    previous = 0
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        if hi <= lo:
+            hi = lo + 1
+        ax, ay = x[previous], y[previous]
+        bx, by = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((ax - bx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (by - ay))
+        previous = lo + int(np.nanargmax(area)) if not np.isnan(area).all() else lo
+        out[i + 1] = previous
+    return out
+
+
+def minmax_indices(y, n_out, positions=None):
+    """
+    Keep the minimum and maximum of ``n_out // 2`` equal buckets, in time order.
+
+    Suited to spiky series (volume, residuals, candle highs/lows) where LTTB could drop extremes.
+
+    Args:
+    - y (array): Values.
+    - n_out (int): Target number of points.
+    - positions (array): Optional subset of indices of ``y`` to reduce (e.g. a pyramid level).
+    """
+    positions = np.arange(len(y)) if positions is None else np.asarray(positions)
+    n = len(positions)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return positions
+    size = -(-n // buckets)
+    values = np.asarray(y, dtype=np.float64)[positions]
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    grid = padded.reshape(buckets, size)
+    valid = ~np.isnan(grid).all(axis=1)
+    rows = np.flatnonzero(valid)
+    lo = rows * size + np.nanargmin(grid[valid], axis=1)
+    hi = rows * size + np.nanargmax(grid[valid], axis=1)
+    picked = np.unique(np.concatenate([lo, hi]))
+    return positions[picked]
+
+
+def _numeric(x):
+    """Positions as float64 for the LTTB triangle areas (datetime64 via its integer ticks)."""
+    x = np.asarray(x)
+    return (x.astype('int64') if x.dtype.kind == 'M' else x).astype(np.float64)
+
+
+def ohlc_buckets(x, open_, high, low, close, volume=None, n_out=MAX_POINTS):
+    """Re-bucket candles into at most ``n_out`` candles (first open, max high, min low, last close, summed volume)."""
+    n = len(close)
+    if n <= n_out:
+        result = {'x': x, 'open': open_, 'high': high, 'low': low, 'close': close}
+        if volume is not None:
+            result['volume'] = volume
+        return result
+    starts = np.linspace(0, n, n_out, endpoint=False).astype(np.int64)
+    ends = np.r_[starts[1:], n] - 1
+    result = {
+        'x': np.asarray(x)[starts],
+        'open': np.asarray(open_)[starts],
+        'high': np.maximum.reduceat(np.asarray(high), starts),
+        'low': np.minimum.reduceat(np.asarray(low), starts),
+        'close': np.asarray(close)[ends],
+    }
+    if volume is not None:
+        result['volume'] = np.add.reduceat(np.asarray(volume, dtype=np.float64), starts)
+    return result
+
+
+class LevelPyramid:
+    """
+    Precomputed multi-resolution levels of one series, reduced with the method its traces use.
+
+    Level 0 is every point; each further level reduces the level below ``factor`` times, either
+    keeping the min and max of buckets of ``2 * factor`` points (``'minmax'``, every level keeps the
+    extremes) or with LTTB (``'lttb'``, every level keeps the shape of a line). Building is O(n)
+    overall; a query returns the finest level that fits ``max_points`` inside the visible range, so a
+    chart of any range costs O(max_points) once the pyramid exists.
+    """
+
+    def __init__(self, x, y, factor=4, min_points=MAX_POINTS, method='minmax'):
+        """
+        Args:
+        - x (array): Sorted positions (epoch ms or datetime64) of the points.
+        - y (array): Values.
+        - factor (int): Reduction between consecutive levels.
+        - min_points (int): Stop adding levels once a level is this small.
+        - method (str): ``'minmax'`` or ``'lttb'``, as in ``downsample``.
+        """
+        if method not in ('minmax', 'lttb'):
+            raise ValueError(f"Unknown downsampling method {method!r}")
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.method = method
+        level = np.arange(len(self.y))
+        self.levels = [(level, self.x)]
+        while len(level) > min_points:
+            level = self._reduce(level, len(level) // factor)
+            self.levels.append((level, self.x[level]))
+
+    def _reduce(self, positions, n_out):
+        """Indices of the series keeping ``n_out`` of ``positions`` with the pyramid's method."""
+        if self.method == 'minmax':
+            return minmax_indices(self.y, n_out, positions=positions)
+        return positions[lttb_indices(_numeric(self.x[positions]), self.y[positions], n_out)]
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes + xs.nbytes for level, xs in self.levels[1:])
+
+    def query(self, start=None, end=None, max_points=MAX_POINTS):
+        """Indices of at most ``max_points`` points covering ``start <= x <= end``."""
+        for level, xs in self.levels:
+            lo = 0 if start is None else int(np.searchsorted(xs, start, side='left'))
+            hi = len(level) if end is None else int(np.searchsorted(xs, end, side='right'))
+            if hi - lo <= max_points:
+                return level[lo:hi]
+        # Even the coarsest level is too dense for this range; reduce its slice directly
+        return self._reduce(level[lo:hi], max_points)
+
+
+def downsample(x, y, max_points=MAX_POINTS, method='lttb', start=None, end=None, pyramid=None):
+    """
+    Reduce one trace to at most ``max_points`` points within the visible range.
+
+    Args:
+    - x, y (array): Positions and values of the trace.
+    - method (str): ``'lttb'`` for lines, ``'minmax'`` for spiky series such as volume.
+    - start, end: Visible range in the units of ``x``; ``None`` is open.
+    - pyramid (LevelPyramid): Precomputed levels of the same trace, built with ``method``; when given,
+      the range is answered from the levels instead of scanning the raw points.
+
+    Returns:
+    - tuple: ``(x, y)`` arrays of the kept points.
+    """
+    x, y = np.asarray(x), np.asarray(y)
+    if pyramid is not None:
+        if pyramid.method != method:
+            raise ValueError(f"The pyramid was built with {pyramid.method!r}, not {method!r}")
+        indices = pyramid.query(start, end, max_points)
+        return x[indices], y[indices]
+    lo = 0 if start is None else int(np.searchsorted(x, start, side='left'))
+    hi = len(x) if end is None else int(np.searchsorted(x, end, side='right'))
+    x, y = x[lo:hi], y[lo:hi]
+    if len(y) <= max_points:
+        return x, y
+    if method == 'minmax':
+        indices = minmax_indices(y, max_points)
+    else:
+        indices = lttb_indices(_numeric(x), y, max_points)
+    return x[indices], y[indices]
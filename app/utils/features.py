@@ -0,0 +1,154 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .config import PAIR
+from .indicators import IndicatorEngine, rolling_std, sma
+from .result_cache import data_version
+
+
+def _shift(x, k):
+    """``x`` delayed by ``k`` bars, NaN-padded (``k`` = 0 returns ``x``)."""
+    if k == 0:
+        return x
+    out = np.full(len(x), np.nan)
+    if k < len(x):
+        out[k:] = x[:-k]
+    return out
+
+
+def sliding_windows(values, length, horizon=1):
+    """
+    LSTM inputs: every run of ``length`` consecutive values and the value ``horizon`` bars after it.
+
+    Windows come from a strided view of the series (no per-row Python) and are copied once into a
+    contiguous ``(n, length, 1)`` float32 array, the layout Keras consumes.
+
+    Returns:
+    - tuple: ``(windows, targets)`` float32 arrays.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    count = max(len(values) - length - horizon + 1, 0)
+    windows = sliding_window_view(values, length)[:count] if len(values) >= length else np.empty((0, length))
+    return np.ascontiguousarray(windows, dtype=np.float32)[..., None], values[length + horizon - 1:]
+
+
+class FeatureMatrix:
+    """Model inputs of one series: float32 C-contiguous ``X`` (rows x features), targets ``y``, row times and names."""
+
+    def __init__(self, names, X, y, index):
+        self.names = list(names)
+        self.X = X
+        self.y = y
+        self.index = index
+
+    def __len__(self):
+        return len(self.y)
+
+    @property
+    def nbytes(self):
+        return self.X.nbytes + self.y.nbytes
+
+    def to_frame(self):
+        return pd.DataFrame(self.X, index=self.index, columns=self.names).assign(target=self.y)
+
+
+class FeatureBuilder:
+    """
+    One vectorized feature pipeline for the forecasting models.
+
+    Row ``t`` of ``X`` only sees bars up to ``t - 1`` and is paired with the target ``horizon - 1`` bars
+    after ``t``: lags (``lag_k`` = close ``k`` bars back), log returns over ``k`` bars (``ret_k``),
+    rolling mean/std of the close (``roll_mean_n``/``roll_std_n``) and any ``IndicatorEngine``
+    indicator, all as of the previous bar. Warm-up rows are dropped and the result is a single
+    C-contiguous float32 matrix, which the tree models consume without another copy.
+    """
+
+    def __init__(self, lags=1, returns=(), rolling=(), indicators=(), target='close', horizon=1):
+        """
+        Args:
+        - lags (int or list of int): ``n`` for lags ``1..n``, or the explicit lags to use.
+        - returns (list of int): Horizons of the log-return features.
+        - rolling (list of int): Windows of the rolling mean and standard deviation features.
+        - indicators (list of str): ``IndicatorEngine`` names (multi-column indicators add all their columns).
+        - target (str): Column to predict.
+        - horizon (int): Bars ahead of the last seen bar that the target lies.
+        """
+        self.lags = list(range(1, lags + 1)) if isinstance(lags, int) else list(lags)
+        self.returns = list(returns)
+        self.rolling = list(rolling)
+        self.indicators = list(indicators)
+        self.target = target
+        self.horizon = horizon
+
+    @property
+    def spec(self):
+        """Plain description of the pipeline: the cache key of its results, and what a model was trained on."""
+        return {'lags': self.lags, 'returns': self.returns, 'rolling': self.rolling,
+                'indicators': self.indicators, 'target': self.target, 'horizon': self.horizon}
+
+    def columns(self, df):
+        """Named float64 feature columns aligned with ``df`` (before the one-bar delay)."""
+        close = df[self.target].to_numpy(dtype=np.float64)
+        columns = {}
+        for k in self.lags:
+            columns[f'lag_{k}'] = _shift(close, k - 1)
+        if self.returns:
+            log_close = np.log(close)
+            for k in self.returns:
+                columns[f'ret_{k}'] = log_close - _shift(log_close, k)
+        for n in self.rolling:
+            columns[f'roll_mean_{n}'] = sma(close, n)
+            columns[f'roll_std_{n}'] = rolling_std(close, n, ddof=1)
+        if self.indicators:
+            block = IndicatorEngine(self.indicators).compute(df)
+            for name in block.names:
+                columns[name] = block[name]
+        return columns
+
+    def build(self, df):
+        """
+        Returns:
+        - FeatureMatrix: One row per bar with every feature and the target available.
+        """
+        target = df[self.target].to_numpy(dtype=np.float64)
+        columns = self.columns(df)
+        n = len(target)
+        X = np.empty((n, len(columns)), dtype=np.float32)
+        for i, values in enumerate(columns.values()):
+            X[:, i] = _shift(values, 1)
+        y = np.full(n, np.nan)
+        if self.horizon - 1 < n:
+            y[:n - self.horizon + 1] = target[self.horizon - 1:]
+        valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        return FeatureMatrix(columns.keys(), np.ascontiguousarray(X[valid]), y[valid].astype(np.float32),
+                             df.index[valid])
+
+    def latest(self, df):
+        """Feature row (1 x features, float32) for the bar right after the last one in ``df``."""
+        return np.array([[values[-1] for values in self.columns(df).values()]], dtype=np.float32)
+
+    def build_cached(self, df, interval, pair=PAIR, cache=None):
+        """``build``, memoized in a ``ResultCache`` by (pair, interval, spec, data version)."""
+        if cache is None:
+            return self.build(df)
+        return cache.get_or_compute(pair, interval, 'features', self.spec, data_version(df), lambda: self.build(df))
+
+    def build_many(self, frames, pair=PAIR, cache=None, max_workers=None):
+        """
+        Build the same features for several intervals in one call.
+
+        Args:
+        - frames (Mapping): ``{interval: frame}``; a ``DataCatalog`` works and loads only what is asked for.
+
+        Returns:
+        - dict: ``{interval: FeatureMatrix}``.
+        """
+        if not max_workers or max_workers == 1:
+            return {interval: self.build_cached(df, interval, pair, cache) for interval, df in frames.items()}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {interval: executor.submit(self.build_cached, df, interval, pair, cache)
+                       for interval, df in frames.items()}
+            return {interval: future.result() for interval, future in futures.items()}
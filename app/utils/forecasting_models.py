@@ -1,25 +1,274 @@
+import time
+
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-import xgboost as xgb
-from statsmodels.tsa.arima.model import ARIMA
-from keras.models import Sequential
-from keras.layers import LSTM, Dense
-from fbprophet import Prophet
+
+from .backends import backend
+from .config import INTERVAL_MS, PAIR
+from .features import FeatureBuilder, sliding_windows
+from .online import UPDATE_DEFAULTS, extend_arima, finetune_network, warm_start_trees, window_refit
+
+# Registry models and their default params; a fitted model is keyed by (pair, interval, model, params)
+MODEL_DEFAULTS = {
+    'arima': {'order': [5, 1, 0], 'steps': 10},
+    'random_forest': {'n_estimators': 100, 'lags': 1},
+    'gradient_boosting': {'n_estimators': 100, 'lags': 2},
+    'lstm': {'window': 60, 'units': 50, 'epochs': 50, 'batch_size': 32},
+    'prophet': {'periods': 6},
+    'xgboost': {'n_estimators': 100, 'lags': 2},
+}
+# Tree ensembles fit on the shared feature matrix; each is its own lazily imported backend
+TREE_MODELS = ('random_forest', 'gradient_boosting', 'xgboost')
+# Tree models that train their trees in parallel (``n_jobs``); gradient boosting is sequential
+THREADED_MODELS = ('random_forest', 'xgboost')
+# Share of the newest rows scored before the final fit on everything
+HOLDOUT = 0.2
+# Models ``update`` can bring forward without a full refit (Prophet has no incremental fit)
+ONLINE_MODELS = ('arima', 'random_forest', 'gradient_boosting', 'xgboost', 'lstm')
+# History read in front of the new rows so their lag features are complete
+WARMUP_BARS = 500
+
+
+def make_estimator(model, params, n_jobs=None):
+    """Unfitted tree ensemble of ``model`` with its params; ``n_jobs`` threads where the model has them."""
+    threads = {'n_jobs': n_jobs} if n_jobs and model in THREADED_MODELS else {}
+    return backend(model)(n_estimators=params['n_estimators'], **threads)
+
+
+def build_lstm(params):
+    """Compiled two-layer LSTM network over windows of ``params['window']`` bars."""
+    keras = backend('keras')
+    network = keras.models.Sequential()
+    network.add(keras.layers.LSTM(units=params['units'], return_sequences=True, input_shape=(params['window'], 1)))
+    network.add(keras.layers.LSTM(units=params['units']))
+    network.add(keras.layers.Dense(units=1))
+    network.compile(optimizer='adam', loss='mean_squared_error')
+    return network
+
+
+def train_network(network, x, y, params):
+    """
+    Fit the LSTM for up to ``params['epochs']`` epochs. With ``params['patience']``, training stops once
+    the loss on the newest 10% of the windows has not improved for that many epochs, keeping the best weights.
+    """
+    callbacks, validation = [], 0.0
+    if params.get('patience'):
+        callbacks = [backend('keras').callbacks.EarlyStopping(patience=params['patience'], restore_best_weights=True)]
+        validation = 0.1  # Keras holds out the last windows, i.e. the newest bars
+    network.fit(x, y, epochs=params['epochs'], batch_size=params['batch_size'], validation_split=validation,
+                callbacks=callbacks, verbose=0)
+    return network
+
+
+def forecast_metrics(actual, predicted):
+    actual, predicted = np.asarray(actual, dtype=np.float64), np.asarray(predicted, dtype=np.float64).ravel()
+    errors = predicted - actual
+    return {'mae': float(np.abs(errors).mean()), 'rmse': float(np.sqrt((errors ** 2).mean())),
+            'mape': float(np.abs(errors / actual).mean() * 100), 'rows': int(len(actual))}
 
 
 class ForecastingModels:
-    def __init__(self, df):
-        print(df.head())  # Check the first few rows of the DataFrame
-        print(df.columns)  # List all columns in the DataFrame
-        df.columns = df.columns.str.strip()
-        self.df = df
+    def __init__(self, df, interval=None, pair=PAIR, cache=None, n_jobs=None):
+        # Work on a renamed view; the caller's (cached, shared) frame is never modified
+        self.df = df.rename(columns=str.strip)
+        # Feature matrices are cached by data version when the interval (and a ResultCache) is known
+        self.interval = interval
+        self.pair = pair
+        self.cache = cache if interval is not None else None
+        # Threads of the parallel tree models (None: the library default); batch workers pin this to 1
+        self.n_jobs = n_jobs
         #self.df.set_index('startTime', inplace=True)
 
+    @classmethod
+    def from_store(cls, store, pair, interval, start=None, end=None):
+        """Load the price columns of one interval from a CandleStore, optionally limited to a time range."""
+        return cls(store.read(pair, interval, columns=['open', 'high', 'low', 'close', 'volume'], start=start, end=end))
+
+    def features(self, builder):
+        """Feature matrix of this series for a ``FeatureBuilder`` (see ``features.py``)."""
+        return builder.build_cached(self.df, self.interval, self.pair, self.cache)
+
+    def future_index(self, steps):
+        """Start times of the ``steps`` bars after the last one."""
+        step_ms = INTERVAL_MS[self.interval] if self.interval in INTERVAL_MS else None
+        step = pd.Timedelta(milliseconds=step_ms) if step_ms else self.df.index.to_series().diff().median()
+        return pd.DatetimeIndex([self.df.index[-1] + step * k for k in range(1, steps + 1)])
+
+    def fit(self, model, params=None):
+        """
+        Fit one registry model without plotting: score it on the newest ``HOLDOUT`` share of the rows,
+        then fit it again on every row.
+
+        Returns:
+        - tuple: ``(artifact, meta)`` for ``ModelRegistry.save`` - the objects ``forecast`` needs, and
+          the params, feature spec, training data range and holdout metrics.
+        """
+        params = {**MODEL_DEFAULTS[model], **(params or {})}
+        started = time.perf_counter()
+        close = self.df['close'].astype('float64')
+        features = None
+
+        if model in TREE_MODELS:
+            builder = FeatureBuilder(lags=params['lags'])
+            features = builder.spec
+            data = self.features(builder)
+            split = int(len(data) * (1 - HOLDOUT))
+            make = lambda: make_estimator(model, params, self.n_jobs)
+            estimator = make().fit(data.X[:split], data.y[:split])
+            metrics = forecast_metrics(data.y[split:], estimator.predict(data.X[split:]))
+            artifact = {'model': make().fit(data.X, data.y)}
+        elif model == 'arima':
+            values = close.to_numpy()
+            split = int(len(values) * (1 - HOLDOUT))
+            order = tuple(params['order'])
+            ARIMA = backend('arima')
+            holdout = ARIMA(values[:split], order=order).fit()
+            # One step ahead, like the tree models: the fitted params filter the holdout bars one at a time
+            metrics = forecast_metrics(values[split:], extend_arima(holdout, values[split:]).fittedvalues)
+            artifact = {'model': ARIMA(values, order=order).fit()}
+        elif model == 'lstm':
+            from sklearn.preprocessing import MinMaxScaler
+            values = close.to_numpy().reshape(-1, 1)
+            rows = int(len(values) * (1 - HOLDOUT))
+            # Scaled with the training rows only; the holdout must not set the range
+            scaler = MinMaxScaler().fit(values[:rows])
+            x, y = sliding_windows(scaler.transform(values)[:, 0], params['window'])
+            # Windows whose target is a training row
+            split = max(rows - params['window'], 0)
+            network = build_lstm(params)
+            train_network(network, x[:split], y[:split], params)
+            predicted = scaler.inverse_transform(network.predict(x[split:], verbose=0))
+            metrics = forecast_metrics(scaler.inverse_transform(y[split:].reshape(-1, 1))[:, 0], predicted)
+            # Catch up on the held-out windows instead of training from scratch again
+            network.fit(x[split:], y[split:], epochs=max(1, params['epochs'] // 10), batch_size=params['batch_size'],
+                        verbose=0)
+            artifact = {'model': network, 'scaler': scaler}
+        elif model == 'prophet':
+            frame = pd.DataFrame({'ds': self.df.index, 'y': close.to_numpy()})
+            Prophet = backend('prophet')
+            split = int(len(frame) * (1 - HOLDOUT))
+            holdout = Prophet().fit(frame.iloc[:split])
+            metrics = forecast_metrics(frame['y'].iloc[split:], holdout.predict(frame[['ds']].iloc[split:])['yhat'])
+            artifact = {'model': Prophet().fit(frame)}
+        else:
+            raise ValueError(f"Unknown model {model!r}; expected one of {list(MODEL_DEFAULTS)}")
+
+        meta = {
+            'features': features,
+            'data': {'start': str(self.df.index[0]), 'end': str(self.df.index[-1]), 'rows': len(self.df)},
+            'metrics': metrics,
+            'fit_seconds': time.perf_counter() - started,
+        }
+        return artifact, meta
+
+    def new_rows(self, meta):
+        """Number of candles after the end of the data a registered model was last fit or updated on."""
+        return int((self.df.index > pd.Timestamp(meta['data']['end'])).sum())
+
+    def update(self, model, artifact, meta, params=None, options=None):
+        """
+        Bring a registered model forward over the candles that arrived since it was fit, without a refit.
+
+        ARIMA extends its state-space results over the new observations, tree ensembles warm-start on
+        (or refit a sliding window ending at) the new rows, and the LSTM fine-tunes for a few epochs on
+        the new windows; the work grows with the new candles, not the history. Before updating, the
+        model is scored on the new rows it has not seen (``online_metrics``).
+
+        Args:
+        - options (dict): Overrides of ``UPDATE_DEFAULTS``.
+
+        Returns:
+        - tuple: ``(artifact, meta)`` for ``ModelRegistry.save``, or ``None`` if there is nothing (or
+          not yet enough) to update on.
+        """
+        if model not in ONLINE_MODELS:
+            raise ValueError(f"{model} has no online update; refit it instead")
+        params = {**MODEL_DEFAULTS[model], **(params or {})}
+        options = {**UPDATE_DEFAULTS, **(options or {})}
+        new = self.new_rows(meta)
+        if new == 0:
+            return None
+        started = time.perf_counter()
+        estimator = artifact['model']
+        artifact = dict(artifact)
+
+        if model in TREE_MODELS:
+            if new < options['min_rows']:
+                return None
+            builder = FeatureBuilder(lags=params['lags'])
+            rows = new + WARMUP_BARS if options['policy'] == 'warm_start' else options['window'] + WARMUP_BARS
+            data = builder.build(self.df.iloc[-rows:])
+            metrics = forecast_metrics(data.y[-new:], estimator.predict(data.X[-new:]))
+            if options['policy'] == 'window':
+                artifact['model'] = window_refit(estimator, data.X, data.y, options['window'], self.n_jobs)
+            else:
+                artifact['model'] = warm_start_trees(estimator, data.X[-new:], data.y[-new:],
+                                                     options['trees_per_update'], options['max_trees'], self.n_jobs)
+        elif model == 'arima':
+            values = self.df['close'].to_numpy(dtype=np.float64)[-new:]
+            metrics = forecast_metrics(values, estimator.forecast(steps=new))
+            artifact['model'] = extend_arima(estimator, values)
+        else:
+            scaler = artifact['scaler']
+            history = self.df['close'].to_numpy(dtype=np.float64)[-(new + params['window']):]
+            x, y = sliding_windows(scaler.transform(history.reshape(-1, 1))[:, 0], params['window'])
+            predicted = scaler.inverse_transform(estimator.predict(x, verbose=0))
+            metrics = forecast_metrics(history[-len(y):], predicted)
+            artifact['model'] = finetune_network(estimator, x, y, options['epochs'], params['batch_size'])
+
+        parent = meta.get('version')
+        lineage = ('path', 'version', 'created_at', 'native', 'pair', 'interval', 'model', 'params')
+        meta = {key: value for key, value in meta.items() if key not in lineage}
+        meta.update({
+            'parent': parent,
+            'data': dict(meta['data'], end=str(self.df.index[-1]), rows=meta['data']['rows'] + new),
+            'online_metrics': metrics,
+            'updates': meta.get('updates', 0) + 1,
+            'update_options': options if model in TREE_MODELS else {'epochs': options['epochs']},
+            'update_seconds': time.perf_counter() - started,
+        })
+        return artifact, meta
+
+    def backtest(self, model, params=None, **options):
+        """Walk-forward backtest of one model on this series (see ``backtesting.walk_forward``)."""
+        from .backtesting import walk_forward
+        return walk_forward(self.df, model, params, **options)
+
+    def forecast(self, model, artifact, params=None, meta=None):
+        """
+        Predict the next bars from a fitted artifact (see ``fit``) and the current data; no training.
+
+        Args:
+        - meta (dict): The artifact's registry meta. ARIMA forecasts from the end of the data it has
+          filtered, so it is first carried forward over the candles after ``meta['data']['end']``.
+
+        Returns:
+        - DataFrame: Predicted ``close`` indexed by the start times of the forecast bars.
+        """
+        params = {**MODEL_DEFAULTS[model], **(params or {})}
+        estimator = artifact['model']
+        if model in TREE_MODELS:
+            values = estimator.predict(FeatureBuilder(lags=params['lags']).latest(self.df))
+        elif model == 'arima':
+            new = self.new_rows(meta) if meta is not None else 0
+            if new > 0:
+                estimator = extend_arima(estimator, self.df['close'].to_numpy(dtype=np.float64)[-new:])
+            values = estimator.forecast(steps=params['steps'])
+        elif model == 'lstm':
+            scaler = artifact['scaler']
+            window = scaler.transform(self.df['close'].to_numpy(dtype=np.float64)[-params['window']:].reshape(-1, 1))
+            values = scaler.inverse_transform(estimator.predict(window.reshape(1, -1, 1), verbose=0))[0]
+        elif model == 'prophet':
+            future = pd.DataFrame({'ds': self.future_index(params['periods'])})
+            values = estimator.predict(future)['yhat'].to_numpy()
+        else:
+            raise ValueError(f"Unknown model {model!r}; expected one of {list(MODEL_DEFAULTS)}")
+        values = np.asarray(values, dtype=np.float64).ravel()
+        return pd.DataFrame({'close': values}, index=self.future_index(len(values)))
+
     def arima_forecast(self):
-        model = ARIMA(self.df['close'], order=(5, 1, 0))  # Example order
+        plt = backend('pyplot')
+        model = backend('arima')(self.df['close'], order=(5, 1, 0))  # Example order
         model_fit = model.fit()
         predictions = model_fit.forecast(steps=10)  # Forecast the next 10 data points
 
@@ -36,17 +285,15 @@ class ForecastingModels:
         return predictions
 
     def random_forest_forecast(self):
-        self.df['lag_1'] = self.df['close'].shift(1)
-        self.df.dropna(inplace=True)
-
-        X = self.df[['lag_1']]
-        y = self.df['close']
+        plt, train_test_split = backend('pyplot'), backend('train_test_split')
+        data = self.features(FeatureBuilder(lags=1))
 
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Chronological train-test split: the newest 20% of bars are the test set
+        X_train, X_test, y_train, y_test, _, test_index = train_test_split(data.X, data.y, data.index, test_size=0.2,
+                                                                           shuffle=False)
 
         # Model training
-        model = RandomForestRegressor(n_estimators=100)
+        model = backend('random_forest')(n_estimators=100)
         model.fit(X_train, y_train)
 
         # Predictions
@@ -54,8 +301,8 @@ class ForecastingModels:
 
         # Plotting
         plt.figure(figsize=(10, 5))
-        plt.plot(y_test.index, y_test, label='Actual Prices', color='blue')
-        plt.plot(y_test.index, predictions, label='Predicted Prices', color='orange')
+        plt.plot(test_index, y_test, label='Actual Prices', color='blue')
+        plt.plot(test_index, predictions, label='Predicted Prices', color='orange')
         plt.title('15-Minute Forecast using Random Forest')
         plt.xlabel('Time')
         plt.ylabel('Price')
@@ -65,18 +312,15 @@ class ForecastingModels:
         return predictions
 
     def gradient_boosting_forecast(self):
-        self.df['lag_1'] = self.df['close'].shift(1)
-        self.df['lag_2'] = self.df['close'].shift(2)
-        self.df.dropna(inplace=True)
+        plt, train_test_split = backend('pyplot'), backend('train_test_split')
+        data = self.features(FeatureBuilder(lags=2))
 
-        X = self.df[['lag_1', 'lag_2']]
-        y = self.df['close']
-
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Chronological train-test split: the newest 20% of bars are the test set
+        X_train, X_test, y_train, y_test, _, test_index = train_test_split(data.X, data.y, data.index, test_size=0.2,
+                                                                           shuffle=False)
 
         # Model training
-        model = GradientBoostingRegressor(n_estimators=100)
+        model = backend('gradient_boosting')(n_estimators=100)
         model.fit(X_train, y_train)
 
         # Predictions
@@ -84,8 +328,8 @@ class ForecastingModels:
 
         # Plotting
         plt.figure(figsize=(10, 5))
-        plt.plot(y_test.index, y_test, label='Actual Prices', color='blue')
-        plt.plot(y_test.index, predictions, label='Predicted Prices', color='orange')
+        plt.plot(test_index, y_test, label='Actual Prices', color='blue')
+        plt.plot(test_index, predictions, label='Predicted Prices', color='orange')
         plt.title('30-Minute Forecast using Gradient Boosting')
         plt.xlabel('Time')
         plt.ylabel('Price')
@@ -95,6 +339,7 @@ class ForecastingModels:
         return predictions
 
     def lstm_forecast(self):
+        plt = backend('pyplot')
         data = self.df['close'].values.reshape(-1, 1)
 
         # Normalize the data
@@ -102,22 +347,15 @@ class ForecastingModels:
         scaler = MinMaxScaler()
         scaled_data = scaler.fit_transform(data)
 
-        # Prepare training data
-        x_train = []
-        y_train = []
-        for i in range(60, len(scaled_data)):
-            x_train.append(scaled_data[i - 60:i, 0])
-            y_train.append(scaled_data[i, 0])
-        x_train, y_train = np.array(x_train), np.array(y_train)
-
-        # Reshape for LSTM
-        x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
+        # Prepare training data: (samples, 60, 1) windows and the next value, from a strided view
+        x_train, y_train = sliding_windows(scaled_data[:, 0], 60)
 
         # Model training
-        model = Sequential()
-        model.add(LSTM(units=50, return_sequences=True, input_shape=(x_train.shape[1], 1)))
-        model.add(LSTM(units=50))
-        model.add(Dense(units=1))  # Output layer
+        keras = backend('keras')
+        model = keras.models.Sequential()
+        model.add(keras.layers.LSTM(units=50, return_sequences=True, input_shape=(x_train.shape[1], 1)))
+        model.add(keras.layers.LSTM(units=50))
+        model.add(keras.layers.Dense(units=1))  # Output layer
         model.compile(optimizer='adam', loss='mean_squared_error')
         model.fit(x_train, y_train, epochs=50, batch_size=32)
 
@@ -144,11 +382,12 @@ class ForecastingModels:
         return predicted_price
 
     def prophet_forecast(self):
+        plt = backend('pyplot')
         # Prepare the data for Prophet
         df_prophet = self.df.reset_index().rename(columns={'timestamp': 'ds', 'close': 'y'})
     
         # Model training
-        model = Prophet()
+        model = backend('prophet')()
         model.fit(df_prophet)
     
         # Future dataframe for predictions
@@ -165,18 +404,15 @@ class ForecastingModels:
         return forecast
 
     def xgboost_forecast(self):
-        self.df['lag_1'] = self.df['close'].shift(1)
-        self.df['lag_2'] = self.df['close'].shift(2)
-        self.df.dropna(inplace=True)
-
-        X = self.df[['lag_1', 'lag_2']]
-        y = self.df['close']
+        plt, train_test_split = backend('pyplot'), backend('train_test_split')
+        data = self.features(FeatureBuilder(lags=2))
 
-        # Train-test split
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        # Chronological train-test split: the newest 20% of bars are the test set
+        X_train, X_test, y_train, y_test, _, test_index = train_test_split(data.X, data.y, data.index, test_size=0.2,
+                                                                           shuffle=False)
 
         # Model training
-        model = xgb.XGBRegressor(n_estimators=100)
+        model = backend('xgboost')(n_estimators=100)
         model.fit(X_train, y_train)
 
         # Predictions
@@ -184,8 +420,8 @@ class ForecastingModels:
 
         # Plotting
         plt.figure(figsize=(10, 5))
-        plt.plot(y_test.index, y_test, label='Actual Prices', color='blue')
-        plt.plot(y_test.index, predictions, label='Predicted Prices', color='orange')
+        plt.plot(test_index, y_test, label='Actual Prices', color='blue')
+        plt.plot(test_index, predictions, label='Predicted Prices', color='orange')
         plt.title('12-Hour Forecast using XGBoost')
         plt.xlabel('Time')
         plt.ylabel('Price')
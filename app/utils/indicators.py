@@ -0,0 +1,210 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_INDICATORS = ('sma_7', 'sma_30', 'ema_20', 'rsi_14', 'macd_12_26_9', 'bb_20_2', 'atr_14', 'vwap')
+
+
+def _nan(n):
+    return np.full(n, np.nan)
+
+
+def sma(x, n):
+    out = _nan(len(x))
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).mean(axis=1)
+    return out
+
+
+def smoothed(x, n, alpha):
+    """
+    Exponential smoothing seeded with the simple mean of the first ``n`` valid values.
+
+    ``y[t] = alpha * x[t] + (1 - alpha) * y[t-1]``, evaluated by ``lfilter`` in one C pass. Leading
+    NaNs (e.g. from an upstream indicator's warm-up) are skipped.
+    """
+    out = _nan(len(x))
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < n:
+        return out
+    first = valid[0]
+    seed = x[first:first + n].mean()
+    out[first + n - 1] = seed
+    if first + n < len(x):
+        from scipy.signal import lfilter  # Imported on first use: scipy.signal costs about a second to import
+        out[first + n:] = lfilter([alpha], [1.0, -(1.0 - alpha)], x[first + n:], zi=[(1.0 - alpha) * seed])[0]
+    return out
+
+
+def ema(x, n):
+    return smoothed(x, n, 2.0 / (n + 1))
+
+
+def wilder(x, n):
+    return smoothed(x, n, 1.0 / n)
+
+
+def rsi(close, n=14):
+    """Wilder's RSI: gains and losses smoothed with ``alpha = 1/n`` after an ``n``-period mean seed."""
+    delta = np.diff(close, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[0] = loss[0] = np.nan
+    avg_gain, avg_loss = wilder(gain, n), wilder(loss, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    out[(avg_loss == 0) & ~np.isnan(avg_gain)] = 100.0
+    return out
+
+
+def true_range(high, low, close):
+    prev_close = np.r_[np.nan, close[:-1]]
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[0] = high[0] - low[0]
+    return tr
+
+
+def rolling_std(x, n, ddof=0):
+    out = _nan(len(x))
+    if len(x) >= n:
+        out[n - 1:] = sliding_window_view(x, n).std(axis=1, ddof=ddof)
+    return out
+
+
+def vwap(high, low, close, volume, n=None):
+    """Volume-weighted average of the typical price, cumulative or over a rolling ``n``-bar window."""
+    typical = (high + low + close) / 3.0
+    if n is None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.cumsum(typical * volume) / np.cumsum(volume)
+    out = _nan(len(close))
+    if len(close) >= n:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[n - 1:] = (sliding_window_view(typical * volume, n).sum(axis=1)
+                           / sliding_window_view(volume, n).sum(axis=1))
+    return out
+
+
+def log_returns(close):
+    return np.diff(np.log(close), prepend=np.nan)
+
+
+class IndicatorBlock:
+    """Indicator columns of one series as a single column-major float64 block plus names and time index."""
+
+    def __init__(self, names, values, index):
+        self.names = list(names)
+        self.values = values
+        self.index = index
+        self._positions = {name: i for i, name in enumerate(self.names)}
+
+    def __getitem__(self, name):
+        return self.values[:, self._positions[name]]
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def to_frame(self):
+        return pd.DataFrame(self.values, index=self.index, columns=self.names)
+
+
+class IndicatorEngine:
+    """
+    Compute a set of indicators in one batch over NumPy arrays.
+
+    Indicators are named ``<kind>_<params>``: ``sma_7``, ``ema_20``, ``rsi_14``, ``macd_12_26_9``
+    (adds ``macd_signal_..`` and ``macd_hist_..``), ``bb_20_2`` (adds ``bb_upper_..``/``bb_lower_..``
+    around ``sma_20``), ``atr_14``, ``vwap`` / ``vwap_96`` and ``vol_30`` (rolling std of log returns).
+    Shared intermediates (the float64 price arrays, EMAs, diffs, true range) are computed once per
+    series, so e.g. MACD reuses the EMAs already requested elsewhere.
+    """
+
+    PATTERN = re.compile(r'^(sma|ema|rsi|macd|bb|atr|vwap|vol)((?:_[0-9.]+)*)$')
+
+    def __init__(self, indicators=DEFAULT_INDICATORS):
+        self.indicators = list(indicators)
+        for name in self.indicators:
+            if not self.PATTERN.match(name):
+                raise ValueError(f"Unknown indicator: {name}")
+
+    def compute(self, df):
+        """
+        Args:
+        - df (DataFrame): Candles with ``close`` (and ``high``/``low``/``volume`` for ATR and VWAP).
+
+        Returns:
+        - IndicatorBlock
+        """
+        arrays = {column: df[column].to_numpy(dtype=np.float64) for column in ['open', 'high', 'low', 'close', 'volume']
+                  if column in df}
+        memo = {}
+
+        def cached(key, fn):
+            if key not in memo:
+                memo[key] = fn()
+            return memo[key]
+
+        close = arrays['close']
+        columns = {}
+        for name in self.indicators:
+            kind, *params = name.split('_')
+            params = [float(p) if '.' in p else int(p) for p in params]
+            if kind == 'sma':
+                columns[name] = cached(name, lambda: sma(close, params[0]))
+            elif kind == 'ema':
+                columns[name] = cached(name, lambda: ema(close, params[0]))
+            elif kind == 'rsi':
+                columns[name] = rsi(close, *params)
+            elif kind == 'macd':
+                fast, slow, signal = params or (12, 26, 9)
+                line = cached(f'ema_{fast}', lambda: ema(close, fast)) - cached(f'ema_{slow}', lambda: ema(close, slow))
+                suffix = '_'.join(map(str, (fast, slow, signal)))
+                columns[f'macd_{suffix}'] = line
+                columns[f'macd_signal_{suffix}'] = ema(line, signal)
+                columns[f'macd_hist_{suffix}'] = line - columns[f'macd_signal_{suffix}']
+            elif kind == 'bb':
+                n, k = params or (20, 2)
+                mid = cached(f'sma_{n}', lambda: sma(close, n))
+                std = rolling_std(close, n)
+                columns[f'sma_{n}'] = mid
+                columns[f'bb_upper_{n}_{k}'] = mid + k * std
+                columns[f'bb_lower_{n}_{k}'] = mid - k * std
+            elif kind == 'atr':
+                tr = cached('tr', lambda: true_range(arrays['high'], arrays['low'], close))
+                columns[name] = wilder(tr, params[0] if params else 14)
+            elif kind == 'vwap':
+                columns[name] = vwap(arrays['high'], arrays['low'], close, arrays['volume'], *params)
+            elif kind == 'vol':
+                returns = cached('log_returns', lambda: log_returns(close))
+                columns[name] = rolling_std(returns, params[0] if params else 30, ddof=1)
+
+        values = np.empty((len(close), len(columns)), dtype=np.float64, order='F')
+        for i, column in enumerate(columns.values()):
+            values[:, i] = column
+        return IndicatorBlock(columns.keys(), values, df.index)
+
+    def compute_many(self, frames, max_workers=None):
+        """
+        Compute the same indicator set for many series (intervals and/or pairs) in one call.
+
+        NumPy and ``lfilter`` release the GIL on the heavy loops, so ``max_workers`` > 1 computes
+        series in parallel threads.
+
+        Returns:
+        - dict: ``{key: IndicatorBlock}`` with the keys of ``frames``.
+        """
+        if not max_workers or max_workers == 1:
+            return {key: self.compute(df) for key, df in frames.items()}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {key: executor.submit(self.compute, df) for key, df in frames.items()}
+            return {key: future.result() for key, future in futures.items()}
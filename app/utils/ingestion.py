@@ -0,0 +1,267 @@
+import json
+import logging
+import queue
+import threading
+import time
+from typing import NamedTuple
+
+import pandas as pd
+import websocket
+
+logger = logging.getLogger(__name__)
+
+class Candle(NamedTuple):
+    pair: str
+    interval: str
+    startTime: int
+    endTime: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    closed: bool
+    eventTime: int
+
+
+class Tick(NamedTuple):
+    pair: str
+    price: float
+    quantity: float
+    tradeTime: int
+    eventTime: int
+
+
+def _unwrap(message):
+    """Strip a socket.io ``42["event", {...}]`` envelope down to ``(event, payload)``."""
+    if isinstance(message, bytes):
+        message = message.decode()
+    message = message.lstrip('0123456789')
+    if not message:
+        return None, None
+    data = json.loads(message)
+    if isinstance(data, list):
+        return (data[0], data[1]) if len(data) > 1 else (data[0], None)
+    return data.get('e'), data
+
+
+def parse_message(message):
+    """
+    Parse a raw market-data message into a ``Candle`` or ``Tick``.
+
+    Kline and trade payloads follow the exchange's compact field names (``k.t``, ``k.o``, ``p``,
+    ``q``...). Anything else (subscription acks, pings) returns ``None``.
+    """
+    event, data = _unwrap(message)
+    if not isinstance(data, dict):
+        return None
+    event = data.get('e', event)
+    if event == 'kline' and 'k' in data:
+        k = data['k']
+        return Candle(
+            pair=data.get('s', k.get('s')), interval=k['i'], startTime=int(k['t']), endTime=int(k['T']),
+            open=float(k['o']), high=float(k['h']), low=float(k['l']), close=float(k['c']),
+            volume=float(k['v']), closed=bool(k.get('x', False)), eventTime=int(data.get('E', k['T'])),
+        )
+    if event in ('trade', 'aggTrade') and 'p' in data:
+        return Tick(
+            pair=data['s'], price=float(data['p']), quantity=float(data['q']),
+            tradeTime=int(data.get('T', data.get('E'))), eventTime=int(data.get('E', data.get('T'))),
+        )
+    return None
+
+
+class StoreSink:
+    """
+    Flush batches of candles into a candle store (either backend), one write per (pair, interval).
+
+    With a ``RollupPyramid`` the same batch is folded into the hour/day/week rollups after the write.
+    """
+
+    def __init__(self, store, rollups=None):
+        self.store = store
+        self.rollups = rollups
+
+    def __call__(self, records):
+        candles = [record for record in records if isinstance(record, Candle)]
+        if not candles:
+            return
+        df = pd.DataFrame(candles, columns=Candle._fields)
+        for (pair, interval), group in df.groupby(['pair', 'interval'], sort=False):
+            candles = group[['startTime', 'open', 'high', 'low', 'close', 'endTime', 'volume']]
+            self.store.write(pair, interval, candles)
+            if self.rollups is not None:
+                self.rollups.update(pair, interval, candles)
+
+
+class StreamIngestor:
+    """
+    WebSocket ingestion stage: parse -> bounded queue -> batched flush to a sink.
+
+    ``on_message`` runs on the socket thread and only parses and enqueues. The queue is bounded, so a
+    slow sink blocks the socket reader (``overflow='block'``), which pushes back on the connection
+    instead of growing memory; ``overflow='drop'`` discards and counts records instead. A flusher
+    thread drains the queue, coalesces updates of the same forming candle and hands batches to the
+    sink. A failing sink is logged and counted, and its batch kept and retried on the next flush
+    interval. The connection is re-opened with exponential backoff and the streams re-subscribed.
+    """
+
+    def __init__(self, url, sink, streams=(), queue_size=10_000, batch_size=500, flush_interval=1.0,
+                 overflow='block', put_timeout=5.0, reconnect_backoff=1.0, max_backoff=30.0,
+                 app_factory=websocket.WebSocketApp, recorder=None):
+        """
+        Args:
+        - url (str): WebSocket endpoint.
+        - sink (callable): Receives each batch as a list of ``Candle``/``Tick`` records.
+        - streams (list of str): Stream names sent in the subscribe message on every (re)connect.
+        - queue_size (int): Capacity of the record queue.
+        - batch_size (int): Flush once this many records are pending.
+        - flush_interval (float): Flush at least this often (seconds) while records are pending.
+        - overflow (str): ``'block'`` to apply backpressure to the socket, ``'drop'`` to discard.
+        - put_timeout (float): In block mode, how long to wait for space before dropping anyway.
+        - reconnect_backoff (float): First reconnect delay in seconds, doubled up to ``max_backoff``.
+        - app_factory (callable): Builds the WebSocket client; replaceable for local testing.
+        - recorder (StreamRecorder): Captures every raw message for later replay.
+        """
+        self.url = url
+        self.sink = sink
+        self.streams = list(streams)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.put_timeout = put_timeout
+        self.reconnect_backoff = reconnect_backoff
+        self.max_backoff = max_backoff
+        self.app_factory = app_factory
+        self.recorder = recorder
+        self.listeners = []
+        self.ws = None
+        self._stop = threading.Event()
+        self._flusher = None
+        self.metrics = {
+            'received': 0, 'parsed': 0, 'parse_errors': 0, 'dropped': 0, 'flushed': 0, 'batches': 0,
+            'sink_errors': 0, 'connects': 0, 'reconnects': 0, 'last_lag_ms': 0.0, 'max_lag_ms': 0.0,
+            'last_flush_ms': 0.0, 'queue_depth': 0, 'queue_high_water': 0,
+        }
+
+    def add_listener(self, callback):
+        """Call ``callback(record)`` on the socket thread for every parsed record, e.g. an aggregator."""
+        self.listeners.append(callback)
+
+    def subscribe_message(self):
+        return json.dumps({'method': 'SUBSCRIBE', 'params': self.streams})
+
+    def on_open(self, ws):
+        self.metrics['connects'] += 1
+        if self.streams:
+            ws.send(self.subscribe_message())
+
+    def on_message(self, ws, message):
+        self.metrics['received'] += 1
+        if self.recorder is not None:
+            self.recorder.record(message)
+        try:
+            record = parse_message(message)
+        except (ValueError, KeyError, TypeError):
+            self.metrics['parse_errors'] += 1
+            return
+        if record is None:
+            return
+        self.metrics['parsed'] += 1
+        lag = time.time() * 1000 - record.eventTime
+        self.metrics['last_lag_ms'] = lag
+        self.metrics['max_lag_ms'] = max(self.metrics['max_lag_ms'], lag)
+        for listener in self.listeners:
+            listener(record)
+        self.put(record)
+
+    def put(self, record):
+        try:
+            if self.overflow == 'block':
+                self.queue.put(record, timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.metrics['dropped'] += 1
+            return
+        depth = self.queue.qsize()
+        self.metrics['queue_high_water'] = max(self.metrics['queue_high_water'], depth)
+
+    def _flush(self, candles, ticks):
+        """Hand the pending records to the sink; on failure keep them for the next attempt and return False."""
+        if not candles and not ticks:
+            return True
+        started = time.perf_counter()
+        records = list(candles.values()) + ticks
+        try:
+            self.sink(records)
+        except Exception:
+            self.metrics['sink_errors'] += 1
+            logger.exception("sink failed on a batch of %d records; retrying", len(records))
+            return False
+        self.metrics['last_flush_ms'] = (time.perf_counter() - started) * 1000
+        self.metrics['flushed'] += len(records)
+        self.metrics['batches'] += 1
+        candles.clear()
+        ticks.clear()
+        return True
+
+    def _flush_loop(self):
+        # Candles are keyed so repeated updates of one forming candle collapse into its latest state
+        candles, ticks = {}, []
+        failed = False
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                record = self.queue.get(timeout=max(0.0, min(deadline - time.monotonic(), 0.1)))
+            except queue.Empty:
+                record = None
+            if isinstance(record, Candle):
+                candles[(record.pair, record.interval, record.startTime)] = record
+            elif record is not None:
+                ticks.append(record)
+            self.metrics['queue_depth'] = self.queue.qsize()
+            # After a sink failure only the flush interval triggers retries, so a broken sink is not hammered
+            full = len(candles) + len(ticks) >= self.batch_size and not failed
+            if full or time.monotonic() >= deadline:
+                failed = not self._flush(candles, ticks)
+                deadline = time.monotonic() + self.flush_interval
+        self._flush(candles, ticks)
+
+    def start_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def run(self):
+        """Connect, ingest and reconnect until ``stop()`` is called. Blocks the calling thread."""
+        self.start_flusher()
+        delay = self.reconnect_backoff
+        while not self._stop.is_set():
+            connects = self.metrics['connects']
+            self.ws = self.app_factory(self.url, on_open=self.on_open, on_message=self.on_message)
+            self.ws.run_forever(ping_interval=20, ping_timeout=10)
+            if self._stop.is_set():
+                break
+            if self.metrics['connects'] > connects:
+                delay = self.reconnect_backoff  # The connection was healthy; start backing off afresh
+            self.metrics['reconnects'] += 1
+            self._stop.wait(delay)
+            delay = min(self.max_backoff, delay * 2)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self, timeout=5.0):
+        """Close the connection and flush whatever is still queued."""
+        self._stop.set()
+        if self.ws is not None:
+            self.ws.close()
+        if self._flusher is not None:
+            self._flusher.join(timeout)
+        if self.recorder is not None:
+            self.recorder.close()
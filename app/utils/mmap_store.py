@@ -0,0 +1,184 @@
+import os
+import numpy as np
+import pandas as pd
+
+from .candle_store import to_epoch_ms
+from .config import DATA_DIR
+
+MMAP_DIR = os.environ.get('PI42_MMAP_DIR', os.path.join(DATA_DIR, 'mmap'))
+
+# Fixed-width kline schema; prices are float64, which holds fractional quotes and integer INR exactly
+COLUMN_DTYPES = {
+    'startTime': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'endTime': np.dtype('<i8'),
+    'volume': np.dtype('<f8'),
+}
+
+
+class MmapSeries:
+    """
+    One (pair, interval) series stored as one raw little-endian file per column.
+
+    Readers get read-only ``np.memmap`` views, so every process that opens the series shares the same
+    page-cached bytes instead of holding its own parsed copy. Appends write all column files first and
+    then publish the new row count in ``length``, so readers never observe a half-written row.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+        - path (str): Directory holding the column files of the series.
+        """
+        self.path = path
+        self._maps = {}
+
+    def _column_path(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def __len__(self):
+        try:
+            with open(os.path.join(self.path, 'length'), 'rb') as f:
+                return int(np.frombuffer(f.read(8), dtype='<i8')[0])
+        except (FileNotFoundError, IndexError):
+            return 0
+
+    def _publish_length(self, length):
+        tmp_path = os.path.join(self.path, 'length.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(np.int64(length).astype('<i8').tobytes())
+        os.replace(tmp_path, os.path.join(self.path, 'length'))
+
+    def column(self, name, length=None):
+        """Zero-copy, read-only view of the first ``length`` rows of a column."""
+        length = len(self) if length is None else length
+        if length == 0:
+            return np.empty(0, dtype=COLUMN_DTYPES[name])
+        cached = self._maps.get(name)
+        if cached is None or len(cached) < length:
+            # The file grew since it was mapped; remap at the current size
+            size = os.path.getsize(self._column_path(name)) // COLUMN_DTYPES[name].itemsize
+            cached = np.memmap(self._column_path(name), dtype=COLUMN_DTYPES[name], mode='r', shape=(size,))
+            self._maps[name] = cached
+        return cached[:length]
+
+    def arrays(self, columns=None, start=None, end=None):
+        """
+        Views of the requested columns restricted to ``start <= startTime <= end`` (epoch ms).
+
+        Returns:
+        - dict: ``{column: ndarray}``; the arrays are slices of the memory maps, not copies.
+        """
+        length = len(self)
+        columns = list(COLUMN_DTYPES) if columns is None else ['startTime'] + [c for c in columns if c != 'startTime']
+        start_times = self.column('startTime', length)
+        lo = 0 if start is None else int(np.searchsorted(start_times, start, side='left'))
+        hi = length if end is None else int(np.searchsorted(start_times, end, side='right'))
+        return {name: self.column(name, length)[lo:hi] for name in columns}
+
+    def append(self, df):
+        """
+        Append candles newer than the last stored one; a candle equal to the last ``startTime`` replaces it.
+
+        Args:
+        - df (DataFrame or dict): Columns of the kline schema with epoch-millisecond times.
+
+        Returns:
+        - int: Number of rows written, including a replaced last row.
+        """
+        data = {name: np.asarray(df[name]) for name in COLUMN_DTYPES}
+        order = np.argsort(data['startTime'], kind='stable')
+        data = {name: values[order] for name, values in data.items()}
+        os.makedirs(self.path, exist_ok=True)
+
+        length = len(self)
+        last = int(self.column('startTime', length)[-1]) if length else None
+        if last is not None:
+            keep = data['startTime'] >= last
+            data = {name: values[keep] for name, values in data.items()}
+        if len(data['startTime']) == 0:
+            return 0
+        # Keep the latest copy of duplicated startTimes within the batch
+        unique = np.append(data['startTime'][1:] != data['startTime'][:-1], True)
+        data = {name: values[unique] for name, values in data.items()}
+
+        offset = length
+        if last is not None and data['startTime'][0] == last:
+            offset = length - 1
+        for name, dtype in COLUMN_DTYPES.items():
+            values = data[name]
+            with open(self._column_path(name), 'r+b' if os.path.exists(self._column_path(name)) else 'wb') as f:
+                f.seek(offset * dtype.itemsize)
+                f.write(values.astype(dtype).tobytes())
+        self._publish_length(offset + len(data['startTime']))
+        return len(data['startTime'])
+
+    def to_frame(self, columns=None, start=None, end=None):
+        """Wrap the views in a DataFrame indexed by ``startTime`` datetimes without copying the columns."""
+        arrays = self.arrays(columns, start, end)
+        index = pd.DatetimeIndex(arrays.pop('startTime').view('datetime64[ms]'), name='startTime')
+        if 'endTime' in arrays:
+            arrays['endTime'] = arrays['endTime'].view('datetime64[ms]')
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+
+class MmapCandleStore:
+    """Memory-mapped OHLCV backend laid out as ``<root>/<pair>/<interval>/<column>.bin``."""
+
+    def __init__(self, root=MMAP_DIR):
+        self.root = root
+        self._series = {}
+
+    def series(self, pair, interval):
+        key = (pair, interval)
+        if key not in self._series:
+            self._series[key] = MmapSeries(os.path.join(self.root, pair, interval))
+        return self._series[key]
+
+    def has(self, pair, interval):
+        return len(self.series(pair, interval)) > 0
+
+    def pairs(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(pair for pair in os.listdir(self.root) if self.intervals(pair))
+
+    def intervals(self, pair):
+        path = os.path.join(self.root, pair)
+        if not os.path.isdir(path):
+            return []
+        return sorted(interval for interval in os.listdir(path) if self.has(pair, interval))
+
+    def append(self, pair, interval, df):
+        if df is None or len(df) == 0:
+            return 0
+        if 'startTime' not in getattr(df, 'columns', df):
+            df = df.reset_index()
+        if not isinstance(df, dict) and not pd.api.types.is_integer_dtype(df['startTime']):
+            df = df.copy()
+            for column in ['startTime', 'endTime']:
+                df[column] = pd.to_datetime(df[column]).astype('int64') // 1_000_000
+        return self.series(pair, interval).append(df)
+
+    # CandleStore-compatible write, so either backend can receive synced deltas
+    write = append
+
+    def arrays(self, pair, interval, columns=None, start=None, end=None):
+        return self.series(pair, interval).arrays(columns, start, end)
+
+    def read(self, pair, interval, columns=None, start=None, end=None):
+        if not self.has(pair, interval):
+            return None
+        return self.series(pair, interval).to_frame(columns, to_epoch_ms(start), to_epoch_ms(end))
+
+    def last_start_time(self, pair, interval):
+        """``startTime`` of the newest stored candle, read from the last published row."""
+        series = self.series(pair, interval)
+        length = len(series)
+        return int(series.column('startTime', length)[-1]) if length else None
+
+    def import_csv(self, pair, interval, path):
+        return self.append(pair, interval, pd.read_csv(path))
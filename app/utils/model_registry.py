@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from .backends import backend
+from .config import MODEL_DIR
+
+META_FILE = 'meta.json'
+ARTIFACT_FILE = 'artifact.pkl'
+BEST_FILE = 'best.json'
+
+
+def params_key(params):
+    """Short stable digest of a parameter dict (feature spec included), used as a directory name."""
+    text = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _is_keras(value):
+    return type(value).__module__.split('.')[0] in ('keras', 'tf_keras', 'tensorflow')
+
+
+class ModelRegistry:
+    """
+    Fitted forecasting models on disk, keyed by ``(pair, interval, model, params)``.
+
+    Each fit is one immutable version directory,
+    ``<root>/pair=<pair>/interval=<interval>/model=<model>/<params digest>/v<epoch ms>/``, holding
+    the pickled artifact (Keras models are saved natively next to it) and ``meta.json``: params,
+    feature spec, training data range and version, metrics and fit time. Versions are written to a
+    temporary directory and renamed into place, so readers never see half an artifact; loaded
+    artifacts are memoized, one version per (pair, interval, model, params), so serving a forecast does
+    not touch the disk again and loading a newer version releases the previous one. A tuned
+    model also has ``best.json`` next to its params directories, naming the params the search picked.
+    """
+
+    def __init__(self, root=MODEL_DIR):
+        """
+        Args:
+        - root (str): Directory holding the registry.
+        """
+        self.root = root
+        self._loaded = {}  # params directory -> (version path, artifact)
+        self._lock = threading.Lock()
+
+    def path(self, pair, interval, model, params):
+        return os.path.join(self.root, f"pair={pair}", f"interval={interval}", f"model={model}", params_key(params))
+
+    def versions(self, pair, interval, model, params):
+        path = self.path(pair, interval, model, params)
+        if not os.path.isdir(path):
+            return []
+        return sorted((name for name in os.listdir(path) if name.startswith('v')), key=lambda name: int(name[1:]))
+
+    def save(self, pair, interval, model, params, artifact, meta=None):
+        """
+        Store a new version of a fitted model.
+
+        Args:
+        - artifact (dict): Named objects the model needs to predict (estimator, scaler...).
+        - meta (dict): JSON-serializable description (feature spec, data range, metrics...).
+
+        Returns:
+        - dict: The stored metadata, including ``version`` and ``path``.
+        """
+        base = self.path(pair, interval, model, params)
+        os.makedirs(base, exist_ok=True)
+        version = f"v{int(time.time() * 1000)}"
+        while os.path.exists(os.path.join(base, version)):
+            version = f"v{int(version[1:]) + 1}"
+        tmp_path = os.path.join(base, f".{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp_path)
+
+        picklable, native = {}, []
+        for name, value in artifact.items():
+            if _is_keras(value):
+                value.save(os.path.join(tmp_path, f"{name}.keras"))
+                native.append(name)
+            else:
+                picklable[name] = value
+        with open(os.path.join(tmp_path, ARTIFACT_FILE), 'wb') as f:
+            pickle.dump(picklable, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        meta = dict(meta or {}, pair=pair, interval=interval, model=model, params=params, version=version,
+                    native=native, created_at=pd.Timestamp.now(tz='UTC').isoformat())
+        with open(os.path.join(tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(tmp_path, os.path.join(base, version))
+        return dict(meta, path=os.path.join(base, version))
+
+    def best_path(self, pair, interval, model):
+        return os.path.join(self.root, f"pair={pair}", f"interval={interval}", f"model={model}", BEST_FILE)
+
+    def set_best(self, pair, interval, model, params, summary=None):
+        """Record the tuned params of a model on one pair and interval (see ``tuning.py``)."""
+        path = self.best_path(pair, interval, model)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(summary or {}, params=params, updated_at=pd.Timestamp.now(tz='UTC').isoformat()), f,
+                      indent=2, default=str)
+        os.replace(tmp_path, path)
+
+    def best(self, pair, interval, model):
+        """The recorded tuning result (``params`` plus its search summary), or ``None``."""
+        try:
+            with open(self.best_path(pair, interval, model)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def best_params(self, pair, interval, model):
+        best = self.best(pair, interval, model)
+        return None if best is None else best['params']
+
+    def meta(self, pair, interval, model, params, version=None):
+        """Metadata of one version (the latest by default), or ``None`` if nothing was trained."""
+        versions = self.versions(pair, interval, model, params)
+        if not versions:
+            return None
+        version = version or versions[-1]
+        path = os.path.join(self.path(pair, interval, model, params), version)
+        with open(os.path.join(path, META_FILE)) as f:
+            return dict(json.load(f), path=path)
+
+    def load(self, pair, interval, model, params, version=None):
+        """
+        Returns:
+        - tuple: ``(artifact, meta)`` of one version (the latest by default), or ``(None, None)``.
+        """
+        meta = self.meta(pair, interval, model, params, version)
+        if meta is None:
+            return None, None
+        key = os.path.dirname(meta['path'])
+        with self._lock:
+            path, artifact = self._loaded.get(key, (None, None))
+            if path != meta['path']:
+                with open(os.path.join(meta['path'], ARTIFACT_FILE), 'rb') as f:
+                    artifact = pickle.load(f)
+                if meta.get('native'):
+                    keras = backend('keras')
+                    for name in meta['native']:
+                        artifact[name] = keras.models.load_model(os.path.join(meta['path'], f"{name}.keras"))
+                self._loaded[key] = (meta['path'], artifact)
+        return artifact, meta
+
+    def is_stale(self, meta, df, min_new_bars=1):
+        """Whether ``df`` holds at least ``min_new_bars`` candles newer than the data the model was fit on."""
+        if meta is None:
+            return True
+        trained_until = pd.Timestamp(meta['data']['end'])
+        return int((df.index > trained_until).sum()) >= min_new_bars
+
+    def entries(self):
+        """Latest metadata of every (pair, interval, model, params) in the registry."""
+        found = []
+        for dirpath, dirnames, _ in os.walk(self.root):
+            versions = sorted((name for name in dirnames if name.startswith('v')), key=lambda name: int(name[1:]))
+            if versions:
+                with open(os.path.join(dirpath, versions[-1], META_FILE)) as f:
+                    found.append(dict(json.load(f), path=os.path.join(dirpath, versions[-1])))
+                dirnames[:] = []
+        return found
+
+    def prune(self, pair, interval, model, params, keep=3):
+        """Delete all but the newest ``keep`` versions; returns how many were removed."""
+        versions = self.versions(pair, interval, model, params)
+        stale = versions[:-keep] if keep else versions
+        for version in stale:
+            path = os.path.join(self.path(pair, interval, model, params), version)
+            with self._lock:
+                if self._loaded.get(os.path.dirname(path), (None, None))[0] == path:
+                    self._loaded.pop(os.path.dirname(path))
+            shutil.rmtree(path, ignore_errors=True)
+        return len(stale)
@@ -0,0 +1,67 @@
+import copy
+
+import numpy as np
+
+from .backends import backend
+
+# Online update settings; ForecastingModels.update merges per-call overrides into these
+UPDATE_DEFAULTS = {
+    'policy': 'warm_start',   # Tree ensembles: 'warm_start' (grow on the new rows) or 'window' (refit on the last rows)
+    'trees_per_update': 10,   # Trees / boosting rounds added per warm-start update
+    'max_trees': 300,         # Random forests drop their oldest trees beyond this
+    'window': 2000,           # Rows of the sliding-window refit
+    'min_rows': 20,           # Fewer new rows than this: leave tree models as they are until more arrive
+    'epochs': 3,              # LSTM fine-tuning epochs on the new windows
+}
+
+
+def _threads(estimator, n_jobs):
+    return {'n_jobs': n_jobs} if n_jobs and 'n_jobs' in estimator.get_params() else {}
+
+
+def warm_start_trees(estimator, X, y, trees=10, max_trees=300, n_jobs=None):
+    """
+    Grow a copy of a fitted tree ensemble on new rows only; the served estimator is left untouched.
+
+    Random forests add ``trees`` trees fit on the new rows and retire the oldest beyond ``max_trees``,
+    so the forest slides along the data. Gradient boosting adds ``trees`` stages fit to the residuals
+    of the new rows. XGBoost continues training its booster for ``trees`` rounds. ``n_jobs`` overrides
+    the thread count of the estimators that have one.
+    """
+    threads = _threads(estimator, n_jobs)
+    if hasattr(estimator, 'get_booster'):
+        grown = type(estimator)(**dict(estimator.get_params(), n_estimators=trees, **threads))
+        return grown.fit(X, y, xgb_model=estimator.get_booster())
+
+    grown = copy.deepcopy(estimator)
+    grown.set_params(warm_start=True, n_estimators=estimator.n_estimators + trees, **threads)
+    grown.fit(X, y)
+    if hasattr(grown, 'estimators_') and isinstance(grown.estimators_, list) and len(grown.estimators_) > max_trees:
+        grown.estimators_ = grown.estimators_[-max_trees:]
+        grown.set_params(n_estimators=max_trees)
+    return grown
+
+
+def window_refit(estimator, X, y, window=2000, n_jobs=None):
+    """Sliding-window refresh: a fresh estimator with the same params, fit on the last ``window`` rows."""
+    fresh = type(estimator)(**dict(estimator.get_params(), **_threads(estimator, n_jobs)))
+    return fresh.fit(X[-window:], y[-window:])
+
+
+def extend_arima(results, values):
+    """
+    Carry a fitted ARIMA state forward over new observations, keeping its parameters.
+
+    ``extend`` only runs the Kalman filter over ``values``, starting from the last filtered state,
+    so the cost is proportional to the new observations rather than the whole history.
+    """
+    return results.extend(np.asarray(values, dtype=np.float64))
+
+
+def finetune_network(network, x, y, epochs=3, batch_size=32):
+    """Fine-tune a copy of a Keras network from its current weights on the new windows only."""
+    tuned = backend('keras').models.clone_model(network)
+    tuned.set_weights(network.get_weights())
+    tuned.compile(optimizer='adam', loss='mean_squared_error')
+    tuned.fit(x, y, epochs=epochs, batch_size=batch_size, verbose=0)
+    return tuned
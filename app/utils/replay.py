@@ -0,0 +1,156 @@
+import argparse
+import gzip
+import struct
+import threading
+import time
+
+import numpy as np
+
+MAGIC = b'PI42REC1'
+# Per message: receive time (ns since epoch), payload length; followed by the UTF-8 payload
+RECORD_HEADER = struct.Struct('<qI')
+
+
+def _open(path, mode):
+    return gzip.open(path, mode) if path.endswith('.gz') else open(path, mode)
+
+
+class StreamRecorder:
+    """
+    Capture raw WebSocket messages with their receive timestamps into a compact binary file.
+
+    Use it as ``StreamIngestor(..., recorder=StreamRecorder(path))`` or call ``record`` from any
+    ``on_message`` handler. Paths ending in ``.gz`` are gzip-compressed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = _open(path, 'wb')
+        self.file.write(MAGIC)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def record(self, message, received_ns=None):
+        payload = message.encode() if isinstance(message, str) else bytes(message)
+        received_ns = time.time_ns() if received_ns is None else received_ns
+        with self.lock:
+            self.file.write(RECORD_HEADER.pack(received_ns, len(payload)))
+            self.file.write(payload)
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_recording(path):
+    """Yield ``(received_ns, message)`` pairs from a recording, in capture order."""
+    with _open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a stream recording")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            received_ns, length = RECORD_HEADER.unpack(header)
+            yield received_ns, f.read(length).decode()
+
+
+def _percentiles(samples_ns):
+    if not samples_ns:
+        return {'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    values = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    p50, p99 = np.percentile(values, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99), 'max_ms': float(values.max())}
+
+
+class StreamReplayer:
+    """
+    Feed a recording back into an ``on_message(ws, message)`` handler.
+
+    ``speed=1`` reproduces the captured timing, ``speed=N`` compresses the gaps N times and
+    ``speed=None`` replays as fast as the handler accepts messages. The handler runs synchronously,
+    so its per-message time is the end-to-end latency of everything it drives (ingestion, listeners
+    such as the aggregator and streaming indicators, and any forecasting hooked onto them).
+    """
+
+    def __init__(self, path, speed=1.0):
+        """
+        Args:
+        - path (str): Recording written by ``StreamRecorder``.
+        - speed (float): Replay speed multiplier, ``None`` for as fast as possible.
+        """
+        self.path = path
+        self.speed = speed
+
+    def replay(self, on_message, limit=None):
+        """
+        Replay the recording and return throughput and latency statistics.
+
+        Returns:
+        - dict: ``messages``, ``seconds``, ``messages_per_second``, ``handler`` latency percentiles and
+          ``schedule_lag`` percentiles (how late messages were dispatched relative to the paced timeline).
+        """
+        handler_ns, lag_ns = [], []
+        first_received = None
+        started = time.perf_counter_ns()
+        messages = 0
+        for received_ns, message in read_recording(self.path):
+            if limit is not None and messages >= limit:
+                break
+            if self.speed:
+                if first_received is None:
+                    first_received = received_ns
+                due = started + (received_ns - first_received) / self.speed
+                wait = due - time.perf_counter_ns()
+                if wait > 0:
+                    time.sleep(wait / 1e9)
+                lag_ns.append(max(0, time.perf_counter_ns() - due))
+            before = time.perf_counter_ns()
+            on_message(None, message)
+            handler_ns.append(time.perf_counter_ns() - before)
+            messages += 1
+        seconds = (time.perf_counter_ns() - started) / 1e9
+        return {
+            'messages': messages,
+            'seconds': seconds,
+            'messages_per_second': messages / seconds if seconds else 0.0,
+            'handler': _percentiles(handler_ns),
+            'schedule_lag': _percentiles(lag_ns),
+        }
+
+    def replay_into(self, ingestor, limit=None):
+        """Replay through a ``StreamIngestor`` and include its flush metrics once the queue has drained."""
+        ingestor.start_flusher()
+        stats = self.replay(ingestor.on_message, limit)
+        ingestor.stop()
+        stats['ingestor'] = dict(ingestor.metrics)
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded Pi42 stream through the ingestion path.")
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, default=0, help="Speed multiplier; 0 replays as fast as possible.")
+    parser.add_argument('--pair', default='BTCINR')
+    args = parser.parse_args(argv)
+
+    from .aggregator import CandleAggregator
+    from .ingestion import StreamIngestor
+
+    ingestor = StreamIngestor('replay://', lambda batch: None)
+    aggregator = CandleAggregator(args.pair, on_bar_close=ingestor.put)
+    ingestor.add_listener(aggregator.update)
+    stats = StreamReplayer(args.recording, speed=args.speed or None).replay_into(ingestor)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
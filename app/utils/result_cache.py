@@ -0,0 +1,121 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def data_version(df):
+    """
+    Cheap fingerprint of a candle frame: row count, first/last timestamp and a hash of the whole last row.
+
+    Store frames are append-only (new candles, or the forming candle being replaced), so any change
+    to the data moves at least one of these; hashing every column of the last row catches a forming
+    candle whose high, low or volume moved while its close did not. O(1) whatever the frame size.
+    """
+    if df is None or len(df) == 0:
+        return (0,)
+    last_row = int(pd.util.hash_pandas_object(df.iloc[-1:], index=False).iloc[0])
+    return (len(df), str(df.index[0]), str(df.index[-1]), last_row)
+
+
+def sizeof(value):
+    """Approximate resident bytes of a cached result."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(item) for item in value.values())
+    if hasattr(value, '__dict__'):
+        # Result objects (e.g. statsmodels' DecomposeResult): count the arrays they hold
+        arrays = [item for item in vars(value).values() if isinstance(item, (np.ndarray, pd.DataFrame, pd.Series))]
+        return sys.getsizeof(value) + sum(sizeof(item) for item in arrays)
+    return sys.getsizeof(value)
+
+
+def _freeze(params):
+    if isinstance(params, dict):
+        return tuple(sorted((key, _freeze(value)) for key, value in params.items()))
+    if isinstance(params, (list, tuple, set)):
+        return tuple(_freeze(value) for value in params)
+    return params
+
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache for results derived from the (immutable, shared) candle frames.
+
+    Entries are keyed by ``(pair, interval, computation, params, data version)``, so a new candle
+    yields a new key and stale results simply age out; nothing is ever written back into the frames.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        """
+        Args:
+        - max_bytes (int): Upper bound on the summed ``sizeof`` of the cached results.
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(pair, interval, computation, params, version):
+        return (pair, interval, computation, _freeze(params), version)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = sizeof(value)
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return value  # Larger than the whole cache: hand it back uncached
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def get_or_compute(self, pair, interval, computation, params, version, compute):
+        """Return the cached result or run ``compute()`` and cache it."""
+        key = self.key(pair, interval, computation, params, version)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hits / total if total else 0.0}
+
+
+# Process-wide cache shared by every consumer that is not handed its own
+default_cache = ResultCache()
@@ -0,0 +1,271 @@
+import os
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .aggregator import start_times_ms
+from .candle_store import candles_to_frame
+from .config import INTERVAL_MS, ROLLUP_DIR
+
+DAY_MS = 24 * 60 * 60_000
+
+# Pyramid level -> (bucket length, alignment offset) in ms; weeks start on Monday (the epoch was a Thursday)
+ROLLUP_LEVELS = {
+    '1h': (60 * 60_000, 0),
+    '1d': (DAY_MS, 0),
+    '1w': (7 * DAY_MS, 4 * DAY_MS),
+}
+STAT_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+STAT_FIELDS = ('mean', 'm2', 'min', 'max')
+ROLLUP_COLUMNS = (['startTime', 'count', 'open', 'high', 'low', 'close', 'volume']
+                  + [f"{column}_{field}" for column in STAT_COLUMNS for field in STAT_FIELDS])
+
+
+def _candles(df):
+    """Epoch-ms ``startTime`` plus float64 OHLCV of any candle frame, sorted and de-duplicated."""
+    frame = pd.DataFrame({column: df[column].to_numpy(dtype=np.float64) for column in STAT_COLUMNS})
+    frame.insert(0, 'startTime', start_times_ms(df))
+    return frame.drop_duplicates('startTime', keep='last').sort_values('startTime', ignore_index=True)
+
+
+def _last_row(candles):
+    """Fingerprint of the newest candle's time and OHLCV, so any change to a forming candle is noticed."""
+    return int(pd.util.hash_pandas_object(candles.iloc[-1:], index=False).iloc[0])
+
+
+def rollup(df, level):
+    """
+    Roll sorted candles up to one pyramid level.
+
+    Every bucket keeps its OHLCV bar plus, for each price/volume column, the candle count, mean, sum of
+    squared deviations (``m2``), min and max, so statistics over any run of buckets merge exactly
+    (see ``merge_stats``) without going back to the candles.
+
+    Args:
+    - df (DataFrame): Candles with an epoch-ms ``startTime`` column (see ``_candles``).
+    - level (str): One of ``ROLLUP_LEVELS``.
+
+    Returns:
+    - DataFrame: ``ROLLUP_COLUMNS``, one row per non-empty bucket.
+    """
+    if len(df) == 0:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    step, offset = ROLLUP_LEVELS[level]
+    start_times = df['startTime'].to_numpy(dtype=np.int64)
+    buckets = (start_times - offset) // step
+    first = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    last = np.r_[first[1:], len(buckets)] - 1
+    count = last - first + 1
+
+    columns = {'startTime': buckets[first] * step + offset, 'count': count}
+    values = {column: df[column].to_numpy(dtype=np.float64) for column in STAT_COLUMNS}
+    columns.update({
+        'open': values['open'][first],
+        'high': np.maximum.reduceat(values['high'], first),
+        'low': np.minimum.reduceat(values['low'], first),
+        'close': values['close'][last],
+        'volume': np.add.reduceat(values['volume'], first),
+    })
+    for column in STAT_COLUMNS:
+        mean = np.add.reduceat(values[column], first) / count
+        columns[f"{column}_mean"] = mean
+        columns[f"{column}_m2"] = np.add.reduceat((values[column] - np.repeat(mean, count)) ** 2, first)
+        columns[f"{column}_min"] = np.minimum.reduceat(values[column], first)
+        columns[f"{column}_max"] = np.maximum.reduceat(values[column], first)
+    return pd.DataFrame(columns)
+
+
+def merge_stats(rollups):
+    """
+    Combine per-bucket statistics into ``describe()``-style count/mean/std/min/max per column.
+
+    Uses the pairwise mean/M2 merge, so the result equals the statistics over the underlying
+    candles (sample std, like pandas) without the cancellation of a sum-of-squares formula.
+    """
+    n = rollups['count'].to_numpy(dtype=np.float64)
+    total = n.sum()
+    summary = {}
+    for column in STAT_COLUMNS:
+        means = rollups[f"{column}_mean"].to_numpy()
+        mean = (n * means).sum() / total if total else np.nan
+        m2 = rollups[f"{column}_m2"].sum() + (n * (means - mean) ** 2).sum()
+        std = np.sqrt(m2 / (total - 1)) if total > 1 else np.nan
+        summary[column] = [total, mean, std, rollups[f"{column}_min"].min(), rollups[f"{column}_max"].max()]
+    return pd.DataFrame(summary, index=['count', 'mean', 'std', 'min', 'max'])
+
+
+class RollupPyramid:
+    """
+    Persisted hour/day/week OHLCV rollups of every (pair, interval), maintained incrementally.
+
+    Files live at ``<root>/pair=<pair>/interval=<interval>/<level>.parquet`` with the newest folded
+    candle recorded in the schema metadata. Only levels coarser than the interval are kept. An update
+    re-rolls just the candles since the start of the newest (still open) coarsest bucket and replaces
+    the trailing buckets of each level, so its cost does not grow with the history kept; charts and
+    summary statistics read the small rolled-up frames instead of resampling the candles.
+    """
+
+    def __init__(self, root=ROLLUP_DIR, store=None, levels=tuple(ROLLUP_LEVELS)):
+        """
+        Args:
+        - root (str): Directory holding the rollup files.
+        - store: Candle store (either backend) to read the trailing candles from when an update is
+          given only new candles, or none at all.
+        - levels (tuple of str): Pyramid levels to maintain, finest first.
+        """
+        self.root = root
+        self.store = store
+        self.levels = tuple(levels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def path(self, pair, interval, level):
+        return os.path.join(self.root, f"pair={pair}", f"interval={interval}", f"{level}.parquet")
+
+    def levels_for(self, interval):
+        return [level for level in self.levels if ROLLUP_LEVELS[level][0] > INTERVAL_MS[interval]]
+
+    def _state(self, pair, interval):
+        """In-memory copy of one series' rollups, re-read when another process rewrote the files."""
+        levels = self.levels_for(interval)
+        marker = self.path(pair, interval, levels[-1]) if levels else None
+        mtime = os.path.getmtime(marker) if marker and os.path.exists(marker) else None
+        state = self._series.get((pair, interval))
+        if state is not None and state['mtime'] == mtime:
+            return state
+
+        state = {'mtime': mtime, 'through': None, 'last_row': None, 'levels': {}, 'tail': None, 'summary': None}
+        if mtime is not None:
+            for level in levels:
+                table = pq.read_table(self.path(pair, interval, level))
+                state['levels'][level] = table.to_pandas()
+            metadata = table.schema.metadata or {}
+            if b'through' in metadata:
+                state['through'] = int(metadata[b'through'])
+                # Rollups written before the fingerprint existed are re-rolled once on the next update
+                state['last_row'] = int(metadata[b'last_row']) if b'last_row' in metadata else None
+        self._series[(pair, interval)] = state
+        return state
+
+    def _since(self, state, interval):
+        """Start of the newest bucket of the coarsest level: everything before it is final."""
+        levels = self.levels_for(interval)
+        coarsest = state['levels'].get(levels[-1]) if levels else None
+        if coarsest is None or coarsest.empty:
+            return None
+        return int(coarsest['startTime'].iloc[-1])
+
+    def update(self, pair, interval, df=None):
+        """
+        Fold new candles into the rollups of one series and persist the changed levels.
+
+        Args:
+        - df (DataFrame): Either the whole series (e.g. a catalog frame; only its tail is used) or
+          just the latest candles, which are merged with the trailing candles kept from the last
+          update (or read from ``store``). ``None`` reads the trailing candles from ``store``.
+
+        Returns:
+        - int: Number of candles re-rolled (0 when nothing changed).
+        """
+        levels = self.levels_for(interval)
+        if not levels:
+            return 0
+        with self._lock:
+            state = self._state(pair, interval)
+            since = self._since(state, interval)
+            if df is None:
+                if self.store is None:
+                    return 0
+                df = self.store.read(pair, interval, columns=list(STAT_COLUMNS), start=since)
+            if df is None or len(df) == 0:
+                return 0
+            candles = _candles(df)
+            through, last_row = int(candles['startTime'].iloc[-1]), _last_row(candles)
+            if through == state['through'] and last_row == state['last_row']:
+                return 0
+
+            first = int(candles['startTime'].iloc[0])
+            if since is None or (state['through'] is not None and through < state['through']):
+                # New or rewound series: roll it up from scratch, from the whole stored series if there is one
+                since = None
+                stored = self.store.read(pair, interval, columns=list(STAT_COLUMNS)) if self.store is not None else None
+                if stored is not None and len(stored):
+                    candles = _candles(pd.concat([_candles(stored), candles], ignore_index=True))
+            elif first > since:
+                # Only new candles: complete them with the trailing candles of the open bucket
+                tail = state['tail']
+                if tail is None and self.store is not None:
+                    stored = self.store.read(pair, interval, columns=list(STAT_COLUMNS), start=since)
+                    tail = None if stored is None else _candles(stored)
+                if tail is None:
+                    raise ValueError(f"Rollups of {pair} {interval} need the candles since {since}; "
+                                     "pass the whole series or give the pyramid a store.")
+                candles = _candles(pd.concat([tail, candles], ignore_index=True))
+            if since is not None:
+                candles = candles.iloc[int(np.searchsorted(candles['startTime'].to_numpy(), since)):]
+
+            for level in levels:
+                fresh = rollup(candles, level)
+                existing = state['levels'].get(level)
+                if since is not None and existing is not None and len(fresh):
+                    kept = existing[existing['startTime'].to_numpy() < fresh['startTime'].iloc[0]]
+                    fresh = pd.concat([kept, fresh], ignore_index=True)
+                state['levels'][level] = fresh
+            state['through'], state['last_row'], state['summary'] = through, last_row, None
+            state['tail'] = candles.iloc[int(np.searchsorted(candles['startTime'].to_numpy(),
+                                                             self._since(state, interval))):]
+            self._save(pair, interval, state)
+            return len(candles)
+
+    def _save(self, pair, interval, state):
+        metadata = {b'through': str(state['through']).encode(), b'last_row': str(state['last_row']).encode()}
+        # The coarsest level goes last: its mtime tells readers the whole set was rewritten
+        for level in self.levels_for(interval):
+            path = self.path(pair, interval, level)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(state['levels'][level], preserve_index=False)
+            tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+            pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+            os.replace(tmp_path, path)
+        state['mtime'] = os.path.getmtime(path)
+
+    def rebuild(self, pair, interval, df):
+        """Roll a whole series up from scratch (e.g. after older candles were backfilled or repaired)."""
+        with self._lock:
+            self._series.pop((pair, interval), None)
+            for level in self.levels_for(interval):
+                path = self.path(pair, interval, level)
+                if os.path.exists(path):
+                    os.remove(path)
+        return self.update(pair, interval, df)
+
+    def has(self, pair, interval):
+        levels = self.levels_for(interval)
+        return bool(levels) and bool(self._state(pair, interval)['levels'])
+
+    def bars(self, pair, interval, level):
+        """Rolled-up OHLCV bars of one level, indexed by bucket start; ``None`` if not built."""
+        if level not in self.levels_for(interval):
+            return None
+        frame = self._state(pair, interval)['levels'].get(level)
+        if frame is None:
+            return None
+        return candles_to_frame(frame[['startTime', 'open', 'high', 'low', 'close', 'volume']])
+
+    def summary(self, pair, interval):
+        """``describe()``-style statistics of the whole series, merged from the coarsest level."""
+        levels = self.levels_for(interval)
+        state = self._state(pair, interval)
+        if not levels or levels[-1] not in state['levels']:
+            return None
+        if state['summary'] is None:
+            state['summary'] = merge_stats(state['levels'][levels[-1]])
+        return state['summary']
+
+    def through(self, pair, interval):
+        """``startTime`` (epoch ms) of the newest candle folded into the rollups."""
+        return self._state(pair, interval)['through']
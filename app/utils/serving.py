@@ -0,0 +1,478 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .candle_store import open_store, to_epoch_ms
+from .catalog import DataCatalog
+from .config import INTERVAL_MS, PAIRS, WS_URL
+from .forecasting_models import MODEL_DEFAULTS, TREE_MODELS, WARMUP_BARS
+from .ingestion import Candle
+from .model_registry import ModelRegistry
+from .online import extend_arima
+from .training import split_list
+
+logger = logging.getLogger(__name__)
+
+# Closes kept per series: enough for every lag and LSTM window, and for ARIMA to catch up on start
+HISTORY_BARS = WARMUP_BARS
+
+
+class LatencyStats:
+    """Latencies of the most recent requests and sizes of the most recent batches of a ``PredictionService``."""
+
+    def __init__(self, size=10_000):
+        self.latencies = deque(maxlen=size)  # (monotonic seconds, milliseconds)
+        self.batches = deque(maxlen=size)
+        self.requests = 0
+        self.errors = 0
+
+    def record(self, ms):
+        self.requests += 1
+        self.latencies.append((time.monotonic(), ms))
+
+    def record_batch(self, size):
+        self.batches.append(size)
+
+    def summary(self):
+        """
+        Returns:
+        - dict: ``requests`` and ``errors`` since start; ``p50_ms``, ``p99_ms``, ``max_ms`` and ``rps`` over
+          the window of recent requests; ``batches`` and ``mean_batch`` (requests per computed batch).
+        """
+        summary = {'requests': self.requests, 'errors': self.errors, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0,
+                   'rps': 0.0, 'batches': len(self.batches),
+                   'mean_batch': float(np.mean(self.batches)) if self.batches else 0.0}
+        if self.latencies:
+            times, values = np.asarray(self.latencies).T
+            p50, p99 = np.percentile(values, [50, 99])
+            span = times[-1] - times[0]
+            summary.update(p50_ms=float(p50), p99_ms=float(p99), max_ms=float(values.max()),
+                           rps=float((len(times) - 1) / span) if span > 0 else 0.0)
+        return summary
+
+
+class _Series:
+    """Recent closes of one (pair, interval); replaced as a whole on every new bar, so readers see one snapshot."""
+
+    def __init__(self, closes, last_start, step):
+        self.step = step
+        self.state = (np.asarray(closes, dtype=np.float64)[-HISTORY_BARS:], int(last_start))
+
+    def append(self, start, close):
+        """Add a closed bar; returns whether it was new (repeats and late bars are ignored)."""
+        closes, last_start = self.state
+        if start <= last_start:
+            return False
+        self.state = (np.append(closes[-(HISTORY_BARS - 1):], close), int(start))
+        return True
+
+
+class _Entry:
+    """One loaded registry model and its warm state: the ARIMA filter and the forecast path of the current bar."""
+
+    def __init__(self, model, params, artifact, meta):
+        self.model = model
+        self.params = params
+        self.artifact = artifact
+        self.meta = meta
+        self.state = artifact['model']
+        # A forest's trees are walked directly: ``predict`` on one row spends most of its time dispatching
+        # them through joblib, which is many times the cost of the trees themselves
+        self.trees = [tree.tree_ for tree in self.state.estimators_] if model == 'random_forest' else None
+        # Start time (epoch ms) of the last bar the ARIMA state has seen
+        self.end = to_epoch_ms(meta['data']['end'])
+        self.path = (None, np.empty(0))  # (bar start time, predicted closes)
+
+    def forecast(self, series, horizon):
+        """
+        Predicted closes of the ``horizon`` bars after the last one in ``series``.
+
+        Tree models and the LSTM predict recursively, feeding each prediction back as the next close;
+        ARIMA and Prophet forecast the whole horizon in one call.
+        """
+        closes, last_start = series.state
+        estimator = self.state
+        if self.model in TREE_MODELS:
+            lags = np.asarray(self.meta['features']['lags'] if self.meta.get('features') else self.params['lags'])
+            window = list(closes[-lags.max():])
+            values = []
+            for _ in range(horizon):
+                # Same row as ``FeatureBuilder(lags).latest``: ``lag_k`` is the close ``k - 1`` bars before the last
+                row = np.asarray(window, dtype=np.float64)[-lags].astype(np.float32)[None, :]
+                if self.trees is not None:
+                    values.append(float(np.mean([tree.predict(row)[0, 0] for tree in self.trees])))
+                else:
+                    values.append(float(estimator.predict(row)[0]))
+                window.append(values[-1])
+            return np.asarray(values)
+        if self.model == 'arima':
+            new = (last_start - self.end) // series.step
+            if new > len(closes):
+                raise ValueError(f"{new} bars closed since the ARIMA state's last bar but only {len(closes)} are held; "
+                                 f"update or retrain the model")
+            if new > 0:
+                # Filter the bars that closed since the state was last brought forward, with the fitted params
+                self.state = estimator = extend_arima(estimator, closes[-new:])
+                self.end = last_start
+            return np.asarray(estimator.forecast(steps=horizon), dtype=np.float64)
+        if self.model == 'lstm':
+            scaler, length = self.artifact['scaler'], self.params['window']
+            window = list(scaler.transform(closes[-length:].reshape(-1, 1))[:, 0])
+            for _ in range(horizon):
+                x = np.asarray(window[-length:], dtype=np.float32).reshape(1, length, 1)
+                window.append(float(estimator.predict(x, verbose=0)[0, 0]))
+            return scaler.inverse_transform(np.asarray(window[-horizon:]).reshape(-1, 1))[:, 0]
+        future = pd.to_datetime([last_start + series.step * k for k in range(1, horizon + 1)], unit='ms')
+        return estimator.predict(pd.DataFrame({'ds': future}))['yhat'].to_numpy(dtype=np.float64)
+
+
+class _Request:
+    __slots__ = ('key', 'horizon', 'future')
+
+    def __init__(self, key, horizon, future):
+        self.key = key
+        self.horizon = horizon
+        self.future = future
+
+
+class PredictionService:
+    """
+    Asyncio prediction service over the registered models, fed by the live candle stream.
+
+    Models are loaded once from the registry (the tuned params where a search recorded them) with
+    the recent closes of their series. ``predict`` answers from the forecast path of the current
+    bar when it is already long enough, without leaving the event loop. Other requests are queued,
+    and a batcher drains the queue (up to ``max_batch`` requests, after waiting ``max_wait_ms`` for
+    more to arrive) and computes each (pair, interval, model) in it once, to the longest horizon
+    asked for, on one compute thread; every request of the group is sliced from that path. Requests
+    keep arriving while a batch computes, so the batches grow with the load instead of the queue.
+    Closed candles from a ``StreamIngestor`` listener move the series forward, swap in any newer
+    registered version of its models and re-warm their paths to ``warm_horizon`` bars before the
+    next request asks.
+    """
+
+    def __init__(self, registry=None, store=None, pairs=None, intervals=None, models=None, max_batch=256,
+                 max_wait_ms=1.0, warm_horizon=10, max_horizon=500, cache_paths=True):
+        """
+        Args:
+        - registry (ModelRegistry): Where the fitted models are loaded from.
+        - store: Candle store (either backend) the series are seeded from.
+        - pairs, intervals, models (list of str): Only load these (default: everything in the registry).
+        - max_batch (int): Most requests computed per batch.
+        - max_wait_ms (float): How long the batcher waits for more requests after the first one.
+        - warm_horizon (int): Bars of every model's path computed as soon as a bar closes (0 disables).
+        - max_horizon (int): Longest horizon a request may ask for.
+        - cache_paths (bool): Serve repeated requests of a bar from its computed path; off, every
+          batch recomputes (for measuring the compute path).
+        """
+        self.registry = registry if registry is not None else ModelRegistry()
+        self.store = store
+        self.pairs = pairs
+        self.intervals = intervals
+        self.models = models
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.warm_horizon = warm_horizon
+        self.max_horizon = max_horizon
+        self.cache_paths = cache_paths
+        self.series = {}
+        self.entries = {}
+        self.stats = LatencyStats()
+        self.loop = None
+        self.queue = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self._batcher = None
+
+    def seed(self, pair, interval, df):
+        """Start (or restart) a series from candles indexed by start time."""
+        step = INTERVAL_MS[interval]
+        self.series[(pair, interval)] = _Series(df['close'].to_numpy(dtype=np.float64), to_epoch_ms(df.index[-1]),
+                                                step)
+
+    def add_model(self, pair, interval, model, params=None):
+        """
+        Load the latest version of a registered model; its series must be seeded first.
+
+        Returns:
+        - dict: The model's metadata, or ``None`` if nothing is registered under its params.
+        """
+        params = {**MODEL_DEFAULTS[model], **(self.registry.best_params(pair, interval, model) or {}),
+                  **(params or {})}
+        artifact, meta = self.registry.load(pair, interval, model, params)
+        if artifact is None:
+            return None
+        self.entries[(pair, interval, model)] = _Entry(model, params, artifact, meta)
+        return meta
+
+    def load(self):
+        """
+        Load every registered model that matches the filters, seeding each series from the store.
+
+        Returns:
+        - list of tuple: The ``(pair, interval, model)`` keys that were loaded.
+        """
+        store = self.store if self.store is not None else open_store()
+        catalogs = {}
+        found = {(meta['pair'], meta['interval'], meta['model']) for meta in self.registry.entries()}
+        for pair, interval, model in sorted(found):
+            if (self.pairs and pair not in self.pairs or self.intervals and interval not in self.intervals
+                    or self.models and model not in self.models):
+                continue
+            if (pair, interval) not in self.series:
+                catalog = catalogs.setdefault(pair, DataCatalog(store, pair))
+                if interval not in catalog or not catalog.available(interval):
+                    continue
+                self.seed(pair, interval, catalog[interval].iloc[-HISTORY_BARS:])
+            self.add_model(pair, interval, model)
+        return list(self.entries)
+
+    def default_model(self, pair, interval):
+        """The loaded model of a series with the lowest holdout MAE."""
+        candidates = [(entry.meta.get('metrics', {}).get('mae', np.inf), model)
+                      for (p, i, model), entry in self.entries.items() if (p, i) == (pair, interval)]
+        if not candidates:
+            raise KeyError(f"No model is loaded for {pair} {interval}")
+        return min(candidates)[1]
+
+    async def start(self):
+        """Start the batcher on the running loop; ``load`` first if nothing is loaded yet."""
+        if not self.entries:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.load)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._batcher = self.loop.create_task(self._batch_loop())
+        if self.warm_horizon:
+            await self.loop.run_in_executor(self._executor, self._warm, list(self.entries))
+        return self
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def predict(self, pair, interval, horizon=1, model=None):
+        """
+        Forecast the ``horizon`` bars after the last closed bar of a series.
+
+        Returns:
+        - dict: ``pair``, ``interval``, ``model``, ``version``, ``horizon``, the ``startTime`` (epoch ms)
+          and predicted ``close`` of every forecast bar, and the request's ``latency_ms``.
+        """
+        started = time.perf_counter()
+        try:
+            if not 1 <= horizon <= self.max_horizon:
+                raise ValueError(f"horizon must be between 1 and {self.max_horizon}")
+            model = model or self.default_model(pair, interval)
+            key = (pair, interval, model)
+            entry = self.entries.get(key)
+            if entry is None:
+                raise KeyError(f"No {model} model is loaded for {pair} {interval}")
+            series = self.series[(pair, interval)]
+            last_start = series.state[1]
+            bar, path = entry.path
+            if not (self.cache_paths and bar == last_start and len(path) >= horizon):
+                future = self.loop.create_future()
+                self.queue.put_nowait(_Request(key, horizon, future))
+                last_start, path = await future
+        except Exception:
+            self.stats.errors += 1
+            raise
+        latency = (time.perf_counter() - started) * 1000
+        self.stats.record(latency)
+        step = series.step
+        return {'pair': pair, 'interval': interval, 'model': model, 'version': entry.meta['version'],
+                'horizon': horizon, 'startTime': [last_start + step * k for k in range(1, horizon + 1)],
+                'close': path[:horizon].tolist(), 'latency_ms': latency}
+
+    async def _batch_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.max_wait and self.queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.stats.record_batch(len(batch))
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+            horizons = {key: max(request.horizon for request in requests) for key, requests in groups.items()}
+            results = await self.loop.run_in_executor(self._executor, self._compute, horizons)
+            for key, requests in groups.items():
+                result = results[key]
+                for request in requests:
+                    if request.future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        request.future.set_exception(result)
+                    else:
+                        request.future.set_result(result)
+
+    def _compute(self, horizons):
+        """``{key: (bar start time, path)}`` of every key, or the exception it raised; runs on the compute thread."""
+        results = {}
+        for key, horizon in horizons.items():
+            try:
+                results[key] = self._path(key, horizon)
+            except Exception as error:
+                results[key] = error
+        return results
+
+    def _path(self, key, horizon):
+        entry = self.entries[key]
+        series = self.series[key[:2]]
+        last_start = series.state[1]
+        bar, path = entry.path
+        if not (self.cache_paths and bar == last_start and len(path) >= horizon):
+            path = entry.forecast(series, horizon)
+            entry.path = (last_start, path)
+        return last_start, path
+
+    def refresh(self, key):
+        """Swap in the newest registered version of a loaded model (e.g. after the batch runner retrained it)."""
+        entry = self.entries[key]
+        meta = self.registry.meta(*key, entry.params)
+        if meta is not None and meta['version'] != entry.meta['version']:
+            artifact, meta = self.registry.load(*key, entry.params, meta['version'])
+            self.entries[key] = _Entry(key[2], entry.params, artifact, meta)
+
+    def _warm(self, keys):
+        for key in keys:
+            try:
+                self.refresh(key)
+                if self.warm_horizon:
+                    self._path(key, self.warm_horizon)
+            except Exception:
+                logger.exception("%s: warm-up failed", ' '.join(key))
+
+    def on_record(self, record):
+        """
+        ``StreamIngestor`` listener: move a series forward on every closed candle and re-warm its models.
+
+        Safe to call from the socket thread; the update itself runs on the service's loop.
+        """
+        if isinstance(record, Candle) and record.closed and (record.pair, record.interval) in self.series:
+            self.loop.call_soon_threadsafe(self._on_candle, record)
+
+    def _on_candle(self, candle):
+        if not self.series[(candle.pair, candle.interval)].append(candle.startTime, candle.close):
+            return
+        keys = [key for key in self.entries if key[:2] == (candle.pair, candle.interval)]
+        if keys:
+            self.loop.run_in_executor(self._executor, self._warm, keys)
+
+    async def handle(self, reader, writer):
+        """
+        One client connection of ``serve``: newline-delimited JSON requests, each answered in order with
+        one JSON line. ``{"pair", "interval", "horizon", "model"}`` asks for a forecast (``model`` is
+        optional) and ``{"stats": true}`` for the latency stats; failures answer ``{"error": ...}``.
+        """
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if request.get('stats'):
+                        response = self.stats.summary()
+                    else:
+                        response = await self.predict(request['pair'], request['interval'],
+                                                      int(request.get('horizon', 1)), request.get('model'))
+                except Exception as error:
+                    # Any failure of one request (bad input or a model error) is answered, not fatal to the connection
+                    response = {'error': str(error)}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8043):
+        """Accept clients on a local TCP port until cancelled (one connection per concurrent client)."""
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def bench(service, pair, interval, rate=500, seconds=5.0, horizon=1, model=None):
+    """
+    Send ``rate`` requests per second for ``seconds`` to a started service, without waiting for the
+    answers before sending the next ones.
+
+    Returns:
+    - dict: The service's latency stats over the run (see ``LatencyStats.summary``).
+    """
+    service.stats = LatencyStats()
+    tasks = []
+    started = time.perf_counter()
+    for k in range(int(rate * seconds)):
+        delay = started + k / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(service.predict(pair, interval, horizon, model)))
+    await asyncio.gather(*tasks)
+    return service.stats.summary()
+
+
+async def _run(args):
+    service = PredictionService(pairs=split_list(args.pairs), intervals=split_list(args.intervals) or None,
+                                models=split_list(args.models) or None, max_batch=args.max_batch,
+                                max_wait_ms=args.max_wait_ms, cache_paths=not args.no_cache)
+    async with service:
+        if not service.entries:
+            print("No registered models to serve; train them first (python -m app.utils.training).")
+            return
+        print(f"Loaded {len(service.entries)} models: {', '.join(' '.join(key) for key in service.entries)}")
+        if args.bench:
+            for pair, interval, model in list(service.entries):
+                stats = await bench(service, pair, interval, args.bench, args.seconds, args.horizon, model)
+                print(f"{pair} {interval} {model}: p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms "
+                      f"at {stats['rps']:.0f} req/s, {stats['mean_batch']:.1f} requests per batch")
+            return
+        if args.stream:
+            from .ingestion import StreamIngestor
+            streams = [f"{pair.lower()}@kline_{interval}" for pair, interval in service.series]
+            ingestor = StreamIngestor(WS_URL, lambda batch: None, streams=streams)
+            ingestor.add_listener(service.on_record)
+            ingestor.start()
+        print(f"Serving predictions on {args.host}:{args.port} (Ctrl+C to stop)")
+        await service.serve(args.host, args.port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve forecasts of the registered models over a local socket.")
+    parser.add_argument('--pairs', default=','.join(PAIRS), help="Comma-separated pairs (default: PI42_PAIRS).")
+    parser.add_argument('--intervals', default=None, help="Comma-separated intervals (default: all registered).")
+    parser.add_argument('--models', default=None, help="Comma-separated models (default: all registered).")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8043)
+    parser.add_argument('--stream', action='store_true', help="Follow the live klines of the served series.")
+    parser.add_argument('--max-batch', type=int, default=256, help="Most requests computed per batch.")
+    parser.add_argument('--max-wait-ms', type=float, default=1.0, help="Wait for more requests after the first one.")
+    parser.add_argument('--bench', type=float, default=None, metavar='RATE',
+                        help="Instead of serving, send RATE requests per second to every model and print the latencies.")
+    parser.add_argument('--seconds', type=float, default=5.0, help="Length of each benchmark run.")
+    parser.add_argument('--horizon', type=int, default=1, help="Horizon of the benchmark requests.")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute the path for every batch.")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
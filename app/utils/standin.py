@@ -0,0 +1,368 @@
+import argparse
+import base64
+import hashlib
+import json
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from .aggregator import resample_ohlcv
+from .config import INTERVAL_MS
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def synthetic_klines(start_time, end_time, seed=42, price=5_600_000, base_interval='1m'):
+    """Random-walk base candles over ``[start_time, end_time)``; higher intervals are rolled up from them."""
+    step = INTERVAL_MS[base_interval]
+    start_time = start_time // step * step
+    starts = np.arange(start_time, end_time, step, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    close = np.rint(price * np.exp(np.cumsum(rng.normal(0, 0.0008, len(starts))))).astype(np.int64)
+    open_ = np.r_[price, close[:-1]]
+    spread = np.rint(np.abs(rng.normal(0, 0.0004, len(starts))) * close).astype(np.int64)
+    return pd.DataFrame({
+        'startTime': starts,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'endTime': starts + step - 1,
+        'volume': np.round(rng.gamma(2.0, 1.5, len(starts)), 3),
+    })
+
+
+def _send_frame(conn, payload, opcode=0x1):
+    data = payload.encode() if isinstance(payload, str) else payload
+    header = bytes([0x80 | opcode])
+    if len(data) < 126:
+        header += bytes([len(data)])
+    elif len(data) < 1 << 16:
+        header += bytes([126]) + struct.pack('>H', len(data))
+    else:
+        header += bytes([127]) + struct.pack('>Q', len(data))
+    conn.sendall(header + data)
+
+
+def _read_exact(conn, n):
+    data = b''
+    while len(data) < n:
+        chunk = conn.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError('client closed the connection')
+        data += chunk
+    return data
+
+
+def _read_frame(conn):
+    first, second = _read_exact(conn, 2)
+    opcode, length = first & 0x0F, second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', _read_exact(conn, 2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', _read_exact(conn, 8))[0]
+    mask = _read_exact(conn, 4) if second & 0x80 else None
+    data = _read_exact(conn, length)
+    if mask:
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return opcode, data
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _klines(self, params):
+        standin = self.server.standin
+        allowed, retry_after = standin.admit()
+        if not allowed:
+            standin.count('rate_limited')
+            return self._send_json(429, {'message': 'Too many requests'}, {'Retry-After': f"{retry_after:.3f}"})
+        if standin.latency:
+            time.sleep(standin.latency * (0.5 + random.random()))
+        if standin.error_rate and random.random() < standin.error_rate:
+            standin.count('errors')
+            return self._send_json(500, {'message': 'Injected failure'})
+        try:
+            candles = standin.klines(params['pair'], params['interval'], params.get('startTime'),
+                                     params.get('endTime'), params.get('limit'))
+        except KeyError as err:
+            return self._send_json(400, {'message': f"Unknown or missing parameter: {err}"})
+        standin.count('candles_served', len(candles))
+        self._send_json(200, candles)
+
+    def do_POST(self):
+        self.server.standin.count('requests')
+        if urlparse(self.path).path != '/v1/market/klines':
+            return self._send_json(404, {'message': 'Not found'})
+        length = int(self.headers.get('Content-Length', 0))
+        self._klines(json.loads(self.rfile.read(length) or b'{}'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/v1/market/ws' and self.headers.get('Upgrade', '').lower() == 'websocket':
+            return self._websocket()
+        self.server.standin.count('requests')
+        if url.path != '/v1/market/klines':
+            return self._send_json(404, {'message': 'Not found'})
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        for key in ['startTime', 'endTime', 'limit']:
+            if key in params:
+                params[key] = int(params[key])
+        self._klines(params)
+
+    def _websocket(self):
+        accept = base64.b64encode(hashlib.sha1((self.headers['Sec-WebSocket-Key'] + WS_GUID).encode()).digest())
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept.decode())
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        self.server.standin.stream(self.connection)
+
+
+class StandInServer:
+    """
+    Local stand-in for the Pi42 REST and WebSocket market-data endpoints.
+
+    Serves ``/v1/market/klines`` (POST JSON body or GET query) from synthetic or loaded candles with
+    ``startTime``/``endTime``/``limit`` pagination, optional latency, injected 5xx errors and a token-bucket
+    rate limit answering 429 with ``Retry-After``. ``/v1/market/ws`` upgrades to a WebSocket that accepts
+    ``SUBSCRIBE`` messages and pushes trade and kline updates at ``tick_rate`` messages per second.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, pair='BTCINR', history_days=30, latency=0.0, error_rate=0.0,
+                 rate_limit=None, max_limit=1000, tick_rate=10.0, seed=42):
+        """
+        Args:
+        - host, port (str, int): Bind address; port 0 picks a free port.
+        - pair (str): Pair served by the synthetic history.
+        - history_days (int): Length of the synthetic history ending now.
+        - latency (float): Mean added response latency, in seconds.
+        - error_rate (float): Probability of answering a kline request with HTTP 500.
+        - rate_limit (float): Requests per second before 429s are returned; ``None`` for unlimited.
+        - max_limit (int): Largest page the server returns, whatever ``limit`` asks for.
+        - tick_rate (float): WebSocket trade updates pushed per second per connection.
+        - seed (int): Seed of the synthetic price path.
+        """
+        self.pair = pair
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.max_limit = max_limit
+        self.tick_rate = tick_rate
+        self.seed = seed
+        now = int(time.time() * 1000)
+        self.series = {'1m': synthetic_klines(now - history_days * 86_400_000, now, seed)}
+        self.stats = {'requests': 0, 'rate_limited': 0, 'errors': 0, 'candles_served': 0, 'ws_messages': 0}
+        self._lock = threading.Lock()
+        # Burst capacity of the token bucket: at least one request, or a limit below 1/s would admit nothing
+        self._capacity = max(1.0, float(rate_limit or 0))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._stop = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), _StandInHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread = None
+
+    @property
+    def rest_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def kline_url(self):
+        return f"{self.rest_url}/v1/market/klines"
+
+    @property
+    def ws_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"ws://{host}:{port}/v1/market/ws"
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def load(self, interval, df):
+        """Serve recorded candles (raw kline columns) for ``interval`` instead of synthetic ones."""
+        self.series[interval] = df.sort_values('startTime').reset_index(drop=True)
+
+    def admit(self):
+        if self.rate_limit is None:
+            return True, 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self.rate_limit)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True, 0.0
+            return False, (1 - self._tokens) / self.rate_limit
+
+    def klines(self, pair, interval, start_time=None, end_time=None, limit=None):
+        if pair != self.pair:
+            raise KeyError('pair')
+        df = self.series.get(interval)
+        if df is None:
+            INTERVAL_MS[interval]  # Raises KeyError for intervals the exchange does not serve
+            df = self.series[interval] = resample_ohlcv(self.series['1m'], interval)
+        starts = df['startTime'].to_numpy()
+        lo = 0 if start_time is None else int(np.searchsorted(starts, int(start_time), side='left'))
+        hi = len(starts) if end_time is None else int(np.searchsorted(starts, int(end_time), side='right'))
+        hi = min(hi, lo + min(int(limit or self.max_limit), self.max_limit))
+        page = df.iloc[lo:hi]
+        return [{key: (value.item() if hasattr(value, 'item') else value) for key, value in row.items()}
+                for row in page.to_dict('records')]
+
+    def stream(self, conn):
+        """Push trades and kline updates to one WebSocket client until it disconnects or the server stops."""
+        rng = random.Random(self.seed)
+        price = float(self.series['1m']['close'].iloc[-1])
+        streams = set()
+        candles = {}
+        interval_s = 1.0 / self.tick_rate if self.tick_rate else 1.0
+        next_tick = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                timeout = max(0.0, next_tick - time.monotonic())
+                readable, _, _ = select.select([conn], [], [], timeout)
+                if readable:
+                    opcode, data = _read_frame(conn)
+                    if opcode == 0x8:
+                        _send_frame(conn, data[:2], opcode=0x8)
+                        return
+                    if opcode == 0x9:
+                        _send_frame(conn, data, opcode=0xA)
+                    elif opcode == 0x1:
+                        message = json.loads(data)
+                        if message.get('method') == 'SUBSCRIBE':
+                            streams.update(message.get('params', []))
+                            _send_frame(conn, json.dumps({'result': None, 'id': message.get('id')}))
+                    continue
+                next_tick += interval_s
+                if not self.tick_rate:
+                    continue
+                now = int(time.time() * 1000)
+                price = max(1.0, price * (1 + rng.gauss(0, 0.0002)))
+                quantity = round(rng.expovariate(20), 4)
+                messages = [{'e': 'aggTrade', 'E': now, 's': self.pair, 'p': f"{price:.0f}",
+                             'q': f"{quantity}", 'T': now}]
+                for name in streams or {f"{self.pair.lower()}@kline_5m"}:
+                    if '@kline_' not in name:
+                        continue
+                    interval = name.split('@kline_', 1)[1]
+                    step = INTERVAL_MS[interval]
+                    start = now // step * step
+                    candle = candles.get(interval)
+                    if candle is not None and candle['t'] != start:
+                        messages.append({'e': 'kline', 'E': now, 's': self.pair, 'k': dict(candle, x=True)})
+                        candle = None
+                    if candle is None:
+                        candle = {'t': start, 'T': start + step - 1, 's': self.pair, 'i': interval,
+                                  'o': f"{price:.0f}", 'h': f"{price:.0f}", 'l': f"{price:.0f}", 'v': '0'}
+                    candle.update(h=f"{max(float(candle['h']), price):.0f}", l=f"{min(float(candle['l']), price):.0f}",
+                                  c=f"{price:.0f}", v=f"{float(candle['v']) + quantity:.4f}", x=False)
+                    candles[interval] = candle
+                    messages.append({'e': 'kline', 'E': now, 's': self.pair, 'k': dict(candle)})
+                for message in messages:
+                    _send_frame(conn, json.dumps(message))
+                self.count('ws_messages', len(messages))
+        except (ConnectionError, OSError, ValueError):
+            return
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def benchmark(days=30, intervals=('5m', '15m', '30m', '1h', '6h', '12h'), stream_seconds=5.0, **server_options):
+    """Measure backfill and streaming throughput against a local stand-in; no network needed."""
+    from .data_retrieval import KlineBackfiller
+    from .ingestion import StreamIngestor
+
+    results = {}
+    with StandInServer(history_days=days, **server_options) as server:
+        backfiller = KlineBackfiller(url=server.kline_url, backoff=0.05)
+        started = time.perf_counter()
+        frames = backfiller.backfill_many([server.pair], intervals, int(time.time() * 1000) - days * 86_400_000)
+        seconds = time.perf_counter() - started
+        candles = sum(len(df) for df in frames.values())
+        results['backfill'] = {'candles': candles, 'seconds': seconds, 'candles_per_second': candles / seconds,
+                               **backfiller.stats}
+
+        if stream_seconds:
+            ingestor = StreamIngestor(server.ws_url, lambda batch: None,
+                                      streams=[f"{server.pair.lower()}@kline_{i}" for i in intervals])
+            ingestor.start()
+            time.sleep(stream_seconds)
+            ingestor.stop()
+            metrics = ingestor.metrics
+            results['stream'] = {'messages': metrics['received'], 'messages_per_second': metrics['received'] / stream_seconds,
+                                 'max_lag_ms': metrics['max_lag_ms'], 'dropped': metrics['dropped']}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Pi42 market-data stand-in server.")
+    parser.add_argument('--port', type=int, default=8042)
+    parser.add_argument('--days', type=int, default=30, help="Days of synthetic history.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean response latency in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of kline requests failing with 500.")
+    parser.add_argument('--rate-limit', type=float, default=None, help="Requests per second before 429s.")
+    parser.add_argument('--tick-rate', type=float, default=10.0, help="WebSocket trades per second.")
+    parser.add_argument('--bench', action='store_true', help="Run the throughput benchmark and exit.")
+    args = parser.parse_args(argv)
+
+    options = dict(latency=args.latency, error_rate=args.error_rate, rate_limit=args.rate_limit, tick_rate=args.tick_rate)
+    if args.bench:
+        for stage, stats in benchmark(days=args.days, **options).items():
+            print(f"{stage}: {stats}")
+        return
+
+    server = StandInServer(port=args.port, history_days=args.days, **options).start()
+    print(f"Serving klines on {server.kline_url} and the stream on {server.ws_url} (Ctrl+C to stop)")
+    print(f"export PI42_REST_URL={server.rest_url} PI42_WS_URL={server.ws_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class _Smoother:
+    """``y = alpha * x + (1 - alpha) * y_prev`` seeded with the mean of the first ``n`` inputs."""
+
+    __slots__ = ('n', 'alpha', 'count', 'total', 'value')
+
+    def __init__(self, n, alpha):
+        self.n = n
+        self.alpha = alpha
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def peek(self, x):
+        if self.count >= self.n:
+            return self.alpha * x + (1.0 - self.alpha) * self.value
+        if self.count + 1 == self.n:
+            return (self.total + x) / self.n
+        return NAN
+
+    def commit(self, x):
+        self.value = self.peek(x)
+        if self.count < self.n:
+            self.total += x
+        self.count += 1
+        return self.value
+
+    def state(self):
+        return (self.count, self.total, self.value)
+
+    def load(self, state):
+        self.count, self.total, self.value = state
+
+
+class _Window:
+    """Last ``n`` inputs with running sums (taken about a shift, to avoid cancellation on large prices)."""
+
+    __slots__ = ('n', 'values', 'shift', 'total', 'total_sq', 'updates')
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque(maxlen=n)
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def _recompute(self):
+        self.total = sum(v - self.shift for v in self.values)
+        self.total_sq = sum((v - self.shift) ** 2 for v in self.values)
+
+    def _with(self, x):
+        d = x - self.shift
+        total, total_sq, count = self.total + d, self.total_sq + d * d, len(self.values) + 1
+        if count > self.n:
+            old = self.values[0] - self.shift
+            total, total_sq, count = total - old, total_sq - old * old, self.n
+        return total, total_sq, count
+
+    def commit(self, x):
+        if self.shift is None:
+            self.shift = x
+        self.total, self.total_sq, _ = self._with(x)
+        self.values.append(x)
+        self.updates += 1
+        if self.updates % self.n == 0:
+            self._recompute()  # Bound the drift of the running sums; amortised O(1)
+
+    def stats(self, x=None, ddof=0):
+        """``(mean, std)`` of the window, or of the window with ``x`` appended if given."""
+        if x is None:
+            total, total_sq, count = self.total, self.total_sq, len(self.values)
+        else:
+            if self.shift is None:
+                return (NAN, NAN) if self.n > 1 else (x, 0.0)
+            total, total_sq, count = self._with(x)
+        if count < self.n:
+            return NAN, NAN
+        mean = total / count
+        variance = max(0.0, (total_sq - count * mean * mean) / (count - ddof))
+        return mean + self.shift, math.sqrt(variance)
+
+    def state(self):
+        return (tuple(self.values), self.shift, self.total, self.total_sq, self.updates)
+
+    def load(self, state):
+        values, self.shift, self.total, self.total_sq, self.updates = state
+        self.values = deque(values, maxlen=self.n)
+
+
+class StreamingIndicator:
+    """
+    Base of the incremental indicators.
+
+    ``update(..., closed=True)`` folds a finished bar into the state; ``closed=False`` returns the
+    value the indicator would have if the forming bar closed now, without changing the state, so a
+    bar can be re-evaluated on every tick. Values match ``IndicatorEngine`` to rounding.
+
+    ``_parts()`` lists the state in order: helpers with ``state``/``load`` and plain values, whose
+    attribute names ``_scalars`` gives by position.
+    """
+
+    _scalars = {}
+
+    def snapshot(self):
+        return tuple(part.state() if hasattr(part, 'state') else part for part in self._parts())
+
+    def restore(self, state):
+        parts = self._parts()
+        for i, (part, saved) in enumerate(zip(parts, state)):
+            if hasattr(part, 'load'):
+                part.load(saved)
+            else:
+                self._set_scalar(i, saved)
+
+    def _set_scalar(self, i, value):
+        setattr(self, self._scalars[i], value)
+
+
+class StreamingSMA(StreamingIndicator):
+    _scalars = {1: 'value'}
+
+    def __init__(self, n):
+        self.window = _Window(n)
+        self.value = NAN
+
+    def _parts(self):
+        return (self.window, self.value)
+
+    def update(self, close, closed=True):
+        if not closed:
+            return self.window.stats(close)[0]
+        self.window.commit(close)
+        self.value = self.window.stats()[0]
+        return self.value
+
+
+class StreamingEMA(StreamingIndicator):
+    def __init__(self, n, alpha=None):
+        self.smoother = _Smoother(n, 2.0 / (n + 1) if alpha is None else alpha)
+
+    def _parts(self):
+        return (self.smoother,)
+
+    @property
+    def value(self):
+        return self.smoother.value
+
+    def update(self, close, closed=True):
+        return self.smoother.commit(close) if closed else self.smoother.peek(close)
+
+
+class StreamingRSI(StreamingIndicator):
+    """Wilder's RSI, matching ``indicators.rsi``."""
+
+    _scalars = {2: 'prev_close', 3: 'value'}
+
+    def __init__(self, n=14):
+        self.gain = _Smoother(n, 1.0 / n)
+        self.loss = _Smoother(n, 1.0 / n)
+        self.prev_close = None
+        self.value = NAN
+
+    def _parts(self):
+        return (self.gain, self.loss, self.prev_close, self.value)
+
+    @staticmethod
+    def _rsi(gain, loss):
+        if math.isnan(gain) or math.isnan(loss):
+            return NAN
+        if loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+    def update(self, close, closed=True):
+        if self.prev_close is None:
+            if closed:
+                self.prev_close = close
+            return NAN
+        delta = close - self.prev_close
+        up, down = (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+        if not closed:
+            return self._rsi(self.gain.peek(up), self.loss.peek(down))
+        self.prev_close = close
+        self.value = self._rsi(self.gain.commit(up), self.loss.commit(down))
+        return self.value
+
+
+class StreamingMACD(StreamingIndicator):
+    """MACD line, signal and histogram; ``update`` returns ``(line, signal, hist)``."""
+
+    _scalars = {3: 'value'}
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def _parts(self):
+        return (self.fast.smoother, self.slow.smoother, self.signal.smoother, self.value)
+
+    def update(self, close, closed=True):
+        line = self.fast.update(close, closed) - self.slow.update(close, closed)
+        if math.isnan(line):
+            return (NAN, NAN, NAN)
+        signal = self.signal.update(line, closed)
+        value = (line, signal, line - signal)
+        if closed:
+            self.value = value
+        return value
+
+
+class StreamingATR(StreamingIndicator):
+    _scalars = {1: 'prev_close'}
+
+    def __init__(self, n=14):
+        self.smoother = _Smoother(n, 1.0 / n)
+        self.prev_close = None
+
+    def _parts(self):
+        return (self.smoother, self.prev_close)
+
+    @property
+    def value(self):
+        return self.smoother.value
+
+    def update(self, high, low, close, closed=True):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        if not closed:
+            return self.smoother.peek(tr)
+        self.prev_close = close
+        return self.smoother.commit(tr)
+
+
+class StreamingBollinger(StreamingIndicator):
+    """Bollinger Bands over a population std; ``update`` returns ``(lower, middle, upper)``."""
+
+    _scalars = {1: 'value'}
+
+    def __init__(self, n=20, k=2):
+        self.window = _Window(n)
+        self.k = k
+        self.value = (NAN, NAN, NAN)
+
+    def _parts(self):
+        return (self.window, self.value)
+
+    def update(self, close, closed=True):
+        if closed:
+            self.window.commit(close)
+            mean, std = self.window.stats()
+        else:
+            mean, std = self.window.stats(close)
+        value = (mean - self.k * std, mean, mean + self.k * std)
+        if closed:
+            self.value = value
+        return value
+
+
+class StreamingVolatility(StreamingIndicator):
+    """Rolling sample std of log returns, matching the engine's ``vol_<n>``."""
+
+    _scalars = {1: 'prev_close', 2: 'value'}
+
+    def __init__(self, n=30):
+        self.window = _Window(n)
+        self.prev_close = None
+        self.value = NAN
+
+    def _parts(self):
+        return (self.window, self.prev_close, self.value)
+
+    def update(self, close, closed=True):
+        if self.prev_close is None:
+            if closed:
+                self.prev_close = close
+            return NAN
+        ret = math.log(close) - math.log(self.prev_close)
+        if not closed:
+            return self.window.stats(ret, ddof=1)[1]
+        self.prev_close = close
+        self.window.commit(ret)
+        self.value = self.window.stats(ddof=1)[1]
+        return self.value
+
+
+class IndicatorSet:
+    """
+    Named streaming indicators fed from candles, using the ``IndicatorEngine`` naming
+    (``sma_7``, ``ema_20``, ``rsi_14``, ``macd_12_26_9``, ``bb_20_2``, ``atr_14``, ``vol_30``).
+
+    ``update_candle`` accepts forming and closed ``Candle`` records: a forming candle is evaluated
+    without changing state, and a forming candle that never got its closing message is committed
+    when the next candle starts. Candles at or before the last committed one (a repeated closing
+    message, a late update) are ignored, so no bar is fed twice.
+    """
+
+    def __init__(self, names):
+        self.indicators = {}
+        for name in names:
+            kind, *params = name.split('_')
+            params = [float(p) if '.' in p else int(p) for p in params]
+            factory = {'sma': StreamingSMA, 'ema': StreamingEMA, 'rsi': StreamingRSI, 'macd': StreamingMACD,
+                       'bb': StreamingBollinger, 'atr': StreamingATR, 'vol': StreamingVolatility}.get(kind)
+            if factory is None:
+                raise ValueError(f"No streaming version of indicator: {name}")
+            self.indicators[name] = factory(*params)
+        self.forming = None
+        self.last = -1  # startTime of the last committed candle
+        self.values = {}
+
+    def _feed(self, candle, closed):
+        values = {}
+        for name, indicator in self.indicators.items():
+            if isinstance(indicator, StreamingATR):
+                values[name] = indicator.update(candle.high, candle.low, candle.close, closed)
+            else:
+                values[name] = indicator.update(candle.close, closed)
+        return values
+
+    def update_candle(self, candle):
+        if candle.startTime <= self.last:
+            return self.values
+        if self.forming is not None and self.forming.startTime < candle.startTime:
+            self._feed(self.forming, closed=True)
+            self.last = self.forming.startTime
+        if candle.closed:
+            self.forming = None
+            self.last = candle.startTime
+            self.values = self._feed(candle, closed=True)
+        else:
+            self.forming = candle
+            self.values = self._feed(candle, closed=False)
+        return self.values
+
+    def warm_up(self, df):
+        """Feed a history of closed bars (a candle frame) to bring the state up to date."""
+        highs, lows, closes = df['high'].to_numpy(float), df['low'].to_numpy(float), df['close'].to_numpy(float)
+        for high, low, close in zip(highs, lows, closes):
+            for name, indicator in self.indicators.items():
+                if isinstance(indicator, StreamingATR):
+                    self.values[name] = indicator.update(high, low, close)
+                else:
+                    self.values[name] = indicator.update(close)
+        return self.values
+
+    def snapshot(self):
+        return {name: indicator.snapshot() for name, indicator in self.indicators.items()}, self.forming, self.last
+
+    def restore(self, state):
+        states, self.forming, self.last = state
+        for name, saved in states.items():
+            self.indicators[name].restore(saved)
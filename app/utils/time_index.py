@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from .aggregator import resample_ohlcv, start_times_ms
+from .candle_store import to_epoch_ms
+from .config import INTERVAL_MS
+
+
+class TimeIndex:
+    """
+    Sorted ``startTime`` index of one (pair, interval) series with precomputed data-quality facts.
+
+    Range lookups are two binary searches. Gaps (runs of missing candles) and duplicates are found
+    once with a vectorized pass over the diffs and kept, so quality checks never rescan the series.
+    """
+
+    def __init__(self, start_times, interval):
+        """
+        Args:
+        - start_times (array-like): Epoch-ms ``startTime`` values, in storage order.
+        - interval (str): Interval of the series, e.g. ``'5m'``.
+        """
+        self.interval = interval
+        self.step = INTERVAL_MS[interval]
+        start_times = np.asarray(start_times, dtype=np.int64)
+        self.order = None
+        if len(start_times) > 1 and (np.diff(start_times) < 0).any():
+            self.order = np.argsort(start_times, kind='stable')
+            start_times = start_times[self.order]
+        self.times = start_times
+        self._analyse()
+
+    @classmethod
+    def from_frame(cls, df, interval):
+        return cls(start_times_ms(df), interval)
+
+    def _analyse(self):
+        diffs = np.diff(self.times)
+        self.duplicates = np.flatnonzero(diffs == 0) + 1  # Positions (sorted order) repeating their predecessor
+        gap_at = np.flatnonzero(diffs > self.step)
+        self.gaps = np.column_stack([
+            self.times[gap_at] + self.step,                     # First missing startTime
+            self.times[gap_at + 1],                             # Next present startTime (exclusive end)
+            diffs[gap_at] // self.step - 1,                     # Missing candles
+        ]) if len(gap_at) else np.empty((0, 3), dtype=np.int64)
+        self.misaligned = np.flatnonzero(self.times % self.step != 0)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, start_times):
+        """Extend the index with candles appended to the series, analysing only the new values."""
+        new = np.sort(np.asarray(start_times, dtype=np.int64))
+        if len(new) == 0:
+            return
+        if not len(self.times) or new[0] < self.times[-1]:
+            # Nothing to extend, or out-of-order data: rebuild
+            self.__init__(np.concatenate([self.times, new]), self.interval)
+            return
+        # Analyse the new values together with the current last candle, then shift into place
+        tail = TimeIndex(np.concatenate([self.times[-1:], new]), self.interval)
+        shift = len(self.times) - 1
+        if self.order is not None:
+            self.order = np.concatenate([self.order, np.arange(len(self.times), len(self.times) + len(new))])
+        self.times = np.concatenate([self.times, new])
+        self.duplicates = np.concatenate([self.duplicates, tail.duplicates + shift])
+        self.gaps = np.concatenate([self.gaps, tail.gaps])
+        self.misaligned = np.concatenate([self.misaligned, tail.misaligned[tail.misaligned > 0] + shift])
+
+    def slice(self, start=None, end=None):
+        """Positions ``(lo, hi)`` of the candles with ``start <= startTime <= end``; ``None`` is open."""
+        start, end = to_epoch_ms(start), to_epoch_ms(end)
+        lo = 0 if start is None else int(np.searchsorted(self.times, start, side='left'))
+        hi = len(self.times) if end is None else int(np.searchsorted(self.times, end, side='right'))
+        return lo, max(lo, hi)
+
+    def window(self, df, start=None, end=None):
+        """Rows of ``df`` (the frame this index was built from) inside the time range."""
+        lo, hi = self.slice(start, end)
+        if self.order is not None:
+            return df.iloc[self.order[lo:hi]]
+        return df.iloc[lo:hi]
+
+    def missing_times(self):
+        """Every expected-but-absent ``startTime``."""
+        if not len(self.gaps):
+            return np.empty(0, dtype=np.int64)
+        counts = self.gaps[:, 2]
+        firsts = np.repeat(self.gaps[:, 0], counts)
+        ranks = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return firsts + ranks * self.step
+
+    def report(self):
+        expected = int((self.times[-1] - self.times[0]) // self.step + 1) if len(self.times) else 0
+        unique = len(self.times) - len(self.duplicates)
+        return {
+            'candles': len(self.times),
+            'expected': expected,
+            'missing': int(self.gaps[:, 2].sum()) if len(self.gaps) else 0,
+            'gaps': len(self.gaps),
+            'largest_gap': int(self.gaps[:, 2].max()) if len(self.gaps) else 0,
+            'duplicates': len(self.duplicates),
+            'misaligned': len(self.misaligned),
+            'coverage': unique / expected if expected else 1.0,
+        }
+
+
+def repair(df, interval, higher_res=None, method='mark'):
+    """
+    Return a copy of a candle series on a complete, duplicate-free ``startTime`` grid.
+
+    Duplicates keep their last copy. Missing candles are rebuilt from ``higher_res`` (a finer interval
+    of the same pair) where it covers them; the rest are flagged in an ``is_gap`` column and either
+    left empty (``method='mark'``) or filled as flat candles at the previous close with zero volume
+    (``method='ffill'``).
+
+    Args:
+    - df (DataFrame): Series indexed by ``startTime`` datetimes, as read from the store or catalog.
+    - interval (str): Interval of ``df``.
+    - higher_res (DataFrame): Finer-interval candles used to fill gaps, in the same shape.
+    - method (str): ``'mark'`` or ``'ffill'``.
+    """
+    index = TimeIndex.from_frame(df, interval)
+    data = df.iloc[index.order] if index.order is not None else df
+    if len(index.duplicates):
+        keep = np.ones(len(data), dtype=bool)
+        keep[index.duplicates - 1] = False
+        data = data[keep]
+    missing = index.missing_times()
+    if not len(missing) and not len(index.duplicates):
+        return data.assign(is_gap=False)
+
+    grid = pd.DatetimeIndex(np.concatenate([start_times_ms(data), missing]).astype('datetime64[ms]'),
+                            name=data.index.name).sort_values()
+    repaired = data.reindex(grid)
+    repaired['is_gap'] = repaired.index.isin(pd.DatetimeIndex(missing.astype('datetime64[ms]')))
+
+    if higher_res is not None and len(missing):
+        rolled = resample_ohlcv(higher_res, interval)
+        rolled = rolled[np.isin(rolled['startTime'].to_numpy(), missing)]
+        rolled.index = pd.DatetimeIndex(rolled['startTime'].to_numpy().astype('datetime64[ms]'))
+        columns = [column for column in ['open', 'high', 'low', 'close', 'volume'] if column in repaired]
+        repaired.loc[rolled.index, columns] = rolled[columns].to_numpy()
+        repaired.loc[rolled.index, 'is_gap'] = False
+
+    if method == 'ffill':
+        gap = repaired['is_gap'].to_numpy()
+        previous_close = repaired['close'].ffill()
+        for column in ['open', 'high', 'low', 'close']:
+            if column in repaired:
+                repaired.loc[gap, column] = previous_close[gap]
+        if 'volume' in repaired:
+            repaired.loc[gap, 'volume'] = 0
+    return repaired
@@ -0,0 +1,109 @@
+import argparse
+
+from .candle_store import open_store
+from .catalog import DataCatalog
+from .config import PAIRS
+from .model_registry import ModelRegistry
+
+# Model -> interval it forecasts, as offered on the Forecasting page
+DEFAULT_JOBS = {
+    'arima': '5m',
+    'random_forest': '15m',
+    'gradient_boosting': '30m',
+    'lstm': '1h',
+    'prophet': '6h',
+    'xgboost': '12h',
+}
+
+
+def plan_jobs(pairs, models, intervals=None):
+    """
+    ``(pair, interval, model)`` combinations to train: each model on its ``DEFAULT_JOBS`` interval,
+    or on every one of ``intervals`` when given.
+    """
+    if intervals:
+        per_pair = [(interval, model) for model in models for interval in intervals]
+    else:
+        per_pair = [(DEFAULT_JOBS[model], model) for model in models]
+    return [(pair, interval, model) for pair in pairs for interval, model in per_pair]
+
+
+def split_list(text):
+    return [item.strip() for item in (text or '').split(',') if item.strip()]
+
+
+def train(registry, df, pair, interval, model, params=None, force=False, min_new_bars=1, cache=None, mode='auto',
+          max_updates=24, options=None, n_jobs=None):
+    """
+    Bring one registered model up to date with ``df``, unless its latest version already covers the data.
+
+    Args:
+    - df (DataFrame): Candles of ``interval``, indexed by start time.
+    - params (dict): Overrides of ``MODEL_DEFAULTS[model]`` and of the tuned params recorded in the
+      registry (``ModelRegistry.best_params``); the merged dict is the registry key.
+    - force (bool): Retrain even when the latest version is current.
+    - min_new_bars (int): New candles since the last fit that make a model stale.
+    - mode (str): ``'refit'`` trains from scratch; ``'update'`` carries the latest version forward over
+      the new candles (``ForecastingModels.update``); ``'auto'`` updates while the model has fewer than
+      ``max_updates`` updates since its last full fit and supports them, and refits otherwise.
+    - options (dict): Overrides of ``UPDATE_DEFAULTS`` for updates.
+    - n_jobs (int): Threads of the parallel tree models (see ``ForecastingModels``).
+
+    Returns:
+    - tuple: ``(meta, trained)`` - metadata of the latest version and whether this call produced it.
+    """
+    from .forecasting_models import MODEL_DEFAULTS, ONLINE_MODELS, ForecastingModels
+
+    params = {**MODEL_DEFAULTS[model], **(registry.best_params(pair, interval, model) or {}), **(params or {})}
+    current = registry.meta(pair, interval, model, params)
+    if not force and not registry.is_stale(current, df, min_new_bars):
+        return current, False
+    forecaster = ForecastingModels(df, interval, pair, cache, n_jobs)
+    if mode == 'update' and (current is None or model not in ONLINE_MODELS):
+        raise ValueError(f"{pair} {interval} {model}: nothing to update, refit it first")
+    incremental = mode == 'update' or (mode == 'auto' and not force and current is not None
+                                       and model in ONLINE_MODELS and current.get('updates', 0) < max_updates)
+    if incremental:
+        artifact, _ = registry.load(pair, interval, model, params)
+        updated = forecaster.update(model, artifact, current, params, options)
+        if updated is None:
+            return current, False
+        artifact, meta = updated
+    else:
+        artifact, meta = forecaster.fit(model, params)
+    return registry.save(pair, interval, model, params, artifact, meta), True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train stale forecasting models into the model registry.")
+    parser.add_argument('--pairs', default=','.join(PAIRS), help="Comma-separated pairs (default: PI42_PAIRS).")
+    parser.add_argument('--models', default=','.join(DEFAULT_JOBS), help="Comma-separated models to train.")
+    parser.add_argument('--intervals', default=None,
+                        help="Train every model on these intervals instead of each model's default one.")
+    parser.add_argument('--force', action='store_true', help="Retrain even if the latest version is current.")
+    parser.add_argument('--min-new-bars', type=int, default=1, help="New candles that make a model stale.")
+    parser.add_argument('--mode', choices=('auto', 'refit', 'update'), default='auto',
+                        help="Refit from scratch, update from the new candles, or update until --max-updates.")
+    parser.add_argument('--max-updates', type=int, default=24, help="Updates in a row before a full refit.")
+    parser.add_argument('--keep', type=int, default=3, help="Versions kept per model and params.")
+    args = parser.parse_args(argv)
+
+    jobs = plan_jobs(split_list(args.pairs), split_list(args.models), split_list(args.intervals))
+    store = open_store()
+    registry = ModelRegistry()
+    catalogs = {}
+    for pair, interval, model in jobs:
+        catalog = catalogs.setdefault(pair, DataCatalog(store, pair))
+        if interval not in catalog:
+            print(f"{pair} {interval}: no data, skipping {model}.")
+            continue
+        meta, trained = train(registry, catalog[interval], pair, interval, model, force=args.force,
+                              min_new_bars=args.min_new_bars, mode=args.mode, max_updates=args.max_updates)
+        status = ("updated" if meta.get('parent') else "trained") if trained else "up to date"
+        print(f"{pair} {interval} {model}: {status} ({meta['version']}, data to {meta['data']['end']}, "
+              f"metrics {meta['metrics']})")
+        registry.prune(pair, interval, model, meta['params'], keep=args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+
+import pandas as pd
+
+from .backtesting import _run_fold, prepare_inputs, walk_forward_folds
+from .candle_store import open_store
+from .catalog import DataCatalog
+from .config import PAIR, PAIRS
+from .model_registry import ModelRegistry
+from .result_cache import ResultCache, data_version
+from .training import plan_jobs, split_list, train
+
+# Candidate values of each model's params; a search samples configs from their product. Prophet
+# has no tunable params here.
+SEARCH_SPACES = {
+    'arima': {'order': [[1, 1, 0], [2, 1, 0], [5, 1, 0], [1, 1, 1], [2, 1, 1], [2, 1, 2], [5, 1, 1]]},
+    'random_forest': {'n_estimators': [50, 100, 200, 400], 'lags': [1, 2, 4, 8]},
+    'gradient_boosting': {'n_estimators': [50, 100, 200, 400], 'lags': [1, 2, 4, 8]},
+    'xgboost': {'n_estimators': [50, 100, 200, 400], 'lags': [1, 2, 4, 8]},
+    # Trials stop early once the newest windows stop improving, so ``epochs`` is only a cap
+    'lstm': {'window': [30, 60, 120], 'units': [16, 32, 50, 64], 'epochs': [50], 'patience': [5]},
+}
+
+# Per-process state of a search worker, set up once by ``_init_search_worker``
+_search_state = {}
+
+
+def _init_search_worker(threads, df, limit):
+    if limit:
+        from .batch import limit_threads
+        _search_state['limits'] = limit_threads(threads)
+    _search_state.update(df=df, inputs={})
+
+
+def _rows(index, times, bounds):
+    """Map candle-row fold bounds onto the rows of ``index`` (feature rows start after the warm-up)."""
+    train_end, start, end = bounds
+    return (int(index.searchsorted(times[train_end])), int(index.searchsorted(times[start])),
+            int(index.searchsorted(times[end - 1], side='right')))
+
+
+def _evaluate(model, params, folds, threads):
+    """
+    Walk-forward records of ``params`` on the given ``(fold, bounds)``; runs in a search worker.
+
+    Returns:
+    - tuple: ``({fold: record}, CPU seconds used)``.
+    """
+    df = _search_state['df']
+    key = json.dumps(params.get('lags'))  # The only param that changes the inputs
+    inputs = _search_state['inputs'].get(key)
+    if inputs is None:
+        inputs = _search_state['inputs'][key] = prepare_inputs(df, model, params)
+    started = time.process_time()
+    records = {}
+    for fold, bounds in folds:
+        bounds = _rows(inputs['index'], df.index, bounds)
+        records[fold] = _run_fold(model, params, fold, bounds, n_jobs=threads, inputs=inputs)[0]
+    return records, time.process_time() - started
+
+
+class HalvingSearch:
+    """
+    Asynchronous successive halving (ASHA) over a model's params, scored by walk-forward MAE.
+
+    The resource is the number of walk-forward folds: every config starts on the newest fold, and
+    whenever a config ranks in the top ``1 / eta`` of its rung it is promoted to the next rung and
+    scored on ``eta`` times as many folds, up to all of them. Promotions are decided as trials finish,
+    so workers never wait for a rung to fill. Fold results are cached by (params, fold, data version),
+    so a promotion only runs the folds it adds, and a repeated search on unchanged data runs nothing.
+    New trials stop once the CPU time of the finished ones reaches ``budget``; running trials finish.
+    """
+
+    def __init__(self, model, space=None, folds=9, eta=3, min_train=0.5, gap=0, max_configs=27, budget=600,
+                 workers=None, threads=1, cache=None, seed=0):
+        """
+        Args:
+        - model (str): Model to tune.
+        - space (dict): ``{param: candidates}`` (default: ``SEARCH_SPACES[model]``).
+        - folds, min_train, gap: Walk-forward layout of the top rung (see ``walk_forward_folds``).
+        - eta (int): Promotion ratio and fold growth between rungs.
+        - max_configs (int): Configs sampled from the space; the model's defaults are always the first.
+        - budget (float): CPU seconds the search may spend, summed over the workers.
+        - workers (int): Trial processes (default: the cores divided by ``threads``); 1 runs in-process.
+        - threads (int): Native threads per worker.
+        - cache (ResultCache): Cache of fold results, shared between searches.
+        """
+        if model not in SEARCH_SPACES and space is None:
+            raise ValueError(f"{model} has no search space")
+        self.model = model
+        self.space = space or SEARCH_SPACES[model]
+        self.folds = folds
+        self.eta = eta
+        self.min_train = min_train
+        self.gap = gap
+        self.max_configs = max_configs
+        self.budget = budget
+        self.threads = threads
+        self.workers = workers or max(1, (os.cpu_count() or 1) // threads)
+        self.cache = cache if cache is not None else ResultCache()
+        self.seed = seed
+
+    def rungs(self):
+        """Folds scored at each rung: 1, eta, eta^2, ... capped at ``folds``."""
+        counts = [1]
+        while counts[-1] < self.folds:
+            counts.append(min(counts[-1] * self.eta, self.folds))
+        return counts
+
+    def configs(self):
+        from .forecasting_models import MODEL_DEFAULTS
+
+        names = list(self.space)
+        grid = [dict(zip(names, values)) for values in itertools.product(*(self.space[name] for name in names))]
+        random.Random(self.seed).shuffle(grid)
+        defaults = MODEL_DEFAULTS[self.model]
+        configs = [dict(defaults)] + [{**defaults, **sample} for sample in grid]
+        unique = {json.dumps(config, sort_keys=True): config for config in configs}
+        return list(unique.values())[:self.max_configs]
+
+    def run(self, df, interval=None, pair=PAIR, progress=None):
+        """
+        Search the space on one series.
+
+        Returns:
+        - dict: ``params`` and ``mae`` of the best config on the highest rung reached, its ``rung`` and
+          ``folds``, ``cpu_seconds`` spent and ``trials`` (a DataFrame with one row per config and rung).
+        """
+        configs = self.configs()
+        rungs = self.rungs()
+        bounds = walk_forward_folds(len(df), self.folds, self.min_train, self.gap)
+        version = data_version(df)
+        scores = [{} for _ in rungs]
+        promoted = [set() for _ in rungs]
+        trials, pending = [], {}
+        spent, started = 0.0, 0
+
+        def next_job():
+            nonlocal started
+            for rung in reversed(range(len(rungs) - 1)):
+                done = scores[rung]
+                for config in sorted(done, key=done.get)[:len(done) // self.eta]:
+                    if config not in promoted[rung]:
+                        promoted[rung].add(config)
+                        return config, rung + 1
+            if started < len(configs):
+                started += 1
+                return started - 1, 0
+            return None
+
+        def fold_key(config, fold):
+            return ResultCache.key(pair, interval, 'walk_forward_fold',
+                                   {'model': self.model, 'params': configs[config], 'bounds': bounds[fold]}, version)
+
+        def finish(config, rung, records, cpu_seconds):
+            folds = pd.DataFrame([records[fold] for fold in sorted(records)])
+            scores[rung][config] = folds['mae'].mean()
+            trials.append({'config': config, 'rung': rung, 'folds': len(folds), 'mae': folds['mae'].mean(),
+                           'rmse': folds['rmse'].mean(), 'mape': folds['mape'].mean(), 'cpu_seconds': cpu_seconds,
+                           'params': json.dumps(configs[config], sort_keys=True)})
+            if progress:
+                progress(f"{self.model} config {config} rung {rung} ({len(folds)} folds): MAE {scores[rung][config]:.2f}")
+
+        if self.workers == 1:
+            executor = ThreadPoolExecutor(max_workers=1, initializer=_init_search_worker,
+                                          initargs=(self.threads, df, False))
+        else:
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'),
+                                           initializer=_init_search_worker, initargs=(self.threads, df, True))
+        with executor:
+            while True:
+                while len(pending) < self.workers and spent < self.budget:
+                    job = next_job()
+                    if job is None:
+                        break
+                    config, rung = job
+                    folds = range(len(bounds) - rungs[rung], len(bounds))
+                    cached = {fold: self.cache.get(fold_key(config, fold)) for fold in folds}
+                    missing = [(fold, bounds[fold]) for fold, record in cached.items() if record is None]
+                    if not missing:
+                        finish(config, rung, cached, 0.0)
+                        continue
+                    future = executor.submit(_evaluate, self.model, configs[config], missing, self.threads)
+                    pending[future] = (config, rung, cached)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    config, rung, cached = pending.pop(future)
+                    records, cpu_seconds = future.result()
+                    spent += cpu_seconds
+                    for fold, record in records.items():
+                        self.cache.put(fold_key(config, fold), record)
+                    finish(config, rung, {**cached, **records}, cpu_seconds)
+
+        top = max(rung for rung in range(len(rungs)) if scores[rung])
+        best = min(scores[top], key=scores[top].get)
+        return {'params': configs[best], 'mae': float(scores[top][best]), 'rung': top, 'folds': rungs[top],
+                'cpu_seconds': spent, 'trials': pd.DataFrame(trials)}
+
+
+def tune(registry, df, pair, interval, model, fit=True, cache=None, progress=None, **options):
+    """
+    Search one model's params on one series, record the best in the registry and, with ``fit``,
+    train and register a model with them.
+
+    Args:
+    - options: ``HalvingSearch`` settings (budget, workers, folds...).
+
+    Returns:
+    - tuple: ``(result, meta)`` - the search result (see ``HalvingSearch.run``) and the registered
+      model's metadata (``None`` without ``fit``).
+    """
+    result = HalvingSearch(model, cache=cache, **options).run(df, interval, pair, progress)
+    summary = {key: result[key] for key in ('mae', 'rung', 'folds', 'cpu_seconds')}
+    summary['trials'] = len(result['trials'])
+    registry.set_best(pair, interval, model, result['params'], summary)
+    meta = None
+    if fit:
+        meta, _ = train(registry, df, pair, interval, model, params=result['params'], force=True, mode='refit')
+    return result, meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune the forecasting models' params with successive halving.")
+    parser.add_argument('--pairs', default=','.join(PAIRS), help="Comma-separated pairs (default: PI42_PAIRS).")
+    parser.add_argument('--models', default=','.join(SEARCH_SPACES), help="Comma-separated models to tune.")
+    parser.add_argument('--intervals', default=None,
+                        help="Tune every model on these intervals instead of each model's default one.")
+    parser.add_argument('--budget', type=float, default=600, help="CPU seconds per model search.")
+    parser.add_argument('--workers', type=int, default=None, help="Trial processes (default: cores / threads).")
+    parser.add_argument('--threads', type=int, default=1, help="Native threads per worker.")
+    parser.add_argument('--folds', type=int, default=9, help="Walk-forward folds of the top rung.")
+    parser.add_argument('--eta', type=int, default=3, help="Promotion ratio between rungs.")
+    parser.add_argument('--max-configs', type=int, default=27, help="Configs sampled per model.")
+    parser.add_argument('--no-fit', action='store_true', help="Only record the best params, do not train.")
+    args = parser.parse_args(argv)
+
+    store = open_store()
+    registry = ModelRegistry()
+    cache = ResultCache()
+    catalogs = {}
+    for pair, interval, model in plan_jobs(split_list(args.pairs), split_list(args.models),
+                                           split_list(args.intervals)):
+        catalog = catalogs.setdefault(pair, DataCatalog(store, pair))
+        if interval not in catalog:
+            print(f"{pair} {interval}: no data, skipping {model}.")
+            continue
+        result, meta = tune(registry, catalog[interval], pair, interval, model, fit=not args.no_fit, cache=cache,
+                            budget=args.budget, workers=args.workers, threads=args.threads, folds=args.folds,
+                            eta=args.eta, max_configs=args.max_configs)
+        print(f"{pair} {interval} {model}: best {result['params']} (MAE {result['mae']:.2f} over {result['folds']} "
+              f"folds, {len(result['trials'])} trials, {result['cpu_seconds']:.0f} CPU s)"
+              + (f", registered {meta['version']}" if meta else ""))
+
+
+if __name__ == "__main__":
+    main()
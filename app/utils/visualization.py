@@ -1,13 +1,33 @@
 # visualization.py
+import numpy as np
 import streamlit as st
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 
+from .config import PAIR
+from .downsampling import MAX_POINTS, LevelPyramid, downsample
+from .result_cache import data_version, default_cache
+from .rollups import RollupPyramid
+from .time_index import TimeIndex
+
+
+def visible_range_slider(data, key=None):
+    """Slider over the frame's time span; returns the chosen ``(start, end)`` as datetime64 for ``downsample``."""
+    if len(data) < 2:
+        return None
+    first, last = data.index[0].to_pydatetime(), data.index[-1].to_pydatetime()
+    start, end = st.slider("Visible range", min_value=first, max_value=last, value=(first, last), key=key)
+    return np.datetime64(start), np.datetime64(end)
 
 
 class DataVisualizer:
-    def __init__(self, data_dict):
+    def __init__(self, data_dict, pair=PAIR, cache=None, max_points=MAX_POINTS, rollups=None):
         self.data_dict = data_dict
+        self.pair = pair
+        self.cache = cache or default_cache
+        # Hour/day/week rollups behind the statistics and the multi-timeframe chart
+        self.rollups = rollups or RollupPyramid()
+        self.max_points = max_points
 
     def display_selected_data(self):
         intervals = list(self.data_dict.keys())
@@ -23,12 +43,20 @@ class DataVisualizer:
             st.write("Sample of Analyzed Data (Tail):")
             st.dataframe(data.tail())
 
-        self.plot_closing_prices(data, selected_interval)
-        self.display_basic_statistics(data)
+        visible_range = visible_range_slider(data, key='overview_range')
+        self.plot_closing_prices(data, selected_interval, visible_range)
+        self.display_basic_statistics(data, selected_interval)
+        self.display_data_quality(data, selected_interval)
 
-    def plot_closing_prices(self, data, selected_interval):
+    def plot_closing_prices(self, data, selected_interval, visible_range=None):
+        x, y = data.index.to_numpy(), data['close'].to_numpy()
+        pyramid = self.cache.get_or_compute(self.pair, selected_interval, 'pyramid',
+                                            {'column': 'close', 'method': 'lttb'}, data_version(data),
+                                            lambda: LevelPyramid(x, y, min_points=self.max_points, method='lttb'))
+        start, end = visible_range or (None, None)
+        x, y = downsample(x, y, self.max_points, 'lttb', start, end, pyramid)
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=data.index, y=data['close'], mode='lines', name='Closing Price'))
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Closing Price'))
         fig.update_layout(
             title=f"{selected_interval} Interval Closing Prices",
             xaxis_title="Time",
@@ -37,26 +65,45 @@ class DataVisualizer:
         )
         st.plotly_chart(fig, use_container_width=True)
 
-    def display_basic_statistics(self, data):
+    def display_basic_statistics(self, data, selected_interval):
+        # Merged from the weekly rollups (a no-op update unless new candles arrived); quartiles are not kept
+        self.rollups.update(self.pair, selected_interval, data)
+        statistics = self.rollups.summary(self.pair, selected_interval)
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Basic Statistics")
-            st.write(data.describe())
+            st.write(data.describe() if statistics is None else statistics)
         with col2:
             st.subheader("Dataset Information")
             st.write(f"Total number of records: {len(data)}")
             st.write(f"Date range: from {data.index.min()} to {data.index.max()}")
             st.write(f"Columns in the dataset: {', '.join(data.columns)}")
 
+    def display_data_quality(self, data, selected_interval):
+        index_of = getattr(self.data_dict, 'index', None)
+        index = index_of(selected_interval) if index_of else TimeIndex.from_frame(data, selected_interval)
+        report = index.report()
+        st.subheader("Data Quality")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Coverage", f"{report['coverage']:.2%}")
+        col2.metric("Missing candles", report['missing'])
+        col3.metric("Gaps", report['gaps'])
+        col4.metric("Duplicates", report['duplicates'])
+        if report['gaps']:
+            gaps = index.gaps[:, :2].astype('datetime64[ms]')
+            st.write("Largest gaps:")
+            order = index.gaps[:, 2].argsort()[::-1][:5]
+            st.dataframe({'from': gaps[order, 0], 'to': gaps[order, 1], 'missing': index.gaps[order, 2]})
+
     def create_multi_timeframe_chart(self):
         st.subheader("Multi-Timeframe Comparison")
         fig = make_subplots(rows=3, cols=2, subplot_titles=list(self.data_dict.keys()), shared_xaxes=True, vertical_spacing=0.1)
 
-        # Add traces for each timeframe
-        for i, (interval, data) in enumerate(self.data_dict.items()):
+        # Add traces for each timeframe, read from the persisted daily rollups
+        for i, interval in enumerate(self.data_dict.keys()):
             row = i // 2 + 1
             col = i % 2 + 1
-            daily_data = data['close'].resample('D').last()
+            daily_data = self.daily_bars(interval)['close']
             fig.add_trace(go.Scatter(x=daily_data.index, y=daily_data, mode='lines', name=interval), row=row, col=col)
             fig.update_xaxes(title_text="Date", row=row, col=col)
             fig.update_yaxes(title_text="Price (INR)", row=row, col=col)
@@ -64,6 +111,14 @@ class DataVisualizer:
         st.plotly_chart(fig, use_container_width=True)
         self.display_trend_analysis()
 
+    def daily_bars(self, interval):
+        """Daily OHLCV of one interval; the candles are only touched if the rollups were never built."""
+        bars = self.rollups.bars(self.pair, interval, '1d')
+        if bars is None:
+            self.rollups.update(self.pair, interval, self.data_dict[interval])
+            bars = self.rollups.bars(self.pair, interval, '1d')
+        return bars
+
     def display_trend_analysis(self):
         st.write("### Trend Analysis")
         col1, col2, col3 = st.columns(3)
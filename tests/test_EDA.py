@@ -1,5 +1,14 @@
 import os
+import sys
 import pandas as pd
+import pytest
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.candle_store import CandleStore
+from app.utils.catalog import DataCatalog
+
 intervals = ['5m', '15m', '30m', '1h', '6h', '12h']
 dataframes = {}
 # Path relative to the script's location
@@ -9,3 +18,131 @@ if os.path.exists(file_path):
     df = pd.read_csv(file_path)
 else:
     print(f"File not found: {file_path}")
+
+
+def test_catalog_loads_lazily_and_compacts_dtypes(tmp_path):
+    catalog = DataCatalog(CandleStore(str(tmp_path)), seed_dir=os.path.join(os.path.dirname(__file__), '..', 'app'))
+    assert catalog.loaded() == []
+    df = catalog['5m']
+    assert catalog.loaded() == ['5m']
+    assert df['close'].dtype == 'int32' and df['volume'].dtype == 'float32'
+    assert 'endTime' not in df.columns and df.index.dtype.kind == 'M'
+    raw = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_5m_data.csv'))
+    assert (df['close'].to_numpy() == raw['close'].to_numpy()).all()
+    assert catalog.memory_usage()['total'] < raw.memory_usage(index=True, deep=True).sum()
+
+
+def test_catalog_reloads_an_interval_after_the_store_gains_candles(tmp_path):
+    store = CandleStore(str(tmp_path))
+    catalog = DataCatalog(store, seed_dir=os.path.join(os.path.dirname(__file__), '..', 'app'), check_interval=0)
+    first = catalog['1h']
+    assert catalog['1h'] is first
+
+    last = int(first.index[-1].value // 1_000_000)
+    store.write('BTCINR', '1h', pd.DataFrame([{'startTime': last + 3_600_000, 'open': 1, 'high': 1, 'low': 1,
+                                               'close': 1, 'endTime': last + 7_199_999, 'volume': 1.0}]))
+    reloaded = catalog['1h']
+    assert len(reloaded) == len(first) + 1 and reloaded['close'].iloc[-1] == 1
+    assert catalog.index('1h').window(reloaded).shape == reloaded.shape
+
+
+def test_result_cache_evicts_least_recently_used_entries():
+    import numpy as np
+    from app.utils.result_cache import ResultCache
+
+    cache = ResultCache(max_bytes=3 * 8000)
+    for i in range(3):
+        cache.get_or_compute('BTCINR', '5m', 'sma', {'n': i}, (1,), lambda: np.zeros(1000))
+    cache.get_or_compute('BTCINR', '5m', 'sma', {'n': 0}, (1,), lambda: np.zeros(1000))  # Refresh n=0
+    cache.get_or_compute('BTCINR', '5m', 'sma', {'n': 3}, (1,), lambda: np.zeros(1000))
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 4 and stats['evictions'] == 1
+    assert cache.get(ResultCache.key('BTCINR', '5m', 'sma', {'n': 1}, (1,))) is None
+    assert cache.get(ResultCache.key('BTCINR', '5m', 'sma', {'n': 0}, (1,))) is not None
+
+
+def test_eda_leaves_the_shared_frame_untouched(tmp_path):
+    from app.utils.EDA import EDA
+    from app.utils.result_cache import ResultCache
+
+    catalog = DataCatalog(CandleStore(str(tmp_path)), seed_dir=os.path.join(os.path.dirname(__file__), '..', 'app'))
+    columns = list(catalog['1h'].columns)
+    cache = ResultCache()
+    for _ in range(2):
+        eda = EDA(catalog, '1h', cache=cache)
+        eda.price_change_analysis()
+        eda.moving_average_analysis()
+        eda.rsi_analysis()
+    assert list(catalog['1h'].columns) == columns
+    assert cache.stats()['hits'] == 4  # price change, SMAs, close pyramid, RSI
+
+
+def test_downsampling_caps_points_and_keeps_extremes():
+    import numpy as np
+    from app.utils.downsampling import LevelPyramid, downsample, lttb_indices
+
+    rng = np.random.default_rng(0)
+    x = np.arange(200_000, dtype=np.int64) * 60_000
+    y = np.cumsum(rng.normal(size=len(x)))
+    y[123_457] = y.max() + 50
+
+    indices = lttb_indices(x, y, 500)
+    assert len(indices) == 500 and indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+
+    _, kept = downsample(x, y, 1000, method='minmax')
+    assert len(kept) <= 1000 and kept.max() == y.max() and kept.min() == y.min()
+
+    pyramid = LevelPyramid(x, y, min_points=1000)
+    for start, end in [(None, None), (x[1000], x[150_000]), (x[5000], x[5400])]:
+        px, py = downsample(x, y, 1000, 'minmax', start=start, end=end, pyramid=pyramid)
+        assert 0 < len(px) <= 1000
+        assert start is None or (px[0] >= start and px[-1] <= end)
+    assert len(downsample(x, y, 1000, 'minmax', start=x[5000], end=x[5400], pyramid=pyramid)[0]) == 401
+    assert py.max() == y[5000:5401].max()
+
+
+def test_line_pyramids_answer_with_lttb_levels():
+    import numpy as np
+    from app.utils.downsampling import LevelPyramid, downsample, lttb_indices
+
+    rng = np.random.default_rng(1)
+    x = (np.datetime64('2024-01-01T00:00') + np.arange(50_000) * np.timedelta64(5, 'm'))
+    y = np.cumsum(rng.normal(size=len(x)))
+    pyramid = LevelPyramid(x, y, min_points=1000, method='lttb')
+    level, xs = pyramid.levels[1]
+    assert (level == lttb_indices(x.astype('int64'), y, len(x) // 4)).all() and (xs == x[level]).all()
+
+    px, py = downsample(x, y, 1000, 'lttb', pyramid=pyramid)
+    # LTTB keeps the end points of every level, which min/max buckets do not
+    assert 0 < len(px) <= 1000 and px[0] == x[0] and px[-1] == x[-1]
+    assert (np.diff(px.astype('int64')) > 0).all()
+    with pytest.raises(ValueError):
+        downsample(x, y, 1000, 'minmax', pyramid=pyramid)
+
+
+def test_decomposition_service_serves_stale_result_while_refreshing_a_trailing_window():
+    import numpy as np
+    from app.utils.decomposition import DecompositionService, decompose
+    from app.utils.result_cache import ResultCache
+
+    index = pd.date_range('2024-01-01', periods=5000, freq='5min')
+    steps = np.random.default_rng(0).normal(size=len(index))
+    df = pd.DataFrame({'close': 5e6 + 100 * np.cumsum(steps) + 1000 * np.sin(np.arange(len(index)) * np.pi / 15)},
+                      index=index)
+    service = DecompositionService(cache=ResultCache())
+
+    result, refresh = service.request('BTCINR', '5m', df.iloc[:-20])
+    assert result is None
+    first = refresh.result()
+    assert service.request('BTCINR', '5m', df.iloc[:-20]) == (first, None)
+
+    result, refresh = service.request('BTCINR', '5m', df)
+    assert result is first and refresh is not None
+    updated = refresh.result()
+    full = decompose(df['close'])
+    assert updated.index.equals(full.index)
+    assert (updated['observed'] == full['observed']).all()
+    assert np.allclose(updated['trend'].iloc[:-15], full['trend'].iloc[:-15], equal_nan=True)
+    assert service.request('BTCINR', '5m', df)[1] is None
+    service.shutdown()
@@ -0,0 +1,135 @@
+# Unit tests for the multi-timeframe candle aggregator
+import os
+import sys
+
+import pandas as pd
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.aggregator import CandleAggregator, rebuild_intervals, resample_ohlcv
+from app.utils.ingestion import Candle, Tick
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_5m_data.csv')
+
+
+def base_candles():
+    return pd.read_csv(DATA_PATH).sort_values('startTime').reset_index(drop=True)
+
+
+def test_resample_matches_pandas_resample():
+    df = base_candles()
+    bars = resample_ohlcv(df, '1h')
+    indexed = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))
+    expected = indexed.resample('1h').agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                           'close': 'last', 'volume': 'sum'}).dropna()
+    assert len(bars) == len(expected)
+    assert (bars['high'].to_numpy() == expected['high'].to_numpy()).all()
+    assert (bars['close'].to_numpy() == expected['close'].to_numpy()).all()
+    assert abs(bars['volume'].to_numpy() - expected['volume'].to_numpy()).max() < 1e-9
+
+
+def test_streaming_aggregation_matches_vectorized_rebuild():
+    df = base_candles()
+    closed = []
+    aggregator = CandleAggregator('BTCINR', on_bar_close=closed.append)
+    for row in df.itertuples(index=False):
+        candle = Candle('BTCINR', '5m', row.startTime, row.endTime, row.open, row.high, row.low,
+                        row.close, row.volume, True, row.endTime)
+        # A forming update first: it must be replaced, not added, when the candle closes
+        aggregator.update(candle._replace(closed=False, close=row.open, volume=row.volume / 2))
+        aggregator.update(candle)
+
+    rebuilt = rebuild_intervals(df, ['15m', '6h'])
+    for interval in ['15m', '6h']:
+        emitted = [bar for bar in closed if bar.interval == interval]
+        expected = rebuilt[interval].iloc[:len(emitted)]
+        assert len(emitted) >= len(rebuilt[interval]) - 1
+        assert [bar.close for bar in emitted] == expected['close'].tolist()
+        assert [bar.high for bar in emitted] == expected['high'].tolist()
+        assert max(abs(bar.volume - v) for bar, v in zip(emitted, expected['volume'])) < 1e-9
+
+
+def test_trades_build_base_and_higher_bars():
+    closed = []
+    aggregator = CandleAggregator('BTCINR', intervals=['15m'], on_bar_close=closed.append)
+    for minute, price in enumerate([100, 105, 95, 102, 110, 90, 101, 99, 100, 104, 103, 98, 97, 96, 120, 121]):
+        aggregator.update(Tick('BTCINR', price, 1.0, minute * 60_000, minute * 60_000))
+    assert len(closed) == 1
+    bar = closed[0]
+    assert (bar.open, bar.high, bar.low, bar.close, bar.volume) == (100, 120, 90, 120, 15.0)
+    assert aggregator.current('15m').close == 121
+
+
+def test_seeded_aggregator_emits_whole_bars_after_connecting_mid_bucket(tmp_path):
+    from app.utils.candle_store import CandleStore
+
+    df = base_candles()
+    rebuilt = resample_ohlcv(df, '6h')
+    # Disconnect mid-bucket with the newest stored candle still forming
+    cut = int(df.index[df['startTime'] >= rebuilt['startTime'].iloc[-3]][0]) + 7
+    stored = df.iloc[:cut].copy()
+    stored.loc[stored.index[-1], ['close', 'volume']] = [stored['open'].iloc[-1], 0.1]
+    store = CandleStore(str(tmp_path))
+    store.write('BTCINR', '5m', stored)
+
+    closed = []
+    aggregator = CandleAggregator('BTCINR', intervals=['6h'], on_bar_close=closed.append)
+    aggregator.seed(store)
+    for row in df.iloc[cut - 1:].itertuples(index=False):
+        aggregator.update(Candle('BTCINR', '5m', row.startTime, row.endTime, row.open, row.high, row.low,
+                                 row.close, row.volume, True, row.endTime))
+
+    expected = rebuilt.iloc[-3]
+    bar = closed[0]
+    assert bar.startTime == expected['startTime']
+    assert (bar.open, bar.high, bar.low, bar.close) == tuple(expected[['open', 'high', 'low', 'close']])
+    assert abs(bar.volume - expected['volume']) < 1e-9
+
+
+def test_rollups_update_incrementally_and_match_full_rebuild(tmp_path):
+    from app.utils.candle_store import CandleStore
+    from app.utils.rollups import RollupPyramid
+
+    df = base_candles()
+    full = RollupPyramid(str(tmp_path / 'full'))
+    full.update('BTCINR', '5m', df)
+
+    # Candles landing in batches through a store, with the forming candle rewritten in the next batch
+    store = CandleStore(str(tmp_path / 'store'))
+    store.write('BTCINR', '5m', df.iloc[:500])
+    incremental = RollupPyramid(str(tmp_path / 'incremental'), store=store)
+    incremental.update('BTCINR', '5m')
+    for start in range(500, len(df), 97):
+        batch = df.iloc[start - 1:start + 97]
+        store.write('BTCINR', '5m', batch)
+        incremental.update('BTCINR', '5m', batch)
+    assert incremental.update('BTCINR', '5m', df.iloc[-1:]) == 0
+
+    reopened = RollupPyramid(str(tmp_path / 'incremental'))
+    for level in ['1h', '1d', '1w']:
+        expected = full.bars('BTCINR', '5m', level)
+        assert (reopened.bars('BTCINR', '5m', level).index == expected.index).all()
+        assert abs(reopened.bars('BTCINR', '5m', level) - expected).to_numpy().max() < 1e-6
+    daily = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))['close'].resample('D').last().dropna()
+    assert (full.bars('BTCINR', '5m', '1d')['close'].to_numpy() == daily.to_numpy()).all()
+
+    summary, expected = reopened.summary('BTCINR', '5m'), df[['open', 'high', 'low', 'close', 'volume']].describe()
+    assert abs(summary / expected.loc[summary.index] - 1).to_numpy().max() < 1e-9
+    assert full.bars('BTCINR', '1h', '1h') is None
+
+
+def test_rollups_rerun_when_a_forming_candle_keeps_its_close(tmp_path):
+    from app.utils.rollups import RollupPyramid
+
+    df = base_candles()
+    pyramid = RollupPyramid(str(tmp_path))
+    pyramid.update('BTCINR', '5m', df)
+    forming = df.iloc[-1:].copy()
+    forming['high'] += 1_000
+    forming['volume'] += 2.0
+    assert pyramid.update('BTCINR', '5m', forming) > 0
+
+    bar = RollupPyramid(str(tmp_path)).bars('BTCINR', '5m', '1h').iloc[-1]
+    assert bar['high'] == forming['high'].iloc[0]
+    assert pyramid.update('BTCINR', '5m', forming) == 0
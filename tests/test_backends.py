@@ -0,0 +1,55 @@
+# Unit tests for the lazily imported model backends
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils import backends
+from app.utils.backends import backend, import_costs, measure_import, register_backend, startup_modules
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ['sklearn.ensemble', 'statsmodels', 'xgboost', 'keras', 'tensorflow', 'fbprophet', 'prophet',
+                 'matplotlib.pyplot', 'seaborn', 'scipy.signal']
+
+
+def test_forecasting_modules_import_no_model_library():
+    code = ("import sys; import app.utils.forecasting_models, app.utils.training, app.utils.batch; "
+            f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])")
+    output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_app_startup_chain_imports_no_model_or_plotting_library():
+    modules = startup_modules()
+    assert 'app.utils.EDA' in modules and 'app.utils.decomposition' in modules and 'streamlit' in modules
+    code = (f"import importlib, sys; [importlib.import_module(name) for name in {modules!r}]; "
+            f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])")
+    output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip() == '[]'
+
+
+def test_backends_load_once_from_the_first_installed_module():
+    register_backend('test_json', ('not_an_installed_module', 'json'), 'dumps')
+    try:
+        import json
+        assert backend('test_json') is json.dumps
+        assert backend('test_json') is json.dumps
+        assert 'test_json' in import_costs()
+        register_backend('test_missing', 'not_an_installed_module')
+        with pytest.raises(ImportError, match='test_missing'):
+            backend('test_missing')
+    finally:
+        backends.BACKENDS.pop('test_json', None)
+        backends.BACKENDS.pop('test_missing', None)
+
+
+def test_import_cost_is_measured_in_a_fresh_interpreter():
+    result = measure_import(['json'])
+    assert result['error'] is None and result['seconds'] >= 0
+    assert measure_import(['not_an_installed_module'])['error']
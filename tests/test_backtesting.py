@@ -0,0 +1,72 @@
+# Unit tests for the walk-forward fold layout and the halving search built on it
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.backtesting import walk_forward_folds
+from app.utils.tuning import HalvingSearch, _rows
+
+
+def test_folds_expand_and_never_train_on_their_test_window():
+    bounds = walk_forward_folds(1000, folds=4, min_train=0.6, gap=5)
+    assert bounds[0] == (600, 605, 703)
+    assert bounds[-1][2] == 1000
+    for (train_end, start, end), (next_train_end, next_start, _) in zip(bounds, bounds[1:]):
+        assert train_end + 5 == start < end == next_start
+        assert next_train_end > train_end
+    # Test windows tile the tail without overlap
+    assert sum(end - start for _, start, end in bounds) == 1000 - 605
+
+
+def test_fold_layout_accepts_row_counts_and_rejects_short_histories():
+    assert walk_forward_folds(100, folds=2, min_train=60) == [(60, 60, 80), (80, 80, 100)]
+    with pytest.raises(ValueError):
+        walk_forward_folds(10, folds=20)
+
+
+def test_halving_rungs_grow_by_eta_up_to_all_folds():
+    assert HalvingSearch('arima', folds=9, eta=3).rungs() == [1, 3, 9]
+    assert HalvingSearch('arima', folds=6, eta=2).rungs() == [1, 2, 4, 6]
+    with pytest.raises(ValueError):
+        HalvingSearch('prophet')
+
+
+def test_fold_bounds_map_onto_feature_rows_after_the_warm_up():
+    times = pd.date_range('2024-01-01', periods=100, freq='15min')
+    features = times[3:]  # Three warm-up bars dropped by the feature builder
+    train_end, start, end = walk_forward_folds(100, folds=2, min_train=60)[1]
+    assert _rows(features, times, (train_end, start, end)) == (77, 77, 97)
+    assert features[77] == times[train_end] and features[96] == times[end - 1]
+
+
+def test_walk_forward_scores_every_fold_and_reuse_only_costs_the_new_bars():
+    from app.utils.backtesting import walk_forward
+
+    df = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_15m_data.csv'))
+    df = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))
+    folds, predictions = walk_forward(df, 'arima', {'order': [1, 1, 0]}, folds=3, workers=1)
+    assert list(folds.index) == [0, 1, 2] and (folds['mae'] > 0).all()
+    assert len(predictions) == folds['rows'].sum() and predictions.index.is_monotonic_increasing
+    # Every prediction is for a bar after the fold's training rows
+    assert (folds['test_start'] > df.index[folds['train_rows'] - 1]).all()
+
+    reused, _ = walk_forward(df, 'arima', {'order': [1, 1, 0]}, folds=3, reuse=True)
+    assert reused['mae'].iloc[0] == pytest.approx(folds['mae'].iloc[0])
+    assert (reused['mae'] - folds['mae']).abs().max() < 0.05 * folds['mae'].max()
+
+
+def test_registry_holdout_scores_arima_one_step_ahead_like_the_backtest():
+    from app.utils.backtesting import walk_forward
+    from app.utils.forecasting_models import ForecastingModels
+
+    df = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_15m_data.csv'))
+    df = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))
+    _, meta = ForecastingModels(df, '15m').fit('arima', {'order': [1, 1, 0]})
+    folds, _ = walk_forward(df, 'arima', {'order': [1, 1, 0]}, folds=1, min_train=0.8, workers=1)
+    assert meta['metrics']['rows'] == folds['rows'].iloc[0]
+    assert meta['metrics']['mae'] == pytest.approx(folds['mae'].iloc[0])
@@ -0,0 +1,67 @@
+# Unit tests for the batch runner
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+from threadpoolctl import threadpool_info
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.batch import ResultsStore, _init_worker, run_batch
+from app.utils.candle_store import CandleStore
+from app.utils.model_registry import ModelRegistry
+from app.utils.training import plan_jobs
+
+
+class CrashingStore(CandleStore):
+    """Store whose reads kill the worker process, as an OOM kill would."""
+
+    def read(self, *args, **kwargs):
+        os._exit(1)
+
+
+def test_plan_jobs_uses_default_intervals_or_the_full_matrix():
+    assert plan_jobs(['A', 'B'], ['arima', 'lstm']) == [('A', '5m', 'arima'), ('A', '1h', 'lstm'),
+                                                        ('B', '5m', 'arima'), ('B', '1h', 'lstm')]
+    assert len(plan_jobs(['A'], ['arima', 'lstm'], ['5m', '15m', '1h'])) == 6
+
+
+def test_workers_cap_native_thread_pools(tmp_path):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'), initializer=_init_worker,
+                             initargs=(1, CandleStore, str(tmp_path), str(tmp_path), str(tmp_path))) as executor:
+        assert executor.submit(os.getenv, 'OMP_NUM_THREADS').result() == '1'
+        assert executor.submit(os.getenv, 'TF_NUM_INTRAOP_THREADS').result() == '1'
+        assert all(pool['num_threads'] == 1 for pool in executor.submit(threadpool_info).result())
+
+
+def test_results_store_round_trips_forecasts_and_runs(tmp_path):
+    results = ResultsStore(str(tmp_path))
+    assert results.latest_forecast('BTCINR', '5m', 'arima') is None
+    index = pd.date_range('2024-01-01', periods=3, freq='5min')
+    results.write_forecast('20240101T000000-a', 'BTCINR', '5m', 'arima', pd.DataFrame({'close': [1.0, 2.0, 3.0]}, index))
+    results.write_forecast('20240102T000000-b', 'BTCINR', '5m', 'arima', pd.DataFrame({'close': [4.0, 5.0, 6.0]}, index))
+    latest = results.latest_forecast('BTCINR', '5m', 'arima')
+    assert latest['close'].tolist() == [4.0, 5.0, 6.0] and (latest['run_id'] == '20240102T000000-b').all()
+    assert latest.index.equals(index.rename('startTime'))
+
+
+def test_jobs_without_data_are_recorded_in_the_run_table(tmp_path):
+    results = ResultsStore(str(tmp_path / 'results'))
+    table = run_batch([('NODATA', '5m', 'arima')], store=CandleStore(str(tmp_path / 'store')),
+                      registry=ModelRegistry(str(tmp_path / 'models')), results=results, run_id='run-1', progress=None)
+    assert table['status'].tolist() == ['no data']
+    runs = results.runs()
+    assert runs[['pair', 'status', 'run_id']].values.tolist() == [['NODATA', 'no data', 'run-1']]
+
+
+def test_a_crashed_worker_is_recorded_as_a_failed_job(tmp_path):
+    store = CrashingStore(str(tmp_path / 'store'))
+    store.write('BTCINR', '5m', pd.DataFrame({'startTime': [0, 300_000], 'close': [1.0, 2.0]}))
+    results = ResultsStore(str(tmp_path / 'results'))
+    table = run_batch([('BTCINR', '5m', 'arima')], workers=1, store=store, registry=ModelRegistry(str(tmp_path / 'models')),
+                      results=results, run_id='run-1', progress=None)
+    assert table['status'].tolist() == ['error'] and 'BrokenProcessPool' in table['error'].iloc[0]
+    assert results.runs()['status'].tolist() == ['error']
@@ -0,0 +1,65 @@
+# Unit tests for the cross-pair rolling statistics
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.candle_store import CandleStore
+from app.utils.cross_asset import RollingCrossStats, align_closes, cross_asset_stats
+
+PAIRS = ['BTCINR', 'ETHINR', 'SOLINR', 'XRPINR']
+STEP = 5 * 60_000
+
+
+def synthetic_closes(rows=3000, seed=1):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(size=(rows, 1))
+    returns = 0.001 * (0.6 * market + rng.normal(size=(rows, len(PAIRS))) * np.arange(1, len(PAIRS) + 1) * 0.5)
+    closes = 1e5 * np.exp(np.cumsum(returns, axis=0))
+    closes[:700, 2] = np.nan         # Listed later
+    closes[1500:1520, 1] = np.nan    # Outage
+    return closes
+
+
+def test_chunked_rolling_stats_match_pandas_pairwise_rolling():
+    closes, window = synthetic_closes(), 100
+    stats = RollingCrossStats(PAIRS, window, benchmark='BTCINR')
+    parts = [stats.update(closes[i:i + 777]) for i in range(0, len(closes), 777)]
+    corr = np.concatenate([part['corr'] for part in parts])
+    cov = np.concatenate([part['cov'] for part in parts])
+    beta = np.concatenate([part['beta'] for part in parts])
+
+    returns = pd.DataFrame(np.log(closes[1:] / closes[:-1]), columns=PAIRS)
+    returns = pd.concat([pd.DataFrame(np.nan, index=[0], columns=PAIRS), returns.set_axis(range(1, len(closes)))])
+    rolling = returns.rolling(window, min_periods=window // 2)
+    expected_corr, expected_cov = rolling.corr(), rolling.cov()
+    for row in [150, 800, 1510, 2999]:
+        assert np.allclose(corr[row], expected_corr.loc[row].to_numpy(), atol=1e-5, equal_nan=True)
+        assert np.allclose(cov[row], expected_cov.loc[row].to_numpy(), rtol=1e-4, equal_nan=True)
+    # Away from gaps, the pairwise-complete beta is the usual cov / var of the benchmark
+    expected_beta = rolling.cov(returns['BTCINR']).div(returns['BTCINR'].rolling(window, min_periods=window // 2).var(),
+                                                       axis=0)
+    assert np.allclose(beta[1700:], expected_beta.to_numpy()[1700:], rtol=1e-4, equal_nan=True)
+
+
+def test_store_scan_aligns_pairs_and_keeps_only_the_latest_matrices(tmp_path):
+    closes = synthetic_closes(rows=2000)
+    start = 1_700_000_000_000 // STEP * STEP
+    times = start + np.arange(len(closes)) * STEP
+    store = CandleStore(str(tmp_path))
+    for column, pair in enumerate(PAIRS):
+        present = ~np.isnan(closes[:, column])
+        store.write(pair, '5m', pd.DataFrame({'startTime': times[present], 'close': closes[present, column]}))
+
+    aligned_times, aligned = align_closes({pair: store.read(pair, '5m') for pair in PAIRS}, PAIRS, '5m')
+    assert (aligned_times == times).all() and np.array_equal(aligned, closes, equal_nan=True)
+
+    result = cross_asset_stats(store, PAIRS, '5m', 288, times[0], times[-1], benchmark='BTCINR', chunk_rows=300)
+    reference = RollingCrossStats(PAIRS, 288, benchmark='BTCINR').update(closes)
+    assert result['corr'].shape == (len(PAIRS), len(PAIRS)) and result['beta'].shape == closes.shape
+    assert np.allclose(result['corr'], reference['corr'][-1], equal_nan=True)
+    assert np.allclose(result['beta'], reference['beta'], equal_nan=True)
@@ -1 +1,236 @@
-# Unit tests for data retrieval functionality
\ No newline at end of file
+# Unit tests for data retrieval functionality
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.data_retrieval import (INTERVAL_MS, KlineBackfiller, compact_csv, derive_sync, incremental_sync,
+                                      load_watermarks)
+
+START = 1727520900000
+STEP = INTERVAL_MS['5m']
+
+
+def make_candle(start):
+    price = 5_600_000 + (start - START) // STEP
+    return {'startTime': start, 'open': price, 'high': price + 10, 'low': price - 10,
+            'close': price + 5, 'endTime': start + STEP - 1, 'volume': 1.5}
+
+
+class StubKlineHandler(BaseHTTPRequestHandler):
+    """Serves synthetic 5m candles up to ``server.last_start`` with optional injected failures."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.calls.append(body)
+        if self.server.failures:
+            status = self.server.failures.pop(0)
+            self.send_response(status)
+            if status == 429:
+                self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        end = min(body.get('endTime', self.server.last_start), self.server.last_start)
+        first = max(body['startTime'], START)
+        first += (-(first - START)) % STEP
+        candles = [make_candle(t) for t in range(first, end + 1, STEP)][:body['limit']]
+        payload = json.dumps(candles).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(last_start, failures=()):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubKlineHandler)
+    server.calls = []
+    server.failures = list(failures)
+    server.last_start = last_start
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_backfill_walks_pages_without_truncation():
+    server = start_stub(START + 2499 * STEP)
+    try:
+        backfiller = KlineBackfiller(url=f"http://127.0.0.1:{server.server_port}", page_limit=1000, backoff=0)
+        df = backfiller.backfill('BTCINR', '5m', START, START + 2499 * STEP)
+    finally:
+        server.shutdown()
+    assert len(df) == 2500
+    assert df['startTime'].is_monotonic_increasing
+    assert df['startTime'].diff().dropna().eq(STEP).all()
+    assert len(server.calls) == 3
+
+
+def test_backfill_retries_rate_limits_and_server_errors():
+    server = start_stub(START + 9 * STEP, failures=[429, 503])
+    try:
+        backfiller = KlineBackfiller(url=f"http://127.0.0.1:{server.server_port}", page_limit=100,
+                                     max_workers=2, backoff=0)
+        frames = backfiller.backfill_many(['BTCINR'], ['5m'], START, START + 9 * STEP)
+    finally:
+        server.shutdown()
+    assert len(frames[('BTCINR', '5m')]) == 10
+    assert backfiller.stats['retries'] == 2
+    assert backfiller.stats['rate_limited'] == 1
+
+
+def test_incremental_sync_fetches_only_the_delta(tmp_path):
+    # A file left behind by the append-only writer: 100 candles, the last 20 duplicated
+    rows = [make_candle(START + i * STEP) for i in range(100)]
+    pd.DataFrame(rows + rows[80:]).to_csv(tmp_path / 'BTCINR_5m_data.csv', index=False)
+
+    server = start_stub(START + 149 * STEP)
+    try:
+        backfiller = KlineBackfiller(url=f"http://127.0.0.1:{server.server_port}", page_limit=1000, backoff=0)
+        written = incremental_sync(['BTCINR'], ['5m'], backfiller, folder_path=str(tmp_path),
+                                   end_time=START + 199 * STEP)
+    finally:
+        server.shutdown()
+
+    assert [call['startTime'] for call in server.calls] == [START + 99 * STEP]
+    assert written[('BTCINR', '5m')] == 51
+    df = pd.read_csv(tmp_path / 'BTCINR_5m_data.csv')
+    assert len(df) == 150
+    assert df['startTime'].is_unique and df['startTime'].is_monotonic_increasing
+    assert load_watermarks(str(tmp_path))['BTCINR_5m']['startTime'] == START + 149 * STEP
+
+
+def test_compact_csv_removes_appended_duplicates(tmp_path):
+    rows = [make_candle(START + i * STEP) for i in range(5)]
+    pd.DataFrame(rows + rows[2:]).to_csv(tmp_path / 'BTCINR_5m_data.csv', index=False)
+    mark = compact_csv('BTCINR_5m_data.csv', str(tmp_path))
+    df = pd.read_csv(tmp_path / 'BTCINR_5m_data.csv')
+    assert len(df) == 5
+    with open(tmp_path / 'BTCINR_5m_data.csv', 'rb') as f:
+        f.seek(mark['offset'])
+        assert f.readline().startswith(str(START + 4 * STEP).encode())
+
+
+def test_candle_store_reads_only_the_requested_range(tmp_path):
+    from app.utils.candle_store import CandleStore
+
+    store = CandleStore(str(tmp_path))
+    rows = [make_candle(START + i * STEP) for i in range(600)]
+    store.write('BTCINR', '5m', pd.DataFrame(rows[:400]))
+    store.write('BTCINR', '5m', pd.DataFrame(rows[350:]))
+
+    full = store.read('BTCINR', '5m')
+    assert len(full) == 600 and full.index.is_unique and full.index.is_monotonic_increasing
+
+    window = store.read('BTCINR', '5m', columns=['close'], start=START + 100 * STEP, end=START + 199 * STEP)
+    assert list(window.columns) == ['close']
+    assert len(window) == 100
+    assert store.last_start_time('BTCINR', '5m') == START + 599 * STEP
+
+
+def test_candle_store_reads_integer_csv_partitions_alongside_fractional_live_ones(tmp_path):
+    from app.utils.candle_store import CandleStore
+
+    store = CandleStore(str(tmp_path))
+    store.import_csv('BTCINR', '5m', os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_5m_data.csv'))
+    last = store.last_start_time('BTCINR', '5m')
+    live = make_candle(last + 86_400_000)
+    live.update(open=1.5, high=1.5, low=1.5, close=1.5)
+    store.write('BTCINR', '5m', pd.DataFrame([live]))
+
+    df = store.read('BTCINR', '5m')
+    assert df['close'].dtype == 'float64' and df['close'].iloc[-1] == 1.5
+    assert store.read('BTCINR', '5m', columns=['close'], end=last)['close'].iloc[-1] == df['close'].iloc[-2]
+
+
+def test_mmap_store_appends_and_serves_zero_copy_views(tmp_path):
+    import numpy as np
+    from app.utils.mmap_store import MmapCandleStore
+
+    store = MmapCandleStore(str(tmp_path))
+    rows = [make_candle(START + i * STEP) for i in range(300)]
+    assert store.append('BTCINR', '5m', pd.DataFrame(rows[:200])) == 200
+    # Overlapping batch: the last stored candle is replaced, older ones are ignored
+    updated = dict(rows[199], close=1)
+    assert store.append('BTCINR', '5m', pd.DataFrame(rows[150:199] + [updated] + rows[200:])) == 101
+
+    arrays = store.arrays('BTCINR', '5m', start=START + 199 * STEP)
+    assert isinstance(arrays['close'], np.memmap) and not arrays['close'].flags.writeable
+    assert arrays['close'][0] == 1 and len(arrays['close']) == 101
+
+    reader = MmapCandleStore(str(tmp_path))
+    frame = reader.read('BTCINR', '5m', columns=['close'])
+    assert len(frame) == 300 and frame.index.is_monotonic_increasing
+    assert np.shares_memory(frame['close'].to_numpy(), reader.arrays('BTCINR', '5m')['close'])
+
+
+def test_both_backends_list_series_and_keep_fractional_prices(tmp_path):
+    from app.utils.candle_store import CandleStore
+    from app.utils.mmap_store import MmapCandleStore
+
+    for store in (CandleStore(str(tmp_path / 'parquet')), MmapCandleStore(str(tmp_path / 'mmap'))):
+        assert store.pairs() == [] and store.last_start_time('ETHINR', '1h') is None
+        rows = [dict(make_candle(START + i * STEP), close=250_000.25 + i) for i in range(10)]
+        store.write('ETHINR', '5m', pd.DataFrame(rows))
+        store.write('BTCINR', '5m', pd.DataFrame(rows[:3]))
+        store.write('BTCINR', '1h', pd.DataFrame(rows[:1]))
+        assert store.pairs() == ['BTCINR', 'ETHINR']
+        assert store.intervals('BTCINR') == ['1h', '5m'] and store.intervals('XRPINR') == []
+        assert store.last_start_time('ETHINR', '5m') == START + 9 * STEP
+        assert store.read('ETHINR', '5m', columns=['close'])['close'].tolist() == [250_000.25 + i for i in range(10)]
+
+
+def test_backfill_against_standin_with_injected_failures():
+    import time
+    from app.utils.standin import StandInServer
+
+    with StandInServer(history_days=3, error_rate=0.2, rate_limit=50) as server:
+        backfiller = KlineBackfiller(url=server.kline_url, backoff=0.01, max_retries=10)
+        now = int(time.time() * 1000)
+        frames = backfiller.backfill_many(['BTCINR'], ['5m', '1h'], now - 2 * 86_400_000, now)
+    five = frames[('BTCINR', '5m')]
+    assert five['startTime'].is_unique
+    assert five['startTime'].diff().dropna().eq(STEP).all()
+    assert len(five) >= 2 * 288 - 1
+    assert len(frames[('BTCINR', '1h')]) >= 47
+
+
+def test_standin_rate_limits_below_one_request_per_second_still_admit():
+    from app.utils.standin import StandInServer
+
+    with StandInServer(history_days=1, rate_limit=0.5) as server:
+        assert server.admit() == (True, 0.0)
+        allowed, retry_after = server.admit()
+    assert not allowed and 1.9 < retry_after <= 2.0
+
+
+def test_derive_sync_only_rewrites_the_partitions_after_the_watermark(tmp_path):
+    from app.utils.aggregator import rebuild_intervals
+    from app.utils.candle_store import CandleStore
+
+    store = CandleStore(str(tmp_path))
+    rows = [make_candle(START + i * STEP) for i in range(4 * 288)]
+    store.write('BTCINR', '5m', pd.DataFrame(rows[:-12]))
+    derive_sync(store, ['BTCINR'], '5m', ['1h', '12h'], {})
+
+    def partitions():
+        path = store.series_path('BTCINR', '1h')
+        return {day: os.stat(os.path.join(path, day, 'part-0.parquet')).st_ino for day in sorted(os.listdir(path))}
+
+    before = partitions()
+    starts = {'BTCINR': store.last_start_time('BTCINR', '5m')}
+    store.write('BTCINR', '5m', pd.DataFrame(rows[-12:]))
+    derive_sync(store, ['BTCINR'], '5m', ['1h', '12h'], starts)
+    after = partitions()
+    # Only the day of the new candles is rewritten (os.replace gives it a new inode)
+    changed = [day for day in before if after[day] != before[day]]
+    assert changed == [max(before)]
+    expected = rebuild_intervals(pd.DataFrame(rows), ['1h'])['1h']
+    assert store.read('BTCINR', '1h')['close'].tolist() == expected['close'].tolist()
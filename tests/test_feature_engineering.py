@@ -1 +1,164 @@
-# Unit tests for feature calculation
\ No newline at end of file
+# Unit tests for feature calculation
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.indicators import IndicatorEngine, ema, rsi, sma
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_1h_data.csv')
+
+
+def candles():
+    return pd.read_csv(DATA_PATH)
+
+
+def reference_wilder(values, n):
+    out = [np.nan] * len(values)
+    out[n - 1] = sum(values[:n]) / n
+    for t in range(n, len(values)):
+        out[t] = (out[t - 1] * (n - 1) + values[t]) / n
+    return np.array(out)
+
+
+def test_sma_and_ema_match_pandas():
+    close = candles()['close'].to_numpy(dtype=float)
+    assert np.allclose(sma(close, 30), pd.Series(close).rolling(30).mean(), equal_nan=True, rtol=1e-12)
+    seeded = pd.Series(np.r_[close[:20].mean(), close[20:]]).ewm(span=20, adjust=False).mean()
+    assert np.allclose(ema(close, 20)[19:], seeded, rtol=1e-12)
+
+
+def test_rsi_uses_wilder_smoothing():
+    close = candles()['close'].to_numpy(dtype=float)
+    delta = np.diff(close)
+    gain = reference_wilder(np.maximum(delta, 0), 14)
+    loss = reference_wilder(np.maximum(-delta, 0), 14)
+    expected = 100 - 100 / (1 + gain / loss)
+    assert np.allclose(rsi(close, 14)[1:], expected, equal_nan=True, rtol=1e-10)
+
+
+def test_engine_batches_all_indicators_for_many_intervals():
+    df = candles()
+    engine = IndicatorEngine(['sma_7', 'ema_12', 'rsi_14', 'macd_12_26_9', 'bb_20_2', 'atr_14', 'vwap', 'vol_30'])
+    blocks = engine.compute_many({'1h': df, '1h-tail': df.tail(500)}, max_workers=2)
+    block = blocks['1h']
+    assert block.values.flags.f_contiguous and block.values.dtype == np.float64
+    assert {'macd_signal_12_26_9', 'bb_upper_20_2', 'sma_20'} <= set(block.names)
+    assert np.allclose(block['macd_12_26_9'], ema(df['close'].to_numpy(float), 12) - ema(df['close'].to_numpy(float), 26),
+                       equal_nan=True)
+    rolling = df['close'].rolling(20)
+    assert np.allclose(block['bb_upper_20_2'], rolling.mean() + 2 * rolling.std(ddof=0), equal_nan=True, rtol=1e-12)
+    assert len(blocks['1h-tail']) == 500
+
+
+def test_streaming_indicators_match_the_batch_engine():
+    from app.utils.streaming_indicators import IndicatorSet
+
+    df = candles()
+    names = ['sma_7', 'ema_12', 'rsi_14', 'macd_12_26_9', 'bb_20_2', 'atr_14', 'vol_30']
+    block = IndicatorEngine(names).compute(df)
+    live = IndicatorSet(names)
+    streamed = {name: [] for name in names}
+    for high, low, close in zip(df['high'].to_numpy(float), df['low'].to_numpy(float), df['close'].to_numpy(float)):
+        for name, indicator in live.indicators.items():
+            value = indicator.update(high, low, close) if name.startswith('atr') else indicator.update(close)
+            streamed[name].append(value)
+
+    def column(name, i=None):
+        values = streamed[name] if i is None else [v[i] for v in streamed[name]]
+        return np.array(values, dtype=float)
+
+    for name in ['sma_7', 'ema_12', 'rsi_14', 'atr_14', 'vol_30']:
+        assert np.allclose(column(name), block[name], equal_nan=True, rtol=1e-9), name
+    assert np.allclose(column('macd_12_26_9', 1), block['macd_signal_12_26_9'], equal_nan=True, rtol=1e-9, atol=1e-6)
+    assert np.allclose(column('bb_20_2', 2), block['bb_upper_20_2'], equal_nan=True, rtol=1e-9)
+
+
+def test_forming_bars_do_not_change_state_and_snapshots_restore():
+    from app.utils.streaming_indicators import IndicatorSet
+
+    df = candles()
+    live = IndicatorSet(['ema_12', 'rsi_14', 'bb_20_2'])
+    live.warm_up(df.iloc[:-1])
+    state = live.snapshot()
+    before = dict(live.values)
+    last = df.iloc[-1]
+    tentative = {name: indicator.update(float(last['close']), closed=False) for name, indicator in live.indicators.items()}
+    assert live.snapshot() == state
+    live.warm_up(df.iloc[-1:])
+    assert live.values['rsi_14'] == tentative['rsi_14']
+    live.restore(state)
+    assert live.indicators['ema_12'].value == before['ema_12']
+
+
+def test_repeated_and_late_closed_candles_are_not_fed_twice():
+    from app.utils.ingestion import Candle
+    from app.utils.streaming_indicators import IndicatorSet
+
+    df = candles()
+    names = ['ema_12', 'rsi_14', 'atr_14']
+    once, twice = IndicatorSet(names), IndicatorSet(names)
+    for i, row in enumerate(df.iloc[:60].itertuples()):
+        candle = Candle('BTCINR', '5m', i, i, row.open, row.high, row.low, row.close, row.volume, True, i)
+        once.update_candle(candle)
+        twice.update_candle(candle)
+        twice.update_candle(candle)
+        if i:
+            twice.update_candle(candle._replace(startTime=i - 1, closed=False))
+    assert twice.values == once.values
+    assert twice.snapshot() == once.snapshot()
+
+
+def test_feature_builder_matches_shift_based_features_and_caches_by_version():
+    from app.utils.features import FeatureBuilder, sliding_windows
+    from app.utils.result_cache import ResultCache
+
+    df = pd.read_csv(DATA_PATH).set_index('startTime')
+    builder = FeatureBuilder(lags=2, returns=[3], rolling=[10], indicators=['rsi_14'])
+    data = builder.build(df)
+    assert data.X.dtype == np.float32 and data.X.flags['C_CONTIGUOUS']
+    assert data.names == ['lag_1', 'lag_2', 'ret_3', 'roll_mean_10', 'roll_std_10', 'rsi_14']
+
+    close = df['close']
+    expected = pd.DataFrame({
+        'lag_1': close.shift(1), 'lag_2': close.shift(2),
+        'ret_3': np.log(close).diff(3).shift(1),
+        'roll_mean_10': close.rolling(10).mean().shift(1), 'roll_std_10': close.rolling(10).std().shift(1),
+    }).assign(target=close).dropna().iloc[15 - 10:]  # RSI(14) is first defined on bar 14, seen from bar 15
+    assert (data.index == expected.index).all()
+    assert np.allclose(data.X[:, :5], expected.iloc[:, :5].to_numpy(), rtol=1e-6)
+    assert np.allclose(data.y, expected['target'].to_numpy(), rtol=1e-7)
+
+    cache = ResultCache()
+    first = builder.build_many({'5m': df}, cache=cache)['5m']
+    assert builder.build_cached(df, '5m', cache=cache) is first and cache.stats()['hits'] == 1
+
+    values = np.arange(100, dtype=np.float64)
+    windows, targets = sliding_windows(values, 60)
+    loop_x = np.array([values[i - 60:i] for i in range(60, len(values))])
+    assert windows.shape == (40, 60, 1) and windows.flags['C_CONTIGUOUS']
+    assert (windows[..., 0] == loop_x).all() and (targets == values[60:]).all()
+
+
+def test_forming_candle_updates_that_keep_the_close_invalidate_the_cache():
+    from app.utils.result_cache import ResultCache, data_version
+
+    df = pd.read_csv(DATA_PATH).set_index('startTime')
+    cache = ResultCache()
+    calls = []
+    compute = lambda frame: cache.get_or_compute('BTCINR', '5m', 'high', None, data_version(frame),
+                                                 lambda: calls.append(1) or frame['high'].max())
+    compute(df)
+    compute(df.copy())
+    assert len(calls) == 1
+    for column, change in [('high', 1_000_000), ('volume', 5.0)]:
+        updated = df.copy()
+        updated.loc[updated.index[-1], column] += change
+        assert data_version(updated) != data_version(df)
+    updated = df.copy()
+    updated.loc[updated.index[-1], 'high'] += 1_000_000
+    assert compute(updated) == updated['high'].max() and len(calls) == 2
@@ -0,0 +1,143 @@
+# Unit tests for the WebSocket ingestion pipeline
+import json
+import os
+import sys
+import time
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.ingestion import Candle, StreamIngestor, Tick, parse_message
+
+
+def kline_message(start, close, closed=False):
+    return json.dumps({'e': 'kline', 'E': int(time.time() * 1000), 's': 'BTCINR', 'k': {
+        't': start, 'T': start + 299_999, 'i': '5m', 'o': '100', 'h': '110', 'l': '90',
+        'c': str(close), 'v': '1.5', 'x': closed}})
+
+
+class ScriptedSocket:
+    """Stand-in for WebSocketApp: each connection replays the next script, then drops."""
+
+    def __init__(self, scripts, on_done):
+        self.scripts = list(scripts)
+        self.on_done = on_done
+        self.sent = []
+
+    def __call__(self, url, on_open=None, on_message=None):
+        self.on_open, self.on_message = on_open, on_message
+        return self
+
+    def run_forever(self, **kwargs):
+        self.on_open(self)
+        for message in self.scripts.pop(0):
+            self.on_message(self, message)
+        if not self.scripts:
+            self.on_done()
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+    def close(self):
+        pass
+
+
+def test_parse_message_handles_klines_trades_and_socketio_frames():
+    candle = parse_message(kline_message(1_000, 105, closed=True))
+    assert isinstance(candle, Candle) and candle.close == 105.0 and candle.closed
+    tick = parse_message('42["aggTrade", {"e": "aggTrade", "s": "BTCINR", "p": "5600000", "q": "0.01", "T": 5, "E": 6}]')
+    assert isinstance(tick, Tick) and tick.price == 5_600_000.0
+    assert parse_message('{"result": null, "id": 1}') is None
+
+
+def test_ingestor_batches_coalesces_and_resubscribes_after_reconnect():
+    batches = []
+
+    def stop():
+        ingestor._stop.set()
+
+    socket = ScriptedSocket([
+        [kline_message(0, 101), kline_message(0, 102), 'not json'],
+        [kline_message(0, 103, closed=True), kline_message(300_000, 104)],
+    ], stop)
+    ingestor = StreamIngestor('ws://stand-in', batches.append, streams=['btcinr@kline_5m'],
+                              batch_size=100, flush_interval=0.05, reconnect_backoff=0, app_factory=socket)
+    ingestor.run()
+    ingestor.stop()
+
+    records = {}
+    for batch in batches:
+        for record in batch:
+            records[record.startTime] = record
+    assert records[0].close == 103 and records[0].closed
+    assert records[300_000].close == 104
+    assert len(socket.sent) == 2 and socket.sent[0]['params'] == ['btcinr@kline_5m']
+    assert ingestor.metrics['reconnects'] == 1
+    assert ingestor.metrics['parse_errors'] == 1
+    assert ingestor.metrics['parsed'] == 4
+
+
+def test_ingestor_drop_mode_bounds_the_queue():
+    ingestor = StreamIngestor('ws://stand-in', lambda batch: None, queue_size=10, overflow='drop')
+    for i in range(25):
+        ingestor.on_message(None, kline_message(i * 300_000, 100))
+    assert ingestor.queue.qsize() == 10
+    assert ingestor.metrics['dropped'] == 15
+
+
+def test_a_failing_sink_is_counted_and_its_batch_retried():
+    batches = []
+
+    def sink(batch):
+        if not ingestor.metrics['sink_errors']:
+            raise OSError('disk full')
+        batches.append(batch)
+
+    ingestor = StreamIngestor('ws://stand-in', sink, flush_interval=0.02)
+    ingestor.start_flusher()
+    for i in range(5):
+        ingestor.on_message(None, kline_message(i * 300_000, 100 + i, closed=True))
+    deadline = time.time() + 5
+    while ingestor.metrics['flushed'] < 5 and time.time() < deadline:
+        time.sleep(0.01)
+    ingestor.on_message(None, kline_message(5 * 300_000, 105, closed=True))
+    ingestor.stop()
+
+    assert ingestor.metrics['sink_errors'] == 1
+    assert [record.close for batch in batches for record in batch] == [100, 101, 102, 103, 104, 105]
+
+
+def test_recorded_stream_replays_through_the_ingestor(tmp_path):
+    from app.utils.replay import StreamRecorder, StreamReplayer, read_recording
+
+    path = str(tmp_path / 'stream.rec.gz')
+    recorder = StreamRecorder(path)
+    live = StreamIngestor('ws://stand-in', lambda batch: None, recorder=recorder)
+    for i in range(50):
+        live.on_message(None, kline_message(i * 300_000, 100 + i, closed=True))
+    live.stop()
+    assert len(list(read_recording(path))) == 50
+
+    batches = []
+    replayed = StreamIngestor('replay://', batches.append, flush_interval=0.01)
+    stats = StreamReplayer(path, speed=None).replay_into(replayed)
+    assert stats['messages'] == 50
+    assert stats['ingestor']['flushed'] == 50
+    assert sum(len(batch) for batch in batches) == 50
+    assert stats['handler']['p99_ms'] >= stats['handler']['p50_ms']
+
+
+def test_ingestor_streams_from_the_local_standin():
+    from app.utils.standin import StandInServer
+
+    batches = []
+    with StandInServer(history_days=1, tick_rate=200) as server:
+        ingestor = StreamIngestor(server.ws_url, batches.append, streams=['btcinr@kline_5m'], flush_interval=0.05)
+        ingestor.start()
+        deadline = time.time() + 5
+        while ingestor.metrics['flushed'] < 20 and time.time() < deadline:
+            time.sleep(0.05)
+        ingestor.stop()
+    assert ingestor.metrics['connects'] == 1
+    assert ingestor.metrics['parsed'] >= 20
+    assert any(isinstance(record, Candle) and record.interval == '5m' for batch in batches for record in batch)
@@ -0,0 +1,66 @@
+# Unit tests for the model registry
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.features import FeatureBuilder
+from app.utils.model_registry import ModelRegistry
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_15m_data.csv')
+PARAMS = {'n_estimators': 10, 'lags': 2}
+
+
+def candles():
+    df = pd.read_csv(DATA_PATH)
+    return df.set_index(pd.to_datetime(df['startTime'], unit='ms'))[['open', 'high', 'low', 'close', 'volume']]
+
+
+def test_registry_round_trips_versions_and_serves_latest(tmp_path):
+    df = candles()
+    builder = FeatureBuilder(lags=PARAMS['lags'])
+    data = builder.build(df.iloc[:-10])
+    model = RandomForestRegressor(n_estimators=PARAMS['n_estimators'], random_state=0).fit(data.X, data.y)
+    meta = {'features': builder.spec, 'data': {'start': str(df.index[0]), 'end': str(df.index[-11])},
+            'metrics': {'mae': 1.0}}
+
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.load('BTCINR', '15m', 'random_forest', PARAMS) == (None, None)
+    first = registry.save('BTCINR', '15m', 'random_forest', PARAMS, {'model': model}, meta)
+    second = registry.save('BTCINR', '15m', 'random_forest', PARAMS, {'model': model}, meta)
+    assert registry.versions('BTCINR', '15m', 'random_forest', PARAMS) == [first['version'], second['version']]
+    # Params are part of the key
+    assert registry.meta('BTCINR', '15m', 'random_forest', dict(PARAMS, n_estimators=20)) is None
+
+    artifact, loaded = registry.load('BTCINR', '15m', 'random_forest', PARAMS)
+    assert loaded['version'] == second['version'] and loaded['features'] == builder.spec
+    assert registry.load('BTCINR', '15m', 'random_forest', PARAMS)[0] is artifact
+    # One loaded version per key: a newer one replaces the older in memory
+    registry.load('BTCINR', '15m', 'random_forest', PARAMS, first['version'])
+    assert len(registry._loaded) == 1
+    assert registry.load('BTCINR', '15m', 'random_forest', PARAMS)[0] is not artifact
+    assert len(registry._loaded) == 1
+    row = builder.latest(df.iloc[:-10])
+    assert np.allclose(artifact['model'].predict(row), model.predict(row))
+
+    assert registry.is_stale(loaded, df) and not registry.is_stale(loaded, df.iloc[:-10])
+    assert not registry.is_stale(loaded, df, min_new_bars=11)
+    assert [entry['version'] for entry in registry.entries()] == [second['version']]
+    assert registry.prune('BTCINR', '15m', 'random_forest', PARAMS, keep=1) == 1
+    assert registry.versions('BTCINR', '15m', 'random_forest', PARAMS) == [second['version']]
+
+
+def test_best_params_are_recorded_per_pair_interval_and_model(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    assert registry.best_params('BTCINR', '15m', 'random_forest') is None
+    registry.set_best('BTCINR', '15m', 'random_forest', PARAMS, {'mae': 12.5, 'folds': 9})
+    assert registry.best_params('BTCINR', '15m', 'random_forest') == PARAMS
+    assert registry.best('BTCINR', '15m', 'random_forest')['mae'] == 12.5
+    assert registry.best_params('BTCINR', '1h', 'random_forest') is None
+    # The record does not show up as a trained model
+    assert registry.entries() == []
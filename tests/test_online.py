@@ -0,0 +1,89 @@
+# Unit tests for the online model updates
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from statsmodels.tsa.arima.model import ARIMA
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.features import FeatureBuilder
+from app.utils.online import extend_arima, warm_start_trees, window_refit
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_15m_data.csv')
+
+
+def features():
+    df = pd.read_csv(DATA_PATH)
+    return FeatureBuilder(lags=2).build(df)
+
+
+def test_random_forest_grows_on_new_rows_and_retires_oldest_trees():
+    data = features()
+    forest = RandomForestRegressor(n_estimators=20, random_state=0).fit(data.X[:-50], data.y[:-50])
+    grown = warm_start_trees(forest, data.X[-50:], data.y[-50:], trees=5, max_trees=22)
+    # The served model is untouched; the copy keeps the newest max_trees trees
+    assert len(forest.estimators_) == 20
+    assert len(grown.estimators_) == 22
+    # 20 + 5 trees, the 3 oldest retired
+    seeds = lambda trees: [tree.random_state for tree in trees]
+    assert seeds(grown.estimators_[:17]) == seeds(forest.estimators_[3:])
+    again = warm_start_trees(grown, data.X[-50:], data.y[-50:], trees=5, max_trees=22)
+    assert len(again.estimators_) == 22
+    assert np.isfinite(again.predict(data.X[-5:])).all()
+
+
+def test_gradient_boosting_adds_stages_and_window_refit_keeps_params():
+    data = features()
+    boosting = GradientBoostingRegressor(n_estimators=30, random_state=0).fit(data.X[:-50], data.y[:-50])
+    grown = warm_start_trees(boosting, data.X[-50:], data.y[-50:], trees=10)
+    assert boosting.n_estimators_ == 30 and grown.n_estimators_ == 40
+    np.testing.assert_array_equal(grown.estimators_[:30, 0][0].tree_.value, boosting.estimators_[0, 0].tree_.value)
+
+    refit = window_refit(boosting, data.X, data.y, window=100)
+    assert refit is not boosting and refit.get_params() == boosting.get_params()
+    expected = GradientBoostingRegressor(**boosting.get_params()).fit(data.X[-100:], data.y[-100:])
+    np.testing.assert_allclose(refit.predict(data.X[-5:]), expected.predict(data.X[-5:]))
+
+
+def test_extended_arima_matches_appending_without_refit():
+    close = pd.read_csv(DATA_PATH)['close'].to_numpy(dtype=np.float64)
+    fitted = ARIMA(close[:-20], order=(2, 1, 0)).fit()
+    extended = extend_arima(fitted, close[-20:])
+    appended = fitted.append(close[-20:], refit=False)
+    np.testing.assert_allclose(extended.params, fitted.params)
+    np.testing.assert_allclose(extended.forecast(steps=5), appended.forecast(steps=5), rtol=1e-6)
+
+
+def test_forecasting_models_update_carries_a_fit_forward_over_new_bars():
+    from app.utils.forecasting_models import ForecastingModels
+
+    df = pd.read_csv(DATA_PATH)
+    df = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))[['open', 'high', 'low', 'close', 'volume']]
+    params = {'n_estimators': 20, 'lags': 2}
+    artifact, meta = ForecastingModels(df.iloc[:-40], '15m').fit('random_forest', params)
+    meta = dict(meta, version='v1')
+
+    updated, updated_meta = ForecastingModels(df, '15m').update('random_forest', artifact, meta, params)
+    assert len(updated['model'].estimators_) == 30 and len(artifact['model'].estimators_) == 20
+    assert updated_meta['data']['end'] == str(df.index[-1]) and updated_meta['parent'] == 'v1'
+    assert updated_meta['updates'] == 1 and updated_meta['online_metrics']['rows'] == 40
+    # Nothing new since the update: nothing to do
+    assert ForecastingModels(df, '15m').update('random_forest', updated, updated_meta, params) is None
+
+
+def test_stale_arima_forecasts_from_the_current_end_of_the_data():
+    from app.utils.forecasting_models import ForecastingModels
+
+    df = pd.read_csv(DATA_PATH)
+    df = df.set_index(pd.to_datetime(df['startTime'], unit='ms'))[['open', 'high', 'low', 'close', 'volume']]
+    params = {'order': [1, 1, 0], 'steps': 3}
+    artifact, meta = ForecastingModels(df.iloc[:-5], '15m').fit('arima', params)
+
+    predictions = ForecastingModels(df, '15m').forecast('arima', artifact, params, meta)
+    expected = extend_arima(artifact['model'], df['close'].to_numpy(dtype=np.float64)[-5:]).forecast(steps=3)
+    np.testing.assert_allclose(predictions['close'].to_numpy(), expected)
+    assert predictions.index[0] == df.index[-1] + pd.Timedelta('15min')
@@ -0,0 +1,130 @@
+# Unit tests for the micro-batching prediction service
+import asyncio
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.candle_store import CandleStore
+from app.utils.forecasting_models import MODEL_DEFAULTS, ForecastingModels
+from app.utils.ingestion import Candle
+from app.utils.model_registry import ModelRegistry
+from app.utils.online import extend_arima
+from app.utils.serving import LatencyStats, PredictionService
+
+PARAMS = {'n_estimators': 10, 'lags': 2}
+
+
+def load_candles():
+    df = pd.read_csv(os.path.join(os.path.dirname(__file__), '..', 'app', 'BTCINR_15m_data.csv'))
+    return df.set_index(pd.to_datetime(df['startTime'], unit='ms'))
+
+
+def test_latency_stats_report_percentiles_and_batch_sizes():
+    stats = LatencyStats(size=100)
+    for ms in range(1, 101):
+        stats.record(float(ms))
+    stats.record_batch(4)
+    stats.record_batch(2)
+    summary = stats.summary()
+    assert summary['requests'] == 100 and summary['max_ms'] == 100.0
+    assert summary['p50_ms'] == pytest.approx(50.5) and summary['p99_ms'] == pytest.approx(99.01)
+    assert summary['mean_batch'] == 3.0
+
+
+def test_concurrent_requests_are_batched_and_match_a_direct_forecast(tmp_path):
+    df = load_candles()
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    forecaster = ForecastingModels(df, '15m', 'BTCINR')
+    artifact, meta = forecaster.fit('random_forest', PARAMS)
+    registry.save('BTCINR', '15m', 'random_forest', {**MODEL_DEFAULTS['random_forest'], **PARAMS}, artifact, meta)
+    registry.set_best('BTCINR', '15m', 'random_forest', PARAMS)
+
+    async def scenario():
+        service = PredictionService(registry, CandleStore(str(tmp_path / 'store')), warm_horizon=0,
+                                    cache_paths=False)
+        async with service:
+            assert list(service.entries) == [('BTCINR', '15m', 'random_forest')]
+            results = await asyncio.gather(*(service.predict('BTCINR', '15m', horizon) for horizon in [1, 3] * 20))
+            with pytest.raises(KeyError):
+                await service.predict('BTCINR', '1h')
+            return results, service.stats.summary()
+
+    results, stats = asyncio.run(scenario())
+    expected = forecaster.forecast('random_forest', artifact, PARAMS)
+    step = 15 * 60_000
+    last = int(df['startTime'].iloc[-1])
+    assert results[0]['close'] == pytest.approx(expected['close'].tolist(), rel=1e-6)
+    assert results[1]['startTime'] == [last + step, last + 2 * step, last + 3 * step]
+    assert results[1]['close'][0] == results[0]['close'][0]
+    # 40 concurrent requests for one model are computed in far fewer batches
+    assert stats['requests'] == 40 and stats['errors'] == 1
+    assert stats['batches'] < 10 and stats['p99_ms'] > 0
+
+
+def test_closed_candles_move_the_series_and_arima_catches_up(tmp_path):
+    df = load_candles()
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    # Fit on all but the last five bars; the service filters them in before forecasting
+    artifact, meta = ForecastingModels(df.iloc[:-5], '15m', 'BTCINR').fit('arima', {'order': [1, 1, 0]})
+    registry.save('BTCINR', '15m', 'arima', {**MODEL_DEFAULTS['arima'], 'order': [1, 1, 0]}, artifact, meta)
+    registry.set_best('BTCINR', '15m', 'arima', {'order': [1, 1, 0]})
+    closes = df['close'].to_numpy(dtype=np.float64)
+    expected = extend_arima(artifact['model'], closes[-5:]).forecast(steps=4)
+
+    async def scenario():
+        async with PredictionService(registry, CandleStore(str(tmp_path / 'store')), warm_horizon=4) as service:
+            first = await service.predict('BTCINR', '15m', 4, 'arima')
+            last = first['startTime'][0]
+            service.on_record(Candle('BTCINR', '15m', last, last + 15 * 60_000 - 1, 1.0, 1.0, 1.0, closes[-1], 1.0,
+                                     True, last))
+            await asyncio.sleep(0)
+            second = await service.predict('BTCINR', '15m', 2, 'arima')
+            return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first['close'] == pytest.approx(list(expected))
+    assert second['startTime'][0] == first['startTime'][1]
+    assert second['close'] != pytest.approx(first['close'][1:3])
+
+
+def test_model_errors_are_answered_and_arima_refuses_gaps_beyond_the_history(tmp_path):
+    df = load_candles()
+    registry = ModelRegistry(str(tmp_path / 'models'))
+    # Fit 600 bars before the end: more than the service holds to catch the ARIMA state up with
+    artifact, meta = ForecastingModels(df.iloc[:-600], '15m', 'BTCINR').fit('arima', {'order': [1, 1, 0]})
+    registry.save('BTCINR', '15m', 'arima', {**MODEL_DEFAULTS['arima'], 'order': [1, 1, 0]}, artifact, meta)
+    registry.set_best('BTCINR', '15m', 'arima', {'order': [1, 1, 0]})
+
+    async def ask(port, request):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(json.dumps(request).encode() + b'\n')
+        response = json.loads(await reader.readline())
+        writer.close()
+        return response
+
+    async def scenario():
+        async with PredictionService(registry, CandleStore(str(tmp_path / 'store')), warm_horizon=0) as service:
+            with pytest.raises(ValueError, match='update or retrain'):
+                await service.predict('BTCINR', '15m', 1, 'arima')
+
+            def fail(series, horizon):
+                raise RuntimeError('singular matrix')
+
+            service.entries[('BTCINR', '15m', 'arima')].forecast = fail
+            server = await asyncio.start_server(service.handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                failed = await ask(port, {'pair': 'BTCINR', 'interval': '15m', 'model': 'arima'})
+                stats = await ask(port, {'stats': True})
+            return failed, stats
+
+    failed, stats = asyncio.run(scenario())
+    assert failed == {'error': 'singular matrix'}
+    assert stats['errors'] == 2
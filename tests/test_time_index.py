@@ -0,0 +1,54 @@
+# Unit tests for the time index and gap repair
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add the project root directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.time_index import TimeIndex, repair
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'app')
+
+
+def load(interval):
+    df = pd.read_csv(os.path.join(DATA_DIR, f'BTCINR_{interval}_data.csv'))
+    df.index = pd.to_datetime(df.pop('startTime'), unit='ms').rename('startTime')
+    return df
+
+
+def test_index_finds_gaps_duplicates_and_slices():
+    step = 900_000
+    times = np.array([0, 1, 2, 2, 5, 6, 10], dtype=np.int64) * step
+    index = TimeIndex(times, '15m')
+    report = index.report()
+    assert report['duplicates'] == 1
+    assert report['gaps'] == 2 and report['missing'] == 5 and report['largest_gap'] == 3
+    assert (index.missing_times() == np.array([3, 4, 7, 8, 9]) * step).all()
+    assert index.slice(2 * step, 6 * step) == (2, 6)
+
+    incremental = TimeIndex(times[:4], '15m')
+    incremental.append(times[4:])
+    assert incremental.report() == report
+
+
+def test_repair_fills_from_higher_resolution_and_marks_the_rest():
+    fifteen = load('15m')
+    filled = [len(fifteen) - 20, len(fifteen) - 19]  # Covered by the 5m history
+    holed = fifteen.drop(fifteen.index[filled + [500]])
+    holed = pd.concat([holed, holed.iloc[[10]]])  # An appended duplicate
+
+    repaired = repair(holed, '15m', higher_res=load('5m').reset_index())
+    assert repaired.index.is_unique and repaired.index.is_monotonic_increasing
+    assert len(repaired) == len(fifteen)
+    assert repaired['is_gap'].sum() == 1 and repaired['is_gap'].iloc[500]
+    for position in filled:
+        for column in ['open', 'high', 'low', 'close']:
+            assert repaired[column].iloc[position] == fifteen[column].iloc[position]
+
+    flat = repair(holed, '15m', method='ffill')
+    assert flat['is_gap'].sum() == 3
+    assert flat['close'].iloc[500] == fifteen['close'].iloc[499]
+    assert flat['volume'].iloc[500] == 0